@@ -0,0 +1,402 @@
+"""Update and draw benchmarks for every game; each result is the median of several repeats"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import time
+
+import pygame
+
+from .headless import NO_INPUT, Inputs, get_game_class
+
+BASELINE_VERSION = 1
+DEFAULT_REPEATS = 7
+DEFAULT_TOLERANCE = 0.25
+SEED = 1  # 所有重复使用同一种子，每次计时的状态完全相同
+SCREEN_SIZE = (800, 600)
+VERIFY_TICKS = 300
+# 可以切换回逐个检查实现的优化：游戏 -> 开关属性
+REFERENCE_SWITCHES = {'tank': 'use_broadphase'}
+
+
+class Scenario:
+    """A named, reproducible game state to benchmark"""
+
+    def __init__(self, name, game, setup=None, ticks=60, frames=30, policy=None, options=None):
+        self.name = name
+        self.game = game
+        self.options = options or {}  # extra keyword arguments for the game's constructor
+        self.setup = setup  # setup(game) puts a fresh game into the scenario state
+        self.ticks = ticks
+        self.frames = frames
+        self.policy = policy  # policy(game, step) -> Inputs, as in games.headless
+
+    def build(self, screen, seed):
+        game = get_game_class(self.game)(screen, seed, **self.options)
+        if self.setup:
+            self.setup(game)
+        return game
+
+
+# --- Tank ---
+
+def _tank_playing(game):
+    from .tank.tank_game import Direction
+    # 无敌的玩家，敌方子弹不会提前结束场景
+    game.player.lives = game.player.health = 10 ** 6
+    game.player.direction = Direction.UP
+
+
+def _tank_horde(game):
+    from .tank.tank_game import (BulletStore, Direction, EnemyStore, SCREEN_HEIGHT,
+                                 SCREEN_WIDTH, TILE_SIZE)
+    _tank_playing(game)
+    rng = game.rng
+    game.enemies = EnemyStore()
+    game.bullets = BulletStore()
+    for i in range(200):
+        game.enemies.add(rng.randint(TILE_SIZE, SCREEN_WIDTH - 2 * TILE_SIZE),
+                         rng.randint(TILE_SIZE, SCREEN_HEIGHT - 2 * TILE_SIZE),
+                         game.level, rng)
+    # 被击中只产生爆炸，敌人数量保持不变
+    game.enemies.health[:] = [10 ** 6] * len(game.enemies)
+    directions = list(Direction)
+    for i in range(2000):
+        game.bullets.add(rng.randint(TILE_SIZE, SCREEN_WIDTH - TILE_SIZE),
+                         rng.randint(TILE_SIZE, SCREEN_HEIGHT - TILE_SIZE),
+                         rng.choice(directions), 'player' if i % 2 else 'enemy')
+
+
+def _tank_large_map(game):
+    from .tank.tank_game import BulletStore, Direction, EnemyStore, TILE_SIZE
+    _tank_playing(game)
+    rng = game.rng
+    game.enemies = EnemyStore()
+    game.bullets = BulletStore()
+    # 每屏约 20 个敌人和 50 颗子弹，分布在整张地图上
+    for i in range(2000):
+        game.enemies.add(rng.randint(TILE_SIZE, game.map_width - 2 * TILE_SIZE),
+                         rng.randint(TILE_SIZE, game.map_height - 2 * TILE_SIZE),
+                         game.level, rng)
+    game.enemies.health[:] = [10 ** 6] * len(game.enemies)
+    directions = list(Direction)
+    for i in range(5000):
+        game.bullets.add(rng.randint(TILE_SIZE, game.map_width - TILE_SIZE),
+                         rng.randint(TILE_SIZE, game.map_height - TILE_SIZE),
+                         rng.choice(directions), 'player' if i % 2 else 'enemy')
+
+
+def _tank_policy(game, step):
+    # 每秒换一个方向并持续开火
+    keys = (pygame.K_UP, pygame.K_RIGHT, pygame.K_DOWN, pygame.K_LEFT)
+    return Inputs((pygame.K_SPACE,), (keys[step // 60 % 4],))
+
+
+# --- Breakout ---
+
+def _breakout_launched(game):
+    game.handle_key(pygame.K_SPACE)
+
+
+def _breakout_dense(game):
+    from .breakout.breakout_game import RED, YELLOW
+    # 100 x 100 块 8x3 像素的砖，铺满球的上方
+    game.brick_pool.release_all(game.bricks)
+    game.bricks = [game.brick_pool.acquire(col * 8, 60 + row * 3, 8, 3,
+                                           RED if (row + col) % 2 else YELLOW)
+                   for row in range(100) for col in range(100)]
+    _breakout_launched(game)
+
+
+def _breakout_policy(game, step):
+    # 挡板跟随球
+    if game.ball.x < game.paddle.x + game.paddle.width // 3:
+        return Inputs((), (pygame.K_LEFT,))
+    if game.ball.x > game.paddle.x + game.paddle.width * 2 // 3:
+        return Inputs((), (pygame.K_RIGHT,))
+    return NO_INPUT
+
+
+# --- Flappy ---
+
+def _flappy_pipes(game, count):
+    from .flappy.flappy_game import SCREEN_WIDTH
+    game.pipe_pool.release_all(game.pipes)
+    game.pipes = [game.pipe_pool.acquire(SCREEN_WIDTH // 2 + i * 270, game.rng)
+                  for i in range(count)]
+    game.handle_key(pygame.K_SPACE)
+
+
+def _flappy_playing(game):
+    _flappy_pipes(game, 3)
+
+
+def _flappy_long_queue(game):
+    _flappy_pipes(game, 1000)
+
+
+def _flappy_policy(game, step):
+    # 快落到下一根管道缺口的底部时起跳，一跳大约升高 100 像素
+    bird = game.bird
+    ahead = [pipe for pipe in game.pipes if pipe.x + pipe.width > bird.x]
+    floor = ahead[0].gap_y + ahead[0].gap - 10 if ahead else 400
+    if bird.y + bird.height > floor and bird.velocity > 0:
+        return Inputs((pygame.K_SPACE,))
+    return NO_INPUT
+
+
+# --- Snake ---
+
+def _snake_playing(game):
+    game.handle_key(pygame.K_SPACE)
+
+
+def _snake_long(game):
+    from collections import deque
+    from .snake.snake_game import Direction, GameState, GRID_WIDTH
+    # 蛇身呈之字形铺满前 25 行（1,000 格），蛇头在 (39, 24) 向下
+    body = []
+    for y in range(25):
+        xs = range(GRID_WIDTH) if y % 2 == 0 else range(GRID_WIDTH - 1, -1, -1)
+        body.extend((x, y) for x in xs)
+    snake = game.snake
+    snake.body = deque(reversed(body))
+    snake.direction = snake.next_direction = Direction.DOWN
+    game.food.spawn(snake.body)
+    # 每步都移动，计时的每一步都走完整的移动与碰撞检测
+    game.base_move_delay = game.move_delay = 1
+    game.state = GameState.PLAYING
+
+
+def _snake_long_policy(game, step):
+    from .snake.snake_game import GRID_HEIGHT
+    # 撞到底边之前转向左侧的空行
+    if game.snake.get_head()[1] == GRID_HEIGHT - 1:
+        return Inputs((pygame.K_LEFT,))
+    return NO_INPUT
+
+
+SCENARIOS = [
+    Scenario('tank/level1', 'tank', _tank_playing, ticks=240, policy=_tank_policy),
+    Scenario('tank/horde', 'tank', _tank_horde, ticks=30, frames=10, policy=_tank_policy),
+    Scenario('tank/large-map', 'tank', _tank_large_map, ticks=10, frames=30,
+             policy=_tank_policy, options={'map_size': (200, 150)}),
+    Scenario('breakout/level1', 'breakout', _breakout_launched, ticks=240,
+             policy=_breakout_policy),
+    Scenario('breakout/10k-bricks', 'breakout', _breakout_dense, ticks=60, frames=5,
+             policy=_breakout_policy),
+    Scenario('flappy/playing', 'flappy', _flappy_playing, ticks=240, policy=_flappy_policy),
+    Scenario('flappy/1k-pipes', 'flappy', _flappy_long_queue, ticks=60, frames=10,
+             policy=_flappy_policy),
+    Scenario('snake/start', 'snake', _snake_playing, ticks=600),
+    Scenario('snake/long', 'snake', _snake_long, ticks=40, policy=_snake_long_policy),
+]
+
+
+def select_scenarios(patterns):
+    """Scenarios whose name equals, or whose game is, one of the patterns"""
+    if not patterns:
+        return list(SCENARIOS)
+    selected = [s for s in SCENARIOS if s.name in patterns or s.game in patterns]
+    unknown = set(patterns) - {s.name for s in SCENARIOS} - {s.game for s in SCENARIOS}
+    if unknown:
+        raise SystemExit(f"Unknown scenario: {', '.join(sorted(unknown))}")
+    return selected
+
+
+def _timed(function, count):
+    """Average seconds per call of function(i) over count calls, with GC paused"""
+    gc_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for i in range(count):
+            function(i)
+        return (time.perf_counter() - start) / count
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def measure(scenario, screen, repeats=DEFAULT_REPEATS):
+    """Per-repeat seconds per update tick and per drawn frame, and pool statistics"""
+    updates = []
+    draws = []
+    policy = scenario.policy or (lambda game, step: NO_INPUT)
+
+    # 第 0 次为预热，不计入结果
+    for repeat in range(repeats + 1):
+        game = scenario.build(screen, SEED)
+        update = _timed(lambda i: game.step(policy(game, i)), scenario.ticks)
+        pools = game.pool_stats() if hasattr(game, 'pool_stats') else {}
+
+        game = scenario.build(screen, SEED)
+        game.update(NO_INPUT.held_keys())  # 让插值有上一步的位置可用
+        draw = _timed(lambda i: game.draw(0.5), scenario.frames)
+
+        if repeat:
+            updates.append(update)
+            draws.append(draw)
+    return updates, draws, pools
+
+
+def summarize(samples):
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+    }
+
+
+def format_time(seconds):
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds * 1e6:8.1f} us"
+
+
+def format_summary(summary):
+    return (f"{format_time(summary['median'])} "
+            f"({format_time(summary['min']).strip()} - {format_time(summary['max']).strip()})")
+
+
+def format_pools(pools):
+    return ', '.join(f"{name} {stats['high_water']} peak / "
+                     f"{stats['allocated']} allocated"
+                     for name, stats in pools.items())
+
+
+def run(scenarios, repeats=DEFAULT_REPEATS, show_pools=False):
+    """Benchmark scenarios, printing each result; return {name: {metric: summary}}"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+
+    print(f"{'scenario':<22}{'update / tick (min - max)':<36}draw / frame (min - max)")
+    results = {}
+    for scenario in scenarios:
+        updates, draws, pools = measure(scenario, screen, repeats)
+        results[scenario.name] = {'update': summarize(updates), 'draw': summarize(draws)}
+        print(f"{scenario.name:<22}{format_summary(results[scenario.name]['update']):<36}"
+              f"{format_summary(results[scenario.name]['draw'])}")
+        if show_pools and pools:
+            print(f"{'':<22}pools: {format_pools(pools)}")
+    return results
+
+
+def verify(scenarios, ticks=VERIFY_TICKS):
+    """Run each scenario with its optimized and its brute-force code side by side
+
+    Both copies get the same inputs, and their state checksums must agree
+    after every step. Returns the names of the scenarios that diverged.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+
+    failures = []
+    for scenario in scenarios:
+        switch = REFERENCE_SWITCHES.get(scenario.game)
+        if switch is None:
+            continue
+        policy = scenario.policy or (lambda game, step: NO_INPUT)
+        fast = scenario.build(screen, SEED)
+        reference = scenario.build(screen, SEED)
+        setattr(reference, switch, False)
+        for step in range(ticks):
+            fast.step(policy(fast, step))
+            reference.step(policy(reference, step))
+            if fast.state_checksum() != reference.state_checksum():
+                print(f"{scenario.name:<22}DIVERGED at step {step} ({switch})")
+                failures.append(scenario.name)
+                break
+        else:
+            print(f"{scenario.name:<22}{ticks} steps match ({switch})")
+    return failures
+
+
+def save_baseline(path, results, repeats):
+    baseline = {
+        'version': BASELINE_VERSION,
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'machine': platform.machine(),
+        'repeats': repeats,
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Print the change against a baseline; return the list of regressions"""
+    if baseline.get('version') != BASELINE_VERSION:
+        raise SystemExit(f"Baseline format {baseline.get('version')} is not supported")
+
+    regressions = []
+    print(f"\nCompared with baseline (tolerance {tolerance:.0%}):")
+    for name, metrics in results.items():
+        if name not in baseline['results']:
+            print(f"  {name}: not in baseline")
+            continue
+        for metric, summary in metrics.items():
+            previous = baseline['results'][name][metric]['median']
+            ratio = summary['median'] / previous
+            status = 'ok'
+            if ratio > 1 + tolerance:
+                status = 'REGRESSION'
+                regressions.append((name, metric, ratio))
+            elif ratio < 1 - tolerance:
+                status = 'faster'
+            print(f"  {name + ' ' + metric:<30}{format_time(previous)} -> "
+                  f"{format_time(summary['median'])}  {ratio - 1:+7.1%}  {status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark game update and draw costs")
+    parser.add_argument('scenarios', nargs='*',
+                        help="scenario or game names (default: all)")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--save', metavar='PATH', help="write the results as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH',
+                        help="compare against a JSON baseline recorded on this machine; "
+                             "exit 1 on regression")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown before a result counts as a regression")
+    parser.add_argument('--list', action='store_true', help="list the scenarios and exit")
+    parser.add_argument('--pools', action='store_true',
+                        help="print entity pool high-water marks and allocation counts")
+    parser.add_argument('--verify', action='store_true',
+                        help="check optimized code paths against their brute-force versions "
+                             "instead of timing; exit 1 on a mismatch")
+    args = parser.parse_args()
+
+    scenarios = select_scenarios(args.scenarios)
+    if args.list:
+        for scenario in scenarios:
+            print(scenario.name)
+        return
+    if args.verify:
+        if verify(scenarios):
+            raise SystemExit(1)
+        return
+
+    results = run(scenarios, args.repeats, show_pools=args.pools)
+    if args.save:
+        save_baseline(args.save, results, args.repeats)
+        print(f"\nBaseline written to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,17 @@
+import copy
 import pygame
 import random
+import zlib
 from enum import Enum
 
+from .. import frame_profiler, launch_timing
+from ..dirty_rects import motion_rect
+from ..game_loop import FixedStepLoop, lerp
+from ..overlays import OverlayCache, dim_overlay
+from ..pipeline import copy_all, snapshot_view
+from ..pools import Pool
+from ..text_cache import get_font, render_text
+
 # Constants
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
@@ -20,6 +30,9 @@ CYAN = (0, 255, 255)
 PINK = (255, 192, 203)
 GRAY = (128, 128, 128)
 
+# Screen areas of the HUD text, refreshed every frame with partial updates
+HUD_RECTS = (pygame.Rect(0, 0, 200, 60), pygame.Rect(SCREEN_WIDTH - 110, 0, 110, 35))
+
 # Game states
 class GameState(Enum):
     PLAYING = 0
@@ -34,6 +47,7 @@ class Paddle:
         self.height = 15
         self.x = SCREEN_WIDTH // 2 - self.width // 2
         self.y = SCREEN_HEIGHT - 50
+        self.prev_x = self.x  # Position at the previous simulation step
         self.speed = 8
         self.color = BLUE
 
@@ -49,8 +63,8 @@ class Paddle:
         if self.x > SCREEN_WIDTH - self.width:
             self.x = SCREEN_WIDTH - self.width
 
-    def draw(self, screen):
-        rect = pygame.Rect(self.x, self.y, self.width, self.height)
+    def draw(self, screen, alpha=1.0):
+        rect = pygame.Rect(lerp(self.prev_x, self.x, alpha), self.y, self.width, self.height)
         pygame.draw.rect(screen, self.color, rect, border_radius=5)
         pygame.draw.rect(screen, WHITE, rect, 2, border_radius=5)
 
@@ -59,7 +73,8 @@ class Paddle:
 
 # Ball class
 class Ball:
-    def __init__(self, paddle):
+    def __init__(self, paddle, rng=random):
+        self.rng = rng  # Session RNG so replays are reproducible
         self.radius = 8
         self.reset(paddle)
         self.max_speed = 10
@@ -67,6 +82,7 @@ class Ball:
     def reset(self, paddle):
         self.x = paddle.x + paddle.width // 2
         self.y = paddle.y - self.radius - 5
+        self.prev_x, self.prev_y = self.x, self.y
         self.vel_x = 0
         self.vel_y = 0
         self.attached = True
@@ -75,7 +91,7 @@ class Ball:
     def launch(self):
         if self.attached:
             self.attached = False
-            angle = random.uniform(-60, 60)  # Launch angle in degrees
+            angle = self.rng.uniform(-60, 60)  # Launch angle in degrees
             import math
             self.vel_x = 5 * math.sin(math.radians(angle))
             self.vel_y = -5 * math.cos(math.radians(angle))
@@ -97,9 +113,11 @@ class Ball:
                 self.vel_y = -self.vel_y
                 self.y = self.radius
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), self.radius)
-        pygame.draw.circle(screen, WHITE, (int(self.x), int(self.y)), self.radius, 2)
+    def draw(self, screen, alpha=1.0):
+        x = int(lerp(self.prev_x, self.x, alpha))
+        y = int(lerp(self.prev_y, self.y, alpha))
+        pygame.draw.circle(screen, self.color, (x, y), self.radius)
+        pygame.draw.circle(screen, WHITE, (x, y), self.radius, 2)
 
     def check_paddle_collision(self, paddle):
         if self.attached:
@@ -132,7 +150,13 @@ class Ball:
 
 # Brick class
 class Brick:
+    __slots__ = ('x', 'y', 'width', 'height', 'color', 'hits', 'max_hits', 'active')
+
     def __init__(self, x, y, width, height, color, hits=1):
+        self.reset(x, y, width, height, color, hits)
+
+    def reset(self, x, y, width, height, color, hits=1):
+        # Re-initialise a brick taken from the pool
         self.x = x
         self.y = y
         self.width = width
@@ -162,8 +186,7 @@ class Brick:
 
             # Draw hit counter for multi-hit bricks
             if self.max_hits > 1:
-                font = pygame.font.Font(None, 20)
-                text = font.render(str(self.hits), True, WHITE)
+                text = render_text(get_font(20), str(self.hits), WHITE)
                 text_rect = text.get_rect(center=(self.x + self.width // 2,
                                                   self.y + self.height // 2))
                 screen.blit(text, text_rect)
@@ -173,14 +196,27 @@ class Brick:
 
 # Breakout game class
 class BreakoutGame:
-    def __init__(self, screen):
-        self.screen = screen
-        pygame.display.set_caption("Breakout")
+    GAME_ID = 'breakout'
+    # Keys the game reads; recordings encode inputs with this table
+    INPUT_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_a, pygame.K_d, pygame.K_SPACE, pygame.K_r)
+
+    def __init__(self, screen, seed=None):
+        self.screen = screen  # None when simulating headless
+        # Per-session RNG: the same seed and inputs replay the same game
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 36)
-        self.small_font = pygame.font.Font(None, 24)
+        self.font = get_font(36)
+        self.small_font = get_font(24)
+        self.presented_state = None  # State shown in the last presented frame
+        self.overlay_cache = OverlayCache()
+
+        # Bricks are reused from level to level
+        self.bricks = []
+        self.brick_pool = Pool(Brick)
 
         self.reset_game()
+        launch_timing.mark('constructed')
 
     def reset_game(self):
         self.state = GameState.WAITING
@@ -188,13 +224,14 @@ class BreakoutGame:
         self.score = 0
         self.lives = 3
         self.paddle = Paddle()
-        self.ball = Ball(self.paddle)
-        self.bricks = []
+        self.ball = Ball(self.paddle, self.rng)
 
         self.create_level()
 
     def create_level(self):
+        self.brick_pool.release_all(self.bricks)
         self.bricks = []
+        self.damaged_rects = []  # Bricks hit since the last presented frame
         self.state = GameState.WAITING
         self.ball.reset(self.paddle)
 
@@ -226,7 +263,8 @@ class BreakoutGame:
                 if self.level >= 5 and row < 1:
                     hits = 3
 
-                self.bricks.append(Brick(x, y, brick_width, brick_height, color, hits))
+                self.bricks.append(self.brick_pool.acquire(x, y, brick_width, brick_height,
+                                                           color, hits))
 
     def handle_collisions(self):
         # Ball and brick collisions
@@ -261,6 +299,7 @@ class BreakoutGame:
 
                 # Hit the brick
                 destroyed = brick.hit()
+                self.damaged_rects.append(brick.get_rect())
                 if destroyed:
                     self.score += 10 * self.level
                 else:
@@ -274,147 +313,203 @@ class BreakoutGame:
 
     def draw_ui(self):
         # Draw score
-        score_text = self.small_font.render(f"Score: {self.score}", True, WHITE)
+        score_text = render_text(self.small_font, f"Score: {self.score}", WHITE)
         self.screen.blit(score_text, (10, 10))
 
         # Draw lives
-        lives_text = self.small_font.render(f"Lives: {self.lives}", True, WHITE)
+        lives_text = render_text(self.small_font, f"Lives: {self.lives}", WHITE)
         self.screen.blit(lives_text, (10, 35))
 
         # Draw level
-        level_text = self.small_font.render(f"Level: {self.level}", True, WHITE)
+        level_text = render_text(self.small_font, f"Level: {self.level}", WHITE)
         self.screen.blit(level_text, (SCREEN_WIDTH - 100, 10))
 
         # Draw launch hint when waiting
         if self.state == GameState.WAITING:
-            hint_text = self.small_font.render("Press SPACE to launch ball", True, YELLOW)
+            hint_text = render_text(self.small_font, "Press SPACE to launch ball", YELLOW)
             hint_rect = hint_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 100))
             self.screen.blit(hint_text, hint_rect)
 
     def draw_game_over(self):
+        # The overlay is composed once per state and score
+        key = (self.state, self.score, self.level)
+        overlay = self.overlay_cache.get(key, self.build_game_over_overlay)
+        overlay.draw(self.screen)
+
+    def build_game_over_overlay(self):
         # Semi-transparent background
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        overlay = dim_overlay((SCREEN_WIDTH, SCREEN_HEIGHT), BLACK)
 
         # Game over text
-        game_over_text = self.font.render("GAME OVER", True, RED)
+        game_over_text = render_text(self.font, "GAME OVER", RED)
         text_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
-        self.screen.blit(game_over_text, text_rect)
+        overlay.blit(game_over_text, text_rect)
 
         # Final score
-        score_text = self.small_font.render(f"Final Score: {self.score}", True, WHITE)
+        score_text = render_text(self.small_font, f"Final Score: {self.score}", WHITE)
         score_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-        self.screen.blit(score_text, score_rect)
+        overlay.blit(score_text, score_rect)
 
-        level_text = self.small_font.render(f"Level Reached: {self.level}", True, WHITE)
+        level_text = render_text(self.small_font, f"Level Reached: {self.level}", WHITE)
         level_rect = level_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 30))
-        self.screen.blit(level_text, level_rect)
+        overlay.blit(level_text, level_rect)
 
         # Button hints
-        restart_text = self.small_font.render("Press R to Restart", True, GREEN)
+        restart_text = render_text(self.small_font, "Press R to Restart", GREEN)
         restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 80))
-        self.screen.blit(restart_text, restart_rect)
+        overlay.blit(restart_text, restart_rect)
 
-        menu_text = self.small_font.render("Press ESC to Menu", True, YELLOW)
+        menu_text = render_text(self.small_font, "Press ESC to Menu", YELLOW)
         menu_rect = menu_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 110))
-        self.screen.blit(menu_text, menu_rect)
+        overlay.blit(menu_text, menu_rect)
+        return overlay
 
     def draw_level_complete(self):
+        # The overlay is composed once per state and score
+        key = (self.state, self.score)
+        overlay = self.overlay_cache.get(key, self.build_level_complete_overlay)
+        overlay.draw(self.screen)
+
+    def build_level_complete_overlay(self):
         # Semi-transparent background
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill((0, 50, 0))
-        self.screen.blit(overlay, (0, 0))
+        overlay = dim_overlay((SCREEN_WIDTH, SCREEN_HEIGHT), (0, 50, 0))
 
         # Level complete text
-        complete_text = self.font.render("LEVEL COMPLETE!", True, YELLOW)
+        complete_text = render_text(self.font, "LEVEL COMPLETE!", YELLOW)
         text_rect = complete_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
-        self.screen.blit(complete_text, text_rect)
+        overlay.blit(complete_text, text_rect)
 
         # Score bonus
-        bonus_text = self.small_font.render(f"Score: {self.score}", True, WHITE)
+        bonus_text = render_text(self.small_font, f"Score: {self.score}", WHITE)
         bonus_rect = bonus_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-        self.screen.blit(bonus_text, bonus_rect)
+        overlay.blit(bonus_text, bonus_rect)
 
         # Next level hint
-        next_text = self.small_font.render("Press SPACE for Next Level", True, WHITE)
+        next_text = render_text(self.small_font, "Press SPACE for Next Level", WHITE)
         next_rect = next_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50))
-        self.screen.blit(next_text, next_rect)
-
-    def run(self):
-        running = True
-
-        while running:
-            self.clock.tick(FPS)
-
-            # Event handling
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return False  # Exit program
-
-                if event.type == pygame.KEYDOWN:
-                    # ESC key - return to menu (works in any state)
-                    if event.key == pygame.K_ESCAPE:
-                        return True
-
-                    # State-specific key handling
-                    if self.state == GameState.WAITING and event.key == pygame.K_SPACE:
-                        self.ball.launch()
-                        self.state = GameState.PLAYING
-
-                    if self.state == GameState.GAME_OVER and event.key == pygame.K_r:
-                        self.reset_game()
-
-                    if self.state == GameState.LEVEL_COMPLETE and event.key == pygame.K_SPACE:
-                        self.level += 1
-                        self.lives += 1  # Bonus life for completing level
-                        self.create_level()
-
-            # Game logic
-            if self.state == GameState.PLAYING or self.state == GameState.WAITING:
+        overlay.blit(next_text, next_rect)
+        return overlay
+
+    def state_checksum(self):
+        """CRC32 of the simulation state, checked step by step on replay"""
+        state = (self.state.value, self.level, self.score, self.lives, self.paddle.x,
+                 self.ball.x, self.ball.y, self.ball.vel_x, self.ball.vel_y,
+                 tuple(brick.hits for brick in self.bricks))
+        return zlib.crc32(repr(state).encode())
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            return False  # Exit program
+
+        if event.type == pygame.KEYDOWN:
+            # ESC key - return to menu (works in any state)
+            if event.key == pygame.K_ESCAPE:
+                return True
+            self.handle_key(event.key)
+        return None
+
+    def handle_key(self, key):
+        # State-specific key handling
+        if self.state == GameState.WAITING and key == pygame.K_SPACE:
+            self.ball.launch()
+            self.state = GameState.PLAYING
+
+        if self.state == GameState.GAME_OVER and key == pygame.K_r:
+            self.reset_game()
+
+        if self.state == GameState.LEVEL_COMPLETE and key == pygame.K_SPACE:
+            self.level += 1
+            self.lives += 1  # Bonus life for completing level
+            self.create_level()
+
+    def step(self, inputs):
+        """Advance one simulation step from key inputs, without rendering"""
+        for key in inputs.pressed:
+            self.handle_key(key)
+        self.update(inputs.held_keys())
+
+    def update(self, keys=None):
+        # Remember positions for interpolated rendering even while paused
+        self.paddle.prev_x = self.paddle.x
+        self.ball.prev_x, self.ball.prev_y = self.ball.x, self.ball.y
+
+        # Game logic
+        if self.state == GameState.PLAYING or self.state == GameState.WAITING:
+            if keys is None:
                 keys = pygame.key.get_pressed()
-                self.paddle.move(keys)
-                self.ball.update(self.paddle)
-                self.ball.check_paddle_collision(self.paddle)
+            self.paddle.move(keys)
+            self.ball.update(self.paddle)
+            self.ball.check_paddle_collision(self.paddle)
 
-                if self.state == GameState.PLAYING:
+            if self.state == GameState.PLAYING:
+                with frame_profiler.section('collision'):
                     self.handle_collisions()
 
-                    # Check if ball fell off screen
-                    if self.ball.is_out_of_bounds():
-                        self.lives -= 1
-                        if self.lives <= 0:
-                            self.state = GameState.GAME_OVER
-                        else:
-                            self.ball.reset(self.paddle)
-                            self.state = GameState.WAITING
-
-            # Rendering
-            self.screen.fill(BLACK)
+                # Check if ball fell off screen
+                if self.ball.is_out_of_bounds():
+                    self.lives -= 1
+                    if self.lives <= 0:
+                        self.state = GameState.GAME_OVER
+                    else:
+                        self.ball.reset(self.paddle)
+                        self.state = GameState.WAITING
 
-            # Draw game elements
-            for brick in self.bricks:
-                brick.draw(self.screen)
+    def draw(self, alpha=1.0):
+        # Rendering
+        self.screen.fill(BLACK)
 
-            self.paddle.draw(self.screen)
-            self.ball.draw(self.screen)
-
-            # Draw UI
-            self.draw_ui()
-
-            # Draw game state overlays
-            if self.state == GameState.GAME_OVER:
-                self.draw_game_over()
-            elif self.state == GameState.LEVEL_COMPLETE:
-                self.draw_level_complete()
-
-            pygame.display.flip()
-
-        return False
+        # Draw game elements
+        for brick in self.bricks:
+            brick.draw(self.screen)
+
+        self.paddle.draw(self.screen, alpha)
+        self.ball.draw(self.screen, alpha)
+
+        # Draw UI
+        self.draw_ui()
+
+        # Draw game state overlays
+        if self.state == GameState.GAME_OVER:
+            self.draw_game_over()
+        elif self.state == GameState.LEVEL_COMPLETE:
+            self.draw_level_complete()
+
+    def dirty_rects(self):
+        """Screen areas that may have changed this frame, or None for all of it"""
+        state_changed = self.state != self.presented_state
+        self.presented_state = self.state
+        damaged, self.damaged_rects = self.damaged_rects, []
+        if state_changed:
+            return None
+        if self.state not in (GameState.PLAYING, GameState.WAITING):
+            return []  # The cached overlay screens don't change while shown
+
+        paddle = self.paddle
+        ball = self.ball
+        return damaged + list(HUD_RECTS) + [
+            motion_rect(paddle.prev_x, paddle.y, paddle.x, paddle.y,
+                        paddle.width, paddle.height),
+            motion_rect(ball.prev_x - ball.radius, ball.prev_y - ball.radius,
+                        ball.x - ball.radius, ball.y - ball.radius,
+                        ball.radius * 2, ball.radius * 2, margin=1),
+        ]
+
+    def pool_stats(self):
+        """Allocation statistics of the entity pools"""
+        return {'bricks': self.brick_pool.stats()}
+
+    def snapshot(self):
+        """Copy of the drawn state for the render thread in pipelined mode"""
+        return snapshot_view(self, paddle=copy.copy(self.paddle), ball=copy.copy(self.ball),
+                             bricks=copy_all(self.bricks))
+
+    def run(self, record_path=None, capture_path=None, pipelined=False):
+        pygame.display.set_caption("Breakout")
+        # Fixed simulation step: slow frames no longer slow the game down
+        return FixedStepLoop(self.clock, step_rate=FPS, render_fps=FPS).run(
+            self, record_path, capture_path, pipelined)
 
-def start_game(screen):
+def start_game(screen, record_path=None, capture_path=None, pipelined=False):
     """Entry point for breakout game"""
     game = BreakoutGame(screen)
-    return game.run()
+    return game.run(record_path, capture_path, pipelined)
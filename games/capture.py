@@ -0,0 +1,129 @@
+"""Frame capture to PNG sequences and animated GIFs, encoded on background threads"""
+import os
+import queue
+import struct
+import threading
+import zlib
+
+import pygame
+
+CAPTURE_QUEUE_SIZE = 120  # 60 FPS 下可缓冲 2 秒
+PNG_ENCODER_THREADS = 2
+GIF_MAX_FPS = 30  # GIF 帧时长以 10 毫秒为单位，60 FPS 无法准确表示
+PNG_COMPRESSION = 3
+
+
+def _png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data +
+            struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+
+def write_png(path, size, pixels, level=PNG_COMPRESSION):
+    """Write packed 8-bit RGB pixels as a PNG file
+
+    pygame.image.save holds the GIL while encoding, which would serialize
+    the encoder threads; zlib releases it, so they can run in parallel.
+    """
+    width, height = size
+    stride = width * 3
+    # 每行前加过滤类型 0（不过滤）
+    rows = b''.join(b'\x00' + pixels[y * stride:(y + 1) * stride] for y in range(height))
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(_png_chunk(b'IHDR', header))
+        f.write(_png_chunk(b'IDAT', zlib.compress(rows, level)))
+        f.write(_png_chunk(b'IEND', b''))
+
+
+class FrameCapture:
+    """Saves frames to a directory of frame_000000.png files, or to path if it ends in .gif
+
+    A full encoder queue drops the frame, or waits with block=True. GIFs need
+    Pillow and stay in memory until close(), so keep them to short clips.
+    """
+
+    def __init__(self, path, fps=60, queue_size=CAPTURE_QUEUE_SIZE, block=False,
+                 threads=PNG_ENCODER_THREADS):
+        self.path = path
+        self.block = block
+        self.gif = path.lower().endswith('.gif')
+        self.frames = 0  # 提交的帧数，包括被跳过和丢弃的帧
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+
+        if self.gif:
+            try:
+                from PIL import Image
+            except ImportError as e:
+                raise ImportError("GIF capture requires Pillow: pip install pillow") from e
+            self._image = Image
+            self._gif_frames = []
+            # 超过 GIF_MAX_FPS 时隔帧采样；GIF 帧必须按顺序写入，只用一个线程
+            self.frame_step = max(1, round(fps / GIF_MAX_FPS))
+            self.frame_duration = round(1000 * self.frame_step / fps)
+            threads = 1
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.frame_step = 1
+
+        self._threads = [threading.Thread(target=self._encode_loop, name='frame-encoder',
+                                          daemon=True)
+                         for i in range(threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def capture(self, surface):
+        """Queue a copy of surface's pixels; return False if the frame was not kept"""
+        frame = self.frames
+        self.frames += 1
+        if frame % self.frame_step:
+            return False
+        if not self.block and self._queue.full():
+            self.dropped += 1
+            return False
+        # 只有本线程往队列里放，检查过未满后 put 不会阻塞
+        self._queue.put((self.queued, surface.get_size(), pygame.image.tobytes(surface, 'RGB')))
+        self.queued += 1
+        return True
+
+    def _encode_loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            index, size, pixels = job
+            if self.gif:
+                image = self._image.frombytes('RGB', size, pixels)
+                self._gif_frames.append(image.quantize(colors=256))
+            else:
+                write_png(os.path.join(self.path, f"frame_{index:06d}.png"), size, pixels)
+            with self._lock:
+                self.written += 1
+
+    def close(self):
+        """Wait for the encoders to finish everything queued"""
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        if self.gif and self._gif_frames:
+            first, *rest = self._gif_frames
+            first.save(self.path, save_all=True, append_images=rest,
+                       duration=self.frame_duration, loop=0)
+            self._gif_frames = []
+
+    def summary(self):
+        return (f"Captured {self.written} frames to {self.path}"
+                f" ({self.dropped} dropped)")
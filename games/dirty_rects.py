@@ -0,0 +1,45 @@
+"""Partial display updates from the regions a game reports as changed by dirty_rects()"""
+import pygame
+
+FULL_UPDATE_COVERAGE = 0.4  # 脏区域超过屏幕的这个比例时，整屏翻转更便宜
+
+
+def motion_rect(prev_x, prev_y, x, y, width, height, margin=0):
+    """Rect covering an object drawn anywhere between two positions"""
+    return pygame.Rect(int(min(prev_x, x)) - margin, int(min(prev_y, y)) - margin,
+                       width + int(abs(x - prev_x)) + 2 * margin + 1,
+                       height + int(abs(y - prev_y)) + 2 * margin + 1)
+
+
+class DirtyRectPresenter:
+    """Presents dirty rects with the previous frame's as well, so vacated areas are repainted"""
+
+    def __init__(self, max_coverage=FULL_UPDATE_COVERAGE):
+        self.max_coverage = max_coverage
+        self.partial_frames = 0
+        self.full_frames = 0
+        self._previous = None
+
+    def present(self, rects):
+        """Show this frame; rects from the game's dirty_rects(), or None for a full update
+
+        The rects must cover everything that may differ from the previous frame,
+        including both positions of an interpolated object.
+        """
+        previous, self._previous = self._previous, rects
+        if rects is None or previous is None:
+            # 上一帧整屏更新过，或本帧要求整屏更新
+            pygame.display.flip()
+            self.full_frames += 1
+            return
+
+        screen_rect = pygame.display.get_surface().get_rect()
+        dirty = [rect.clip(screen_rect) for rect in rects + previous]
+        dirty = [rect for rect in dirty if rect.width and rect.height]
+        area = sum(rect.width * rect.height for rect in dirty)
+        if area > self.max_coverage * screen_rect.width * screen_rect.height:
+            pygame.display.flip()
+            self.full_frames += 1
+        else:
+            pygame.display.update(dirty)
+            self.partial_frames += 1
@@ -1,7 +1,16 @@
+import copy
 import pygame
 import random
+import zlib
 from enum import Enum
 
+from .. import frame_profiler, launch_timing
+from ..game_loop import FixedStepLoop, lerp
+from ..overlays import OverlayCache, dim_overlay
+from ..pipeline import copy_all, snapshot_view
+from ..pools import Pool
+from ..text_cache import get_font, render_outlined_text, render_text
+
 # Constants
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
@@ -30,6 +39,7 @@ class Bird:
         self.height = 24
         self.x = 100
         self.y = SCREEN_HEIGHT // 2
+        self.prev_y = self.y  # Position at the previous simulation step
         self.velocity = 0
         self.gravity = 0.5
         self.jump_strength = -10
@@ -53,10 +63,10 @@ class Bird:
         if self.velocity > 10:
             self.velocity = 10
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1.0):
         # Draw bird body (circle)
         center_x = int(self.x + self.width // 2)
-        center_y = int(self.y + self.height // 2)
+        center_y = int(lerp(self.prev_y, self.y, alpha) + self.height // 2)
 
         # Body
         pygame.draw.circle(screen, YELLOW, (center_x, center_y), self.width // 2)
@@ -86,13 +96,21 @@ class Bird:
 
     def reset(self):
         self.y = SCREEN_HEIGHT // 2
+        self.prev_y = self.y
         self.velocity = 0
         self.rotation = 0
 
 # Pipe class
 class Pipe:
-    def __init__(self, x):
+    __slots__ = ('x', 'prev_x', 'width', 'gap', 'speed', 'gap_y', 'passed')
+
+    def __init__(self, x, rng=random):
+        self.reset(x, rng)
+
+    def reset(self, x, rng=random):
+        # Re-initialise a pipe taken from the pool
         self.x = x
+        self.prev_x = x  # Position at the previous simulation step
         self.width = 60
         self.gap = 150
         self.speed = 3
@@ -100,23 +118,25 @@ class Pipe:
         # Random gap position
         min_height = 100
         max_height = SCREEN_HEIGHT - self.gap - 100
-        self.gap_y = random.randint(min_height, max_height)
+        self.gap_y = rng.randint(min_height, max_height)
 
         self.passed = False
 
     def update(self):
         self.x -= self.speed
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1.0):
+        x = lerp(self.prev_x, self.x, alpha)
+
         # Top pipe
         top_pipe_height = self.gap_y
-        top_pipe_rect = pygame.Rect(self.x, 0, self.width, top_pipe_height)
+        top_pipe_rect = pygame.Rect(x, 0, self.width, top_pipe_height)
         pygame.draw.rect(screen, GREEN, top_pipe_rect)
         pygame.draw.rect(screen, DARK_GREEN, top_pipe_rect, 3)
 
         # Top pipe cap
         cap_height = 25
-        top_cap_rect = pygame.Rect(self.x - 5, top_pipe_height - cap_height,
+        top_cap_rect = pygame.Rect(x - 5, top_pipe_height - cap_height,
                                     self.width + 10, cap_height)
         pygame.draw.rect(screen, GREEN, top_cap_rect)
         pygame.draw.rect(screen, DARK_GREEN, top_cap_rect, 3)
@@ -124,12 +144,12 @@ class Pipe:
         # Bottom pipe
         bottom_pipe_y = self.gap_y + self.gap
         bottom_pipe_height = SCREEN_HEIGHT - bottom_pipe_y
-        bottom_pipe_rect = pygame.Rect(self.x, bottom_pipe_y, self.width, bottom_pipe_height)
+        bottom_pipe_rect = pygame.Rect(x, bottom_pipe_y, self.width, bottom_pipe_height)
         pygame.draw.rect(screen, GREEN, bottom_pipe_rect)
         pygame.draw.rect(screen, DARK_GREEN, bottom_pipe_rect, 3)
 
         # Bottom pipe cap
-        bottom_cap_rect = pygame.Rect(self.x - 5, bottom_pipe_y,
+        bottom_cap_rect = pygame.Rect(x - 5, bottom_pipe_y,
                                        self.width + 10, cap_height)
         pygame.draw.rect(screen, GREEN, bottom_cap_rect)
         pygame.draw.rect(screen, DARK_GREEN, bottom_cap_rect, 3)
@@ -144,6 +164,9 @@ class Pipe:
     def is_off_screen(self):
         return self.x + self.width < 0
 
+    def is_on_screen(self):
+        return not self.is_off_screen()
+
 # Ground class
 class Ground:
     def __init__(self):
@@ -151,53 +174,72 @@ class Ground:
         self.y = SCREEN_HEIGHT - self.height
         self.x1 = 0
         self.x2 = SCREEN_WIDTH
+        self.scroll = 0  # Distance scrolled during the last simulation step
         self.speed = 3
 
     def update(self):
         self.x1 -= self.speed
         self.x2 -= self.speed
+        self.scroll = self.speed
 
         if self.x1 <= -SCREEN_WIDTH:
             self.x1 = self.x2 + SCREEN_WIDTH
         if self.x2 <= -SCREEN_WIDTH:
             self.x2 = self.x1 + SCREEN_WIDTH
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1.0):
+        # Interpolate by scroll distance so wrapping tiles don't jump
+        offset = self.scroll * (1 - alpha)
+        x1 = self.x1 + offset
+        x2 = self.x2 + offset
+
         # Draw ground tiles
-        rect1 = pygame.Rect(self.x1, self.y, SCREEN_WIDTH, self.height)
-        rect2 = pygame.Rect(self.x2, self.y, SCREEN_WIDTH, self.height)
+        rect1 = pygame.Rect(x1, self.y, SCREEN_WIDTH, self.height)
+        rect2 = pygame.Rect(x2, self.y, SCREEN_WIDTH, self.height)
 
         pygame.draw.rect(screen, BROWN, rect1)
         pygame.draw.rect(screen, BROWN, rect2)
 
         # Draw grass on top
         grass_height = 10
-        pygame.draw.rect(screen, GREEN, (self.x1, self.y, SCREEN_WIDTH, grass_height))
-        pygame.draw.rect(screen, GREEN, (self.x2, self.y, SCREEN_WIDTH, grass_height))
+        pygame.draw.rect(screen, GREEN, (x1, self.y, SCREEN_WIDTH, grass_height))
+        pygame.draw.rect(screen, GREEN, (x2, self.y, SCREEN_WIDTH, grass_height))
 
         # Draw some texture lines
         for i in range(0, SCREEN_WIDTH, 40):
             pygame.draw.line(screen, DARK_GREEN,
-                           (self.x1 + i, self.y),
-                           (self.x1 + i, self.y + self.height), 2)
+                           (x1 + i, self.y),
+                           (x1 + i, self.y + self.height), 2)
             pygame.draw.line(screen, DARK_GREEN,
-                           (self.x2 + i, self.y),
-                           (self.x2 + i, self.y + self.height), 2)
+                           (x2 + i, self.y),
+                           (x2 + i, self.y + self.height), 2)
 
     def get_rect(self):
         return pygame.Rect(0, self.y, SCREEN_WIDTH, self.height)
 
 # Flappy Bird game class
 class FlappyGame:
-    def __init__(self, screen):
-        self.screen = screen
-        pygame.display.set_caption("Flappy Bird")
+    GAME_ID = 'flappy'
+    # Keys the game reads; recordings encode inputs with this table
+    INPUT_KEYS = (pygame.K_SPACE, pygame.K_r)
+
+    def __init__(self, screen, seed=None):
+        self.screen = screen  # None when simulating headless
+        # Per-session RNG: the same seed and inputs replay the same game
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 72)
-        self.small_font = pygame.font.Font(None, 36)
-        self.tiny_font = pygame.font.Font(None, 24)
+        self.font = get_font(72)
+        self.small_font = get_font(36)
+        self.tiny_font = get_font(24)
+        self.overlay_cache = OverlayCache()
+
+        # Pipes leaving the screen are reused for new ones
+        self.pipes = []
+        self.pipe_pool = Pool(Pipe)
 
         self.reset_game()
+        launch_timing.mark('constructed')
 
     def reset_game(self):
         self.state = GameState.READY
@@ -205,14 +247,16 @@ class FlappyGame:
         self.high_score = getattr(self, 'high_score', 0)
 
         self.bird = Bird()
+        self.pipe_pool.release_all(self.pipes)
         self.pipes = []
         self.ground = Ground()
 
         self.pipe_spawn_timer = 0
         self.pipe_spawn_interval = 90  # Spawn pipe every 1.5 seconds
+        self.ready_steps = 0
 
     def spawn_pipe(self):
-        self.pipes.append(Pipe(SCREEN_WIDTH))
+        self.pipes.append(self.pipe_pool.acquire(SCREEN_WIDTH, self.rng))
 
     def handle_collisions(self):
         bird_rect = self.bird.get_rect()
@@ -260,167 +304,176 @@ class FlappyGame:
         pygame.draw.circle(self.screen, WHITE, (x + 20, y - 15), 20)
 
     def draw_ui(self):
-        # Draw score
-        score_text = self.font.render(str(self.score), True, WHITE)
-        score_outline = self.font.render(str(self.score), True, BLACK)
-
+        # Draw score with its outline, composed once per score
+        score_text = render_outlined_text(self.font, str(self.score), WHITE, BLACK)
         text_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, 50))
-
-        # Draw outline
-        for dx, dy in [(-2, -2), (-2, 2), (2, -2), (2, 2)]:
-            outline_rect = text_rect.copy()
-            outline_rect.x += dx
-            outline_rect.y += dy
-            self.screen.blit(score_outline, outline_rect)
-
         self.screen.blit(score_text, text_rect)
 
     def draw_ready_screen(self):
         # Draw "Ready" message
-        ready_text = self.font.render("READY", True, WHITE)
-        ready_outline = self.font.render("READY", True, BLACK)
+        ready_text = render_outlined_text(self.font, "READY", WHITE, BLACK)
         ready_rect = ready_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
-
-        for dx, dy in [(-2, -2), (-2, 2), (2, -2), (2, 2)]:
-            outline_rect = ready_rect.copy()
-            outline_rect.x += dx
-            outline_rect.y += dy
-            self.screen.blit(ready_outline, outline_rect)
-
         self.screen.blit(ready_text, ready_rect)
 
         # Draw instruction
-        instruction_text = self.tiny_font.render("Press SPACE to start", True, WHITE)
+        instruction_text = render_text(self.tiny_font, "Press SPACE to start", WHITE)
         instruction_rect = instruction_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20))
         self.screen.blit(instruction_text, instruction_rect)
 
     def draw_game_over(self):
+        # The overlay is composed once per state and score
+        key = (self.state, self.score, self.high_score)
+        overlay = self.overlay_cache.get(key, self.build_game_over_overlay)
+        overlay.draw(self.screen)
+
+    def build_game_over_overlay(self):
         # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        overlay = dim_overlay((SCREEN_WIDTH, SCREEN_HEIGHT), BLACK)
 
         # Game over text
-        game_over_text = self.font.render("GAME OVER", True, WHITE)
-        game_over_outline = self.font.render("GAME OVER", True, BLACK)
+        game_over_text = render_outlined_text(self.font, "GAME OVER", WHITE, BLACK)
         text_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 80))
-
-        for dx, dy in [(-2, -2), (-2, 2), (2, -2), (2, 2)]:
-            outline_rect = text_rect.copy()
-            outline_rect.x += dx
-            outline_rect.y += dy
-            self.screen.blit(game_over_outline, outline_rect)
-
-        self.screen.blit(game_over_text, text_rect)
+        overlay.blit(game_over_text, text_rect)
 
         # Score display
-        score_text = self.small_font.render(f"Score: {self.score}", True, WHITE)
+        score_text = render_text(self.small_font, f"Score: {self.score}", WHITE)
         score_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 20))
-        self.screen.blit(score_text, score_rect)
+        overlay.blit(score_text, score_rect)
 
         # High score
-        high_score_text = self.small_font.render(f"Best: {self.high_score}", True, YELLOW)
+        high_score_text = render_text(self.small_font, f"Best: {self.high_score}", YELLOW)
         high_score_rect = high_score_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20))
-        self.screen.blit(high_score_text, high_score_rect)
+        overlay.blit(high_score_text, high_score_rect)
 
         # Instructions
-        restart_text = self.tiny_font.render("Press R to Restart", True, GREEN)
+        restart_text = render_text(self.tiny_font, "Press R to Restart", GREEN)
         restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 70))
-        self.screen.blit(restart_text, restart_rect)
+        overlay.blit(restart_text, restart_rect)
 
-        menu_text = self.tiny_font.render("Press ESC to Menu", True, YELLOW)
+        menu_text = render_text(self.tiny_font, "Press ESC to Menu", YELLOW)
         menu_rect = menu_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 100))
-        self.screen.blit(menu_text, menu_rect)
-
-    def run(self):
-        running = True
-
-        while running:
-            self.clock.tick(FPS)
-
-            # Event handling
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return False
-
-                if event.type == pygame.KEYDOWN:
-                    # ESC - return to menu
-                    if event.key == pygame.K_ESCAPE:
-                        return True
-
-                    # Space - jump or start game
-                    if event.key == pygame.K_SPACE:
-                        if self.state == GameState.READY:
-                            self.state = GameState.PLAYING
-                            self.bird.jump()
-                        elif self.state == GameState.PLAYING:
-                            self.bird.jump()
-
-                    # R - restart game
-                    if self.state == GameState.GAME_OVER and event.key == pygame.K_r:
-                        self.reset_game()
-
-            # Game logic
-            if self.state == GameState.PLAYING:
-                # Update bird
-                self.bird.update()
-
-                # Update ground
-                self.ground.update()
-
-                # Update pipes
-                for pipe in self.pipes:
-                    pipe.update()
-
-                # Remove off-screen pipes
-                self.pipes = [pipe for pipe in self.pipes if not pipe.is_off_screen()]
+        overlay.blit(menu_text, menu_rect)
+        return overlay
+
+    def state_checksum(self):
+        """CRC32 of the simulation state, checked step by step on replay"""
+        state = (self.state.value, self.score, self.bird.y, self.bird.velocity,
+                 self.pipe_spawn_timer, tuple((pipe.x, pipe.gap_y) for pipe in self.pipes))
+        return zlib.crc32(repr(state).encode())
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            return False
+
+        if event.type == pygame.KEYDOWN:
+            # ESC - return to menu
+            if event.key == pygame.K_ESCAPE:
+                return True
+            self.handle_key(event.key)
+        return None
+
+    def handle_key(self, key):
+        # Space - jump or start game
+        if key == pygame.K_SPACE:
+            if self.state == GameState.READY:
+                self.state = GameState.PLAYING
+                self.bird.jump()
+            elif self.state == GameState.PLAYING:
+                self.bird.jump()
 
-                # Spawn new pipes
-                self.pipe_spawn_timer += 1
-                if self.pipe_spawn_timer >= self.pipe_spawn_interval:
-                    self.spawn_pipe()
-                    self.pipe_spawn_timer = 0
+        # R - restart game
+        if self.state == GameState.GAME_OVER and key == pygame.K_r:
+            self.reset_game()
 
-                # Update score
-                self.update_score()
+    def step(self, inputs):
+        """Advance one simulation step from key inputs, without rendering"""
+        for key in inputs.pressed:
+            self.handle_key(key)
+        self.update()
 
-                # Check collisions
-                if self.handle_collisions():
-                    self.state = GameState.GAME_OVER
+    def update(self, keys=None):
+        # Remember positions for interpolated rendering even while paused
+        self.bird.prev_y = self.bird.y
+        for pipe in self.pipes:
+            pipe.prev_x = pipe.x
+        self.ground.scroll = 0
 
-            elif self.state == GameState.READY:
-                # Gentle floating animation
-                self.bird.y = SCREEN_HEIGHT // 2 + int(10 * __import__('math').sin(pygame.time.get_ticks() / 200))
-                self.ground.update()
+        # Game logic
+        if self.state == GameState.PLAYING:
+            # Update bird
+            self.bird.update()
 
-            # Rendering
-            self.draw_background()
+            # Update ground
+            self.ground.update()
 
-            # Draw pipes
+            # Update pipes
             for pipe in self.pipes:
-                pipe.draw(self.screen)
+                pipe.update()
+
+            # Remove off-screen pipes
+            self.pipes = self.pipe_pool.keep(self.pipes, Pipe.is_on_screen)
+
+            # Spawn new pipes
+            self.pipe_spawn_timer += 1
+            if self.pipe_spawn_timer >= self.pipe_spawn_interval:
+                self.spawn_pipe()
+                self.pipe_spawn_timer = 0
+
+            # Update score
+            self.update_score()
+
+            # Check collisions
+            with frame_profiler.section('collision'):
+                crashed = self.handle_collisions()
+            if crashed:
+                self.state = GameState.GAME_OVER
+
+        elif self.state == GameState.READY:
+            # Gentle floating animation, driven by simulation steps
+            self.ready_steps += 1
+            ready_ms = self.ready_steps * 1000 / FPS
+            self.bird.y = SCREEN_HEIGHT // 2 + int(10 * __import__('math').sin(ready_ms / 200))
+            self.ground.update()
+
+    def draw(self, alpha=1.0):
+        # Rendering
+        self.draw_background()
+
+        # Draw pipes
+        for pipe in self.pipes:
+            pipe.draw(self.screen, alpha)
 
-            # Draw ground
-            self.ground.draw(self.screen)
+        # Draw ground
+        self.ground.draw(self.screen, alpha)
 
-            # Draw bird
-            self.bird.draw(self.screen)
+        # Draw bird
+        self.bird.draw(self.screen, alpha)
 
-            # Draw UI based on state
-            if self.state == GameState.READY:
-                self.draw_ready_screen()
-            elif self.state == GameState.PLAYING:
-                self.draw_ui()
-            elif self.state == GameState.GAME_OVER:
-                self.draw_ui()
-                self.draw_game_over()
+        # Draw UI based on state
+        if self.state == GameState.READY:
+            self.draw_ready_screen()
+        elif self.state == GameState.PLAYING:
+            self.draw_ui()
+        elif self.state == GameState.GAME_OVER:
+            self.draw_ui()
+            self.draw_game_over()
 
-            pygame.display.flip()
+    def pool_stats(self):
+        """Allocation statistics of the entity pools"""
+        return {'pipes': self.pipe_pool.stats()}
 
-        return False
+    def snapshot(self):
+        """Copy of the drawn state for the render thread in pipelined mode"""
+        return snapshot_view(self, bird=copy.copy(self.bird), pipes=copy_all(self.pipes),
+                             ground=copy.copy(self.ground))
+
+    def run(self, record_path=None, capture_path=None, pipelined=False):
+        pygame.display.set_caption("Flappy Bird")
+        # Fixed simulation step: slow frames no longer slow the game down
+        return FixedStepLoop(self.clock, step_rate=FPS, render_fps=FPS).run(
+            self, record_path, capture_path, pipelined)
 
-def start_game(screen):
+def start_game(screen, record_path=None, capture_path=None, pipelined=False):
     """Entry point for Flappy Bird game"""
     game = FlappyGame(screen)
-    return game.run()
+    return game.run(record_path, capture_path, pipelined)
@@ -0,0 +1,202 @@
+"""Per-frame phase profiler: F3 toggles a p50/p95/p99 overlay, F4 writes a Chrome trace"""
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import pygame
+
+HISTORY_FRAMES = 600  # 环形缓冲，60 FPS 下约 10 秒，卡顿之前的帧仍在
+OVERLAY_REFRESH_FRAMES = 30  # 数字每半秒刷新一次，方便阅读
+TOGGLE_KEY = pygame.K_F3
+DUMP_KEY = pygame.K_F4  # 写出 chrome://tracing 或 ui.perfetto.dev 可读的 JSON
+PHASES = ('events', 'update', 'collision', 'draw', 'flip')
+PERCENTILES = (50, 95, 99)
+
+_NO_SECTION = contextlib.nullcontext()
+# 每个线程单独记录；流水线模式下模拟线程的 section() 不计入渲染线程的帧
+_active = threading.local()
+
+
+def section(name):
+    """Time a block as phase `name` of the current frame
+
+    The time is subtracted from the enclosing phase. Outside a profiled loop
+    (headless runs, replays, benchmarks) this is a no-op.
+    """
+    profiler = getattr(_active, 'profiler', None)
+    if profiler is None:
+        return _NO_SECTION
+    return _Section(profiler, name)
+
+
+@contextlib.contextmanager
+def activated(profiler):
+    """Make profiler the target of section() on this thread for the duration of a loop"""
+    previous = getattr(_active, 'profiler', None)
+    _active.profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _active.profiler = previous
+
+
+class _Section:
+    __slots__ = ('profiler', 'name')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.begin(self.name)
+
+    def __exit__(self, *exc_info):
+        self.profiler.end()
+
+
+class Frame:
+    """Timings of one rendered frame"""
+
+    __slots__ = ('start', 'duration', 'totals', 'spans')
+
+    def __init__(self, start, duration, totals, spans):
+        self.start = start
+        self.duration = duration
+        self.totals = totals  # {phase: 秒}，不含嵌套子阶段
+        self.spans = spans  # [(phase, start, duration), ...]
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1,
+                      int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class FrameProfiler:
+    def __init__(self, history=HISTORY_FRAMES):
+        self.frames = deque(maxlen=history)
+        self.visible = False
+        self._frame_start = None
+        self._stack = []
+        self._spans = []
+        self._totals = {}
+        self._overlay = None
+        self._frames_since_overlay = 0
+        self._font = None
+
+    def begin_frame(self):
+        self._frame_start = time.perf_counter()
+        self._stack = []
+        self._spans = []
+        self._totals = {}
+
+    def begin(self, phase):
+        # (阶段, 开始时间, 已计入子阶段的时间)
+        self._stack.append([phase, time.perf_counter(), 0.0])
+
+    def end(self):
+        phase, start, children = self._stack.pop()
+        duration = time.perf_counter() - start
+        self._spans.append((phase, start, duration))
+        self._totals[phase] = self._totals.get(phase, 0.0) + duration - children
+        if self._stack:
+            self._stack[-1][2] += duration
+
+    def end_frame(self):
+        duration = time.perf_counter() - self._frame_start
+        self.frames.append(Frame(self._frame_start, duration, self._totals, self._spans))
+        self._frames_since_overlay += 1
+
+    def handle_event(self, event):
+        """Handle the profiler hotkeys; return True if the event was consumed"""
+        if event.type != pygame.KEYDOWN:
+            return False
+        if event.key == TOGGLE_KEY:
+            self.visible = not self.visible
+            self._overlay = None
+            return True
+        if event.key == DUMP_KEY:
+            path = self.dump_trace()
+            print(f"Frame trace written to {path}")
+            return True
+        return False
+
+    def stats(self):
+        """{phase: {percentile: seconds}} over the buffered frames, plus 'frame'"""
+        result = {}
+        for phase in PHASES + ('frame',):
+            if phase == 'frame':
+                values = sorted(frame.duration for frame in self.frames)
+            else:
+                values = sorted(frame.totals.get(phase, 0.0) for frame in self.frames)
+            result[phase] = {p: percentile(values, p) for p in PERCENTILES}
+        return result
+
+    def trace_events(self):
+        if not self.frames:
+            return []
+        origin = self.frames[0].start
+        pid = os.getpid()
+
+        def event(name, start, duration):
+            return {'name': name, 'ph': 'X', 'pid': pid, 'tid': 1, 'cat': 'frame',
+                    'ts': (start - origin) * 1e6, 'dur': duration * 1e6}
+
+        events = []
+        for frame in self.frames:
+            events.append(event('frame', frame.start, frame.duration))
+            events.extend(event(*span) for span in frame.spans)
+        return events
+
+    def dump_trace(self, path=None):
+        if path is None:
+            path = time.strftime('frame_trace_%Y%m%d_%H%M%S.json')
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    def _render_overlay(self):
+        if self._font is None:
+            from .text_cache import get_font
+            self._font = get_font(20)
+        stats = self.stats()
+        rows = [['ms'] + [f"p{p}" for p in PERCENTILES]]
+        for phase in PHASES + ('frame',):
+            rows.append([phase] + [f"{stats[phase][p] * 1e3:.2f}" for p in PERCENTILES])
+
+        # 默认字体不是等宽字体，按列分别渲染并右对齐数字
+        label_width = 90
+        column_width = 55
+        line_height = self._font.get_linesize()
+        width = label_width + column_width * len(PERCENTILES) + 16
+        height = line_height * (len(rows) + 1) + 12
+        overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+        for i, row in enumerate(rows):
+            y = 6 + i * line_height
+            # 数字每次都不同，直接渲染，不占用共享文字缓存
+            overlay.blit(self._font.render(row[0], True, (255, 255, 255)), (8, y))
+            for j, cell in enumerate(row[1:]):
+                text = self._font.render(cell, True, (255, 255, 255))
+                right = 8 + label_width + column_width * (j + 1)
+                overlay.blit(text, (right - text.get_width(), y))
+        footer = self._font.render(f"{len(self.frames)} frames, F4 saves a trace",
+                                   True, (180, 180, 180))
+        overlay.blit(footer, (8, 6 + len(rows) * line_height))
+        return overlay
+
+    def draw_overlay(self, screen):
+        """Draw the overlay if visible; return the Rect it covers, or None"""
+        if not self.visible:
+            return None
+        if self._overlay is None or self._frames_since_overlay >= OVERLAY_REFRESH_FRAMES:
+            self._overlay = self._render_overlay()
+            self._frames_since_overlay = 0
+        return screen.blit(self._overlay,
+                           (10, screen.get_height() - self._overlay.get_height() - 10))
@@ -0,0 +1,133 @@
+"""Fixed-timestep game loop shared by all games"""
+import contextlib
+
+import pygame
+
+from . import frame_profiler, launch_timing
+from .dirty_rects import DirtyRectPresenter
+
+SIM_RATE = 60  # 模拟步数/秒，游戏中以帧计的计时器都按此换算
+MAX_CATCH_UP_STEPS = 5
+
+
+def lerp(previous, current, alpha):
+    """Interpolate between the previous and current simulation state"""
+    return previous + (current - previous) * alpha
+
+
+class FixedStepLoop:
+    """Advances the simulation in fixed steps of 1 / step_rate seconds, whatever the render speed"""
+
+    def __init__(self, clock, step_rate=SIM_RATE, render_fps=SIM_RATE,
+                 max_catch_up=MAX_CATCH_UP_STEPS, partial_updates=True):
+        self.clock = clock
+        self.step_time = 1.0 / step_rate
+        self.render_fps = render_fps  # 0 表示不限制渲染帧率
+        self.max_catch_up = max_catch_up
+        self.accumulator = 0.0
+        self.steps = 0
+        self.frames = 0
+        self.dropped_steps = 0
+        self.recorder = None
+        self.capture = None
+        self.profiler = frame_profiler.FrameProfiler()
+        # 只更新变化区域；游戏没有 dirty_rects() 时总是整屏翻转
+        self.presenter = DirtyRectPresenter() if partial_updates else None
+
+    def step(self, game):
+        """Run one simulation step"""
+        if self.recorder is None:
+            game.update()
+        else:
+            # 录制时由记录器读取按键状态，保证回放看到的输入完全一致
+            game.update(self.recorder.next_held_keys())
+            self.recorder.end_step(game.state_checksum())
+
+    def advance(self, game, frame_time):
+        """Run the simulation steps owed for frame_time seconds; return alpha"""
+        self.accumulator += frame_time
+        steps = 0
+        while self.accumulator >= self.step_time:
+            if steps >= self.max_catch_up:
+                # 超出追赶上限，丢弃积压的时间
+                dropped = int(self.accumulator / self.step_time)
+                self.dropped_steps += dropped
+                self.accumulator -= dropped * self.step_time
+                break
+            self.profiler.begin('update')
+            self.step(game)
+            self.profiler.end()
+            self.accumulator -= self.step_time
+            steps += 1
+        self.steps += steps
+        return self.accumulator / self.step_time
+
+    def run(self, game, record_path=None, capture_path=None, pipelined=False):
+        """Run game until handle_event(event) returns a value, and return that value
+
+        The game provides update(keys=None), draw(alpha) without flipping, and
+        optionally dirty_rects(); pipelined=True also needs snapshot().
+        """
+        with contextlib.ExitStack() as stack:
+            if record_path is not None:
+                from .replay import SessionRecorder
+                self.recorder = stack.enter_context(SessionRecorder(record_path, game))
+            if capture_path is not None:
+                from .capture import FrameCapture
+                self.capture = stack.enter_context(
+                    FrameCapture(capture_path, fps=self.render_fps or SIM_RATE))
+            result = self._run(game, pipelined)
+
+        if self.capture is not None:
+            print(self.capture.summary())
+        return result
+
+    def _run(self, game, pipelined=False):
+        with frame_profiler.activated(self.profiler):
+            if pipelined:
+                from .pipeline import run_pipelined
+                return run_pipelined(self, game)
+            return self._loop(game)
+
+    def _loop(self, game):
+        profiler = self.profiler
+        self.clock.tick()  # 丢弃进入游戏之前经过的时间
+
+        while True:
+            frame_time = self.clock.tick(self.render_fps) / 1000.0
+            profiler.begin_frame()
+
+            profiler.begin('events')
+            for event in pygame.event.get():
+                if profiler.handle_event(event):
+                    continue
+                result = game.handle_event(event)
+                if result is not None:
+                    return result
+                if self.recorder is not None:
+                    self.recorder.key_event(event)
+            profiler.end()
+
+            alpha = self.advance(game, frame_time)
+
+            profiler.begin('draw')
+            game.draw(alpha)
+            profiler.end()
+            if self.capture is not None:
+                profiler.begin('capture')
+                self.capture.capture(pygame.display.get_surface())
+                profiler.end()
+            overlay_rect = profiler.draw_overlay(pygame.display.get_surface())
+
+            profiler.begin('flip')
+            if self.presenter is None or not hasattr(game, 'dirty_rects'):
+                pygame.display.flip()
+            else:
+                rects = game.dirty_rects()
+                if rects is not None and overlay_rect is not None:
+                    rects.append(overlay_rect)
+                self.presenter.present(rects)
+            profiler.end()
+            profiler.end_frame()
+            self.frames += 1
+            launch_timing.mark('first_frame')
@@ -0,0 +1,99 @@
+"""Display-free simulation: drives a game through step(inputs) as fast as the CPU allows"""
+import argparse
+import importlib
+import random
+import time
+
+import pygame
+
+from .game_loop import SIM_RATE
+
+GAME_CLASSES = {
+    'tank': ('games.tank.tank_game', 'TankGame'),
+    'breakout': ('games.breakout.breakout_game', 'BreakoutGame'),
+    'flappy': ('games.flappy.flappy_game', 'FlappyGame'),
+    'snake': ('games.snake.snake_game', 'SnakeGame'),
+}
+
+
+class HeldKeys:
+    """Stands in for pygame.key.get_pressed() with a set of key codes"""
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    def __getitem__(self, key):
+        return key in self.keys
+
+
+class Inputs:
+    """Keys newly pressed during one step, and keys held down for it"""
+
+    __slots__ = ('pressed', 'held')
+
+    def __init__(self, pressed=(), held=frozenset()):
+        self.pressed = tuple(pressed)
+        self.held = frozenset(held)
+
+    def held_keys(self):
+        return HeldKeys(self.held)
+
+
+NO_INPUT = Inputs()
+
+
+def get_game_class(name):
+    module_name, class_name = GAME_CLASSES[name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_game(name, seed=None):
+    """Construct a game for headless stepping (no window is opened)"""
+    pygame.font.init()  # 游戏构造时会创建字体，但不会渲染任何东西
+    return get_game_class(name)(None, seed)
+
+
+def random_policy(keys, seed=None, press_chance=0.05):
+    """Return a policy that presses and holds random keys from `keys`"""
+    rng = random.Random(seed)
+    held = frozenset()
+
+    def policy(game, step):
+        nonlocal held
+        pressed = (rng.choice(keys),) if rng.random() < press_chance else ()
+        if rng.random() < press_chance:
+            held = frozenset((rng.choice(keys),))
+        return Inputs(pressed, held)
+
+    return policy
+
+
+def run(game, steps, policy=None):
+    """Step a game `steps` times; return the elapsed wall-clock seconds"""
+    start = time.perf_counter()
+    for i in range(steps):
+        game.step(policy(game, i) if policy else NO_INPUT)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a game without a display")
+    parser.add_argument('game', choices=sorted(GAME_CLASSES))
+    parser.add_argument('--steps', type=int, default=100000)
+    parser.add_argument('--random-input', action='store_true',
+                        help="press random game keys instead of idling")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="seed for the game session and the random input")
+    args = parser.parse_args()
+
+    game = create_game(args.game, args.seed)
+    policy = random_policy(game.INPUT_KEYS, args.seed) if args.random_input else None
+    elapsed = run(game, args.steps, policy)
+
+    realtime = args.steps / SIM_RATE
+    print(f"{args.game}: {args.steps} steps in {elapsed:.3f} s "
+          f"({args.steps / elapsed:,.0f} steps/s, {realtime / elapsed:,.0f}x real time)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""Launch phase timestamps reported by the games to the platform"""
+import time
+
+_marks = {}
+_listener = None
+
+
+def reset():
+    # 平台在启动游戏前调用
+    _marks.clear()
+
+
+def set_listener(callback):
+    """Call callback(phase, timestamp) whenever a phase is first marked"""
+    global _listener
+    _listener = callback
+
+
+def mark(phase):
+    """Record phase ('constructed', 'first_frame'); only the first mark of each phase is kept"""
+    if phase not in _marks:
+        _marks[phase] = time.perf_counter()
+        if _listener is not None:
+            _listener(phase, _marks[phase])
+
+
+def get(phase):
+    return _marks.get(phase)
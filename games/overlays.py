@@ -0,0 +1,50 @@
+"""Cached full-screen overlays for paused game states, rebuilt only when their key changes"""
+import pygame
+
+OVERLAY_ALPHA = 200
+
+
+class Overlay:
+    """A translucent panel with text drawn over it at full opacity, as the games always drew it"""
+
+    def __init__(self, size, color, alpha=OVERLAY_ALPHA):
+        panel = pygame.Surface(size)
+        if pygame.display.get_surface() is not None:
+            panel = panel.convert()
+        panel.fill(color)
+        panel.set_alpha(alpha)
+        self.panel = panel
+        self.texts = []  # (文字图像, 位置)，文字图像由文字缓存共享
+
+    def blit(self, source, dest):
+        self.texts.append((source, dest))
+
+    def draw(self, screen):
+        screen.blit(self.panel, (0, 0))
+        screen.blits(self.texts, doreturn=False)
+
+
+def dim_overlay(size, color, alpha=OVERLAY_ALPHA):
+    """An empty Overlay to add an overlay's text to with blit()"""
+    return Overlay(size, color, alpha)
+
+
+class OverlayCache:
+    """Holds the most recently built overlay and the key it was built for"""
+
+    def __init__(self):
+        self.key = None
+        self.overlay = None
+        self.builds = 0
+
+    def get(self, key, build):
+        """The Overlay from build(), reused while key (state and numbers shown) is unchanged"""
+        if self.overlay is None or key != self.key:
+            self.key = key
+            self.overlay = build()
+            self.builds += 1
+        return self.overlay
+
+    def clear(self):
+        self.key = None
+        self.overlay = None
@@ -0,0 +1,170 @@
+"""Pipelined mode: the simulation runs on its own thread and publishes snapshots to draw"""
+import copy
+import queue
+import threading
+import time
+
+import pygame
+
+from . import launch_timing
+
+
+def snapshot_view(game, **entities):
+    """A copy of game's attributes, with entities replaced by the given copies
+
+    Games return this from snapshot(). The simulation never touches a published
+    snapshot again, so the render thread draws it without locking.
+    """
+    view = object.__new__(type(game))
+    view.__dict__.update(game.__dict__)
+    view.__dict__.update(entities)
+    return view
+
+
+def copy_all(objects):
+    """Shallow copies of a list of entities"""
+    return [copy.copy(obj) for obj in objects]
+
+
+class SnapshotBuffer:
+    """Two slots: the simulation fills the back one and then swaps"""
+
+    def __init__(self):
+        self._slots = [None, None]
+        self._front = 0
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def publish(self, snapshot, timestamp):
+        back = 1 - self._front
+        self._slots[back] = (snapshot, timestamp)
+        with self._lock:
+            self._front = back
+        self.published += 1
+
+    def latest(self):
+        """(snapshot, publish time) of the newest snapshot"""
+        with self._lock:
+            return self._slots[self._front]
+
+
+class SimulationThread(threading.Thread):
+    """Runs a FixedStepLoop's simulation steps on a background thread"""
+
+    def __init__(self, loop, game):
+        super().__init__(name='simulation', daemon=True)
+        if not hasattr(game, 'snapshot'):
+            raise TypeError(f"{type(game).__name__} does not support pipelined mode")
+        self.loop = loop
+        self.game = game
+        self.buffer = SnapshotBuffer()
+        self.buffer.publish(game.snapshot(), time.perf_counter())
+        self.result = None
+        self.error = None
+        self.finished = threading.Event()
+        self._events = queue.SimpleQueue()
+        self._stopped = False
+
+    def post(self, event):
+        """Hand an input event to the simulation, in order"""
+        self._events.put(event)
+
+    def stop(self):
+        self._stopped = True
+
+    def run(self):
+        try:
+            self._run()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.finished.set()
+
+    def _handle_events(self):
+        """Return True once the game asks to leave"""
+        recorder = self.loop.recorder
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                return False
+            result = self.game.handle_event(event)
+            if result is not None:
+                self.result = result
+                return True
+            if recorder is not None:
+                recorder.key_event(event)
+
+    def _run(self):
+        loop = self.loop
+        step_time = loop.step_time
+        next_step = time.perf_counter() + step_time
+
+        while not self._stopped:
+            if self._handle_events():
+                return
+            steps = 0
+            while time.perf_counter() >= next_step:
+                if steps >= loop.max_catch_up:
+                    # 超出追赶上限，丢弃积压的时间
+                    dropped = int((time.perf_counter() - next_step) / step_time) + 1
+                    loop.dropped_steps += dropped
+                    next_step += dropped * step_time
+                    break
+                loop.step(self.game)
+                next_step += step_time
+                steps += 1
+            if steps:
+                loop.steps += steps
+                # 快照对应最后一步完成的时刻，渲染从这里开始插值
+                self.buffer.publish(self.game.snapshot(), next_step - step_time)
+            delay = next_step - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+def interpolation_alpha(published, step_time):
+    """Fraction of a step elapsed since a snapshot was published"""
+    return max(0.0, min(1.0, (time.perf_counter() - published) / step_time))
+
+
+def run_pipelined(loop, game):
+    """FixedStepLoop's frame loop with the simulation on its own thread"""
+    profiler = loop.profiler
+    simulation = SimulationThread(loop, game)
+    simulation.start()
+    try:
+        while not simulation.finished.is_set():
+            loop.clock.tick(loop.render_fps)
+            profiler.begin_frame()
+
+            profiler.begin('events')
+            # SDL 只允许在主线程读取事件，按顺序转交给模拟线程
+            for event in pygame.event.get():
+                if not profiler.handle_event(event):
+                    simulation.post(event)
+            profiler.end()
+
+            snapshot, published = simulation.buffer.latest()
+            profiler.begin('draw')
+            snapshot.draw(interpolation_alpha(published, loop.step_time))
+            profiler.end()
+            if loop.capture is not None:
+                profiler.begin('capture')
+                loop.capture.capture(pygame.display.get_surface())
+                profiler.end()
+            profiler.draw_overlay(pygame.display.get_surface())
+
+            # 跳过的快照的脏矩形无法合并，流水线模式总是整屏翻转
+            profiler.begin('flip')
+            pygame.display.flip()
+            profiler.end()
+            profiler.end_frame()
+            loop.frames += 1
+            launch_timing.mark('first_frame')
+    finally:
+        simulation.stop()
+        simulation.join()
+    if simulation.error is not None:
+        raise simulation.error
+    return simulation.result
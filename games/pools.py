@@ -0,0 +1,56 @@
+"""Object pools for short-lived game entities, so heavy action does not churn the GC"""
+import operator
+
+is_active = operator.attrgetter('active')
+
+
+class Pool:
+    """Hands out released objects re-initialised by reset(*args), allocating only when empty
+
+    Pooled classes define __slots__ and a reset() taking the constructor's
+    arguments. An object must not be used after it has been released.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._free = []
+        self.in_use = 0
+        self.high_water = 0  # 同时在用的最大对象数
+        self.allocated = 0  # 新建的对象数
+        self.reused = 0  # 从空闲列表取出的次数
+
+    def acquire(self, *args):
+        """A reset object from the free list, or a new one"""
+        if self._free:
+            obj = self._free.pop()
+            obj.reset(*args)
+            self.reused += 1
+        else:
+            obj = self.factory(*args)
+            self.allocated += 1
+        self.in_use += 1
+        if self.in_use > self.high_water:
+            self.high_water = self.in_use
+        return obj
+
+    def release(self, obj):
+        self.in_use -= 1
+        self._free.append(obj)
+
+    def release_all(self, objects):
+        self.in_use -= len(objects)
+        self._free.extend(objects)
+
+    def keep(self, objects, predicate):
+        """The objects for which predicate is true; release the rest"""
+        kept = []
+        for obj in objects:
+            if predicate(obj):
+                kept.append(obj)
+            else:
+                self.release(obj)
+        return kept
+
+    def stats(self):
+        return {'in_use': self.in_use, 'free': len(self._free), 'high_water': self.high_water,
+                'allocated': self.allocated, 'reused': self.reused}
@@ -0,0 +1,219 @@
+"""Deterministic session recording and replay, verified by a state checksum after every step"""
+import argparse
+import os
+import struct
+import time
+
+import pygame
+
+from .capture import FrameCapture
+from .game_loop import SIM_RATE, FixedStepLoop
+from .headless import Inputs, create_game, get_game_class
+
+# 记录文件（小端序）：文件头之后每个模拟步一条记录
+MAGIC = b'GREC'
+VERSION = 1
+_HEADER = struct.Struct('<4sBB')  # 魔数、版本、游戏 ID 长度，其后是游戏 ID
+_SEED = struct.Struct('<Q')  # 随机种子
+_STEP = struct.Struct('<HB')  # 按住的键掩码、新按下的键数，其后每个键一个字节（INPUT_KEYS 序号）
+_CHECKSUM = struct.Struct('<I')  # 这一步之后的游戏状态校验和
+
+
+class SessionRecorder:
+    """Writes one game session's inputs and state checksums to a file"""
+
+    def __init__(self, path, game):
+        self.keys = game.INPUT_KEYS
+        self._key_index = {key: i for i, key in enumerate(self.keys)}
+        self._pressed = []
+        self._step = b''
+        self.steps = 0
+
+        game_id = game.GAME_ID.encode()
+        self.file = open(path, 'wb')
+        self.file.write(_HEADER.pack(MAGIC, VERSION, len(game_id)) + game_id)
+        self.file.write(_SEED.pack(game.seed))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def key_event(self, event):
+        # 只记录游戏会响应的按键
+        if event.type == pygame.KEYDOWN and event.key in self._key_index:
+            self._pressed.append(self._key_index[event.key])
+
+    def next_held_keys(self):
+        """Sample the held keys for the coming step and return them as the game sees them"""
+        pressed = pygame.key.get_pressed()
+        held = [key for key in self.keys if pressed[key]]
+        mask = 0
+        for key in held:
+            mask |= 1 << self._key_index[key]
+        self._step = _STEP.pack(mask, len(self._pressed)) + bytes(self._pressed)
+        self._pressed = []
+        return Inputs((), held).held_keys()
+
+    def end_step(self, checksum):
+        self.file.write(self._step + _CHECKSUM.pack(checksum))
+        self.steps += 1
+
+
+class Recording:
+    """A loaded session log"""
+
+    def __init__(self, game_id, seed, steps):
+        self.game_id = game_id
+        self.seed = seed
+        self.steps = steps  # [(Inputs, checksum), ...]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version, id_length = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} session log")
+        offset = _HEADER.size
+        game_id = data[offset:offset + id_length].decode()
+        offset += id_length
+        (seed,) = _SEED.unpack_from(data, offset)
+        offset += _SEED.size
+
+        keys = get_game_class(game_id).INPUT_KEYS
+        steps = []
+        while offset < len(data):
+            mask, count = _STEP.unpack_from(data, offset)
+            offset += _STEP.size
+            pressed = [keys[i] for i in data[offset:offset + count]]
+            offset += count
+            (checksum,) = _CHECKSUM.unpack_from(data, offset)
+            offset += _CHECKSUM.size
+            held = [key for i, key in enumerate(keys) if mask & (1 << i)]
+            steps.append((Inputs(pressed, held), checksum))
+        return cls(game_id, seed, steps)
+
+
+class ReplayMismatch(Exception):
+    def __init__(self, step, expected, actual):
+        super().__init__(f"state checksum differs at step {step}: "
+                         f"expected {expected:08x}, got {actual:08x}")
+        self.step = step
+
+
+def replay_headless(recording):
+    """Replay as fast as possible; raise ReplayMismatch on divergence"""
+    game = create_game(recording.game_id, recording.seed)
+    for i, (inputs, checksum) in enumerate(recording.steps):
+        game.step(inputs)
+        actual = game.state_checksum()
+        if actual != checksum:
+            raise ReplayMismatch(i, checksum, actual)
+    return game
+
+
+class _RealtimeReplay:
+    """Drives a game from a recording inside the normal FixedStepLoop"""
+
+    def __init__(self, game, recording):
+        self.game = game
+        self.recording = recording
+        self.index = 0
+        self.mismatch = None
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            return False
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            return True
+        if event.type == pygame.USEREVENT and event.dict.get('replay_finished'):
+            return True
+        return None
+
+    def update(self, keys=None):
+        if self.index >= len(self.recording.steps):
+            return
+        inputs, checksum = self.recording.steps[self.index]
+        self.game.step(inputs)
+        actual = self.game.state_checksum()
+        if actual != checksum and self.mismatch is None:
+            self.mismatch = ReplayMismatch(self.index, checksum, actual)
+        self.index += 1
+        if self.index == len(self.recording.steps):
+            pygame.event.post(pygame.event.Event(pygame.USEREVENT, replay_finished=True))
+
+    def draw(self, alpha):
+        self.game.draw(alpha)
+
+    def dirty_rects(self):
+        if hasattr(self.game, 'dirty_rects'):
+            return self.game.dirty_rects()
+        return None
+
+
+def render_recording(recording, screen, capture):
+    """Replay as fast as possible, drawing and capturing one frame per step"""
+    game = get_game_class(recording.game_id)(screen, recording.seed)
+    for i, (inputs, checksum) in enumerate(recording.steps):
+        game.step(inputs)
+        actual = game.state_checksum()
+        if actual != checksum:
+            raise ReplayMismatch(i, checksum, actual)
+        game.draw(1.0)
+        capture.capture(screen)
+    return game
+
+
+def replay_realtime(recording, screen, capture_path=None):
+    """Play a recording back at normal speed in a window"""
+    game = get_game_class(recording.game_id)(screen, recording.seed)
+    driver = _RealtimeReplay(game, recording)
+    FixedStepLoop(game.clock).run(driver, capture_path=capture_path)
+    if driver.mismatch is not None:
+        raise driver.mismatch
+    return game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded game session")
+    parser.add_argument('path')
+    parser.add_argument('--realtime', action='store_true',
+                        help="play back in a window at normal speed instead of fast-forwarding")
+    parser.add_argument('--capture', metavar='PATH',
+                        help="save the frames to a directory of PNGs, or to a .gif file; "
+                             "without --realtime every step is rendered off-screen")
+    args = parser.parse_args()
+
+    recording = Recording.load(args.path)
+    print(f"{args.path}: {recording.game_id}, seed {recording.seed}, "
+          f"{len(recording.steps)} steps")
+    start = time.perf_counter()
+    try:
+        if args.realtime:
+            pygame.init()
+            screen = pygame.display.set_mode((800, 600))
+            replay_realtime(recording, screen, args.capture)
+        elif args.capture:
+            # 离线渲染不需要窗口；队列满时等待编码，不丢帧
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+            pygame.init()
+            screen = pygame.display.set_mode((800, 600))
+            with FrameCapture(args.capture, fps=SIM_RATE, block=True) as capture:
+                render_recording(recording, screen, capture)
+            print(capture.summary())
+        else:
+            replay_headless(recording)
+    except ReplayMismatch as e:
+        print(f"Replay diverged: {e}")
+        raise SystemExit(1)
+    print(f"Replay matched in {time.perf_counter() - start:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
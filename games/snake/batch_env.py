@@ -0,0 +1,164 @@
+"""Vectorized Snake environment stepping many boards at once with the rules of SnakeGame
+
+Requires NumPy, which the games themselves do not need.
+"""
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("games.snake.batch_env requires NumPy: pip install numpy") from e
+
+from .snake_game import GRID_WIDTH, GRID_HEIGHT
+
+# Actions follow the order of snake_game.Direction
+UP, DOWN, LEFT, RIGHT = 0, 1, 2, 3
+DIRECTION_DX = np.array([0, 0, -1, 1], dtype=np.int16)
+DIRECTION_DY = np.array([-1, 1, 0, 0], dtype=np.int16)
+OPPOSITE = np.array([DOWN, UP, RIGHT, LEFT], dtype=np.int8)
+
+FOOD_REWARD = 10
+MAX_LENGTH = GRID_WIDTH * GRID_HEIGHT
+
+# Board cell values returned by boards()
+EMPTY, BODY, HEAD, FOOD = 0, 1, 2, 3
+
+
+class BatchSnakeEnv:
+    """N independent Snake boards with a gym-like reset/step interface"""
+
+    def __init__(self, num_envs, seed=None, autoreset=True):
+        self.num_envs = num_envs
+        self.autoreset = autoreset
+        self._env_ids = np.arange(num_envs)
+        self._rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(num_envs)]
+
+        # The body of each snake is a ring buffer: the head is at head_index
+        # and the following length - 1 slots hold the rest of the body.
+        self.body = np.zeros((num_envs, MAX_LENGTH, 2), dtype=np.int16)
+        self.head_index = np.zeros(num_envs, dtype=np.int64)
+        self.length = np.zeros(num_envs, dtype=np.int64)
+        self.occupied = np.zeros((num_envs, GRID_HEIGHT, GRID_WIDTH), dtype=bool)
+
+        self.direction = np.full(num_envs, RIGHT, dtype=np.int8)
+        self.grow_pending = np.zeros(num_envs, dtype=np.int64)
+        self.food = np.zeros((num_envs, 2), dtype=np.int16)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.done = np.zeros(num_envs, dtype=bool)
+
+        self.reset()
+
+    def reset(self, mask=None):
+        """Reset all boards, or only those where mask is true"""
+        ids = self._env_ids if mask is None else np.flatnonzero(mask)
+        if len(ids) == 0:
+            return self.observation()
+
+        start_x = GRID_WIDTH // 2
+        start_y = GRID_HEIGHT // 2
+
+        self.occupied[ids] = False
+        self.head_index[ids] = 0
+        self.length[ids] = 3
+        for i in range(3):
+            self.body[ids, i] = (start_x - i, start_y)
+        self.occupied[ids, start_y, start_x - 2:start_x + 1] = True
+
+        self.direction[ids] = RIGHT
+        self.grow_pending[ids] = 0
+        self.score[ids] = 0
+        self.done[ids] = False
+        self._spawn_food(ids)
+        return self.observation()
+
+    def _spawn_food(self, ids):
+        # Rejection sampling like Food.spawn; only runs for boards that ate
+        for i in ids:
+            rng = self._rngs[i]
+            while True:
+                x = rng.integers(GRID_WIDTH)
+                y = rng.integers(GRID_HEIGHT)
+                if not self.occupied[i, y, x]:
+                    self.food[i] = (x, y)
+                    break
+
+    def heads(self):
+        return self.body[self._env_ids, self.head_index]
+
+    def observation(self):
+        """Compact per-board state; use boards() for full grids"""
+        return {
+            'head': self.heads(),
+            'food': self.food.copy(),
+            'direction': self.direction.copy(),
+            'length': self.length.copy(),
+        }
+
+    def boards(self):
+        """Return an (N, GRID_HEIGHT, GRID_WIDTH) array of cell values"""
+        grid = self.occupied.astype(np.int8)
+        heads = self.heads()
+        inside = ((heads[:, 0] >= 0) & (heads[:, 0] < GRID_WIDTH) &
+                  (heads[:, 1] >= 0) & (heads[:, 1] < GRID_HEIGHT))
+        ids = self._env_ids[inside]
+        grid[ids, heads[inside, 1], heads[inside, 0]] = HEAD
+        grid[self._env_ids, self.food[:, 1], self.food[:, 0]] = FOOD
+        return grid
+
+    def step(self, actions):
+        """Move every live snake once, like one move of SnakeGame (not one simulation step)
+
+        Returns (observation, rewards, dones, info). With autoreset the
+        boards that finished are reset before returning, and their final
+        scores are in info['final_score'].
+        """
+        actions = np.asarray(actions, dtype=np.int8)
+        rewards = np.zeros(self.num_envs, dtype=np.int64)
+        ids = np.flatnonzero(~self.done)
+
+        # Can't reverse direction
+        direction = self.direction[ids]
+        requested = actions[ids]
+        direction = np.where(requested != OPPOSITE[direction], requested, direction)
+        self.direction[ids] = direction
+
+        head = self.body[ids, self.head_index[ids]]
+        new_x = head[:, 0] + DIRECTION_DX[direction]
+        new_y = head[:, 1] + DIRECTION_DY[direction]
+
+        # Remove the tail unless growing
+        growing = self.grow_pending[ids] > 0
+        self.grow_pending[ids] -= growing
+        shrinking = ids[~growing]
+        tail_index = (self.head_index[shrinking] + self.length[shrinking] - 1) % MAX_LENGTH
+        tail = self.body[shrinking, tail_index]
+        self.occupied[shrinking, tail[:, 1], tail[:, 0]] = False
+        self.length[ids] += growing
+
+        # Check wall and self collision
+        outside = (new_x < 0) | (new_x >= GRID_WIDTH) | (new_y < 0) | (new_y >= GRID_HEIGHT)
+        cell_x = np.clip(new_x, 0, GRID_WIDTH - 1)
+        cell_y = np.clip(new_y, 0, GRID_HEIGHT - 1)
+        dead = outside | (self.occupied[ids, cell_y, cell_x] & ~outside)
+
+        # Add new head
+        self.head_index[ids] = (self.head_index[ids] - 1) % MAX_LENGTH
+        self.body[ids, self.head_index[ids], 0] = new_x
+        self.body[ids, self.head_index[ids], 1] = new_y
+        alive = ~dead
+        self.occupied[ids[alive], cell_y[alive], cell_x[alive]] = True
+
+        # Check food collision
+        eaten = alive & (new_x == self.food[ids, 0]) & (new_y == self.food[ids, 1])
+        eaters = ids[eaten]
+        if len(eaters):
+            rewards[eaters] = FOOD_REWARD
+            self.score[eaters] += FOOD_REWARD
+            self.grow_pending[eaters] += 1
+            self._spawn_food(eaters)
+
+        self.done[ids[dead]] = True
+        dones = self.done.copy()
+        info = {}
+        if self.autoreset and dones.any():
+            info['final_score'] = np.where(dones, self.score, 0)
+            self.reset(dones)
+        return self.observation(), rewards, dones, info
@@ -1,8 +1,16 @@
+import copy
 import pygame
 import random
+import zlib
 from enum import Enum
 from collections import deque
 
+from .. import frame_profiler, launch_timing
+from ..game_loop import FixedStepLoop
+from ..overlays import OverlayCache, dim_overlay
+from ..pipeline import snapshot_view
+from ..text_cache import get_font, render_text
+
 # Constants
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
@@ -22,6 +30,9 @@ YELLOW = (255, 255, 0)
 GRAY = (50, 50, 50)
 LIGHT_GRAY = (100, 100, 100)
 
+# Screen areas of the HUD text, refreshed every frame with partial updates
+HUD_RECTS = (pygame.Rect(0, 0, 220, 75), pygame.Rect(SCREEN_WIDTH - 160, 0, 160, 35))
+
 # Directions
 class Direction(Enum):
     UP = (0, -1)
@@ -52,6 +63,7 @@ class Snake:
         self.direction = Direction.RIGHT
         self.next_direction = Direction.RIGHT
         self.grow_pending = 0
+        self.changed_cells = []  # Cells redrawn differently since the last frame
 
     def get_head(self):
         return self.body[0]
@@ -73,14 +85,15 @@ class Snake:
         dx, dy = self.direction.value
         new_head = (head_x + dx, head_y + dy)
 
-        # Add new head
+        # Add new head; the old head is now drawn as body
         self.body.appendleft(new_head)
+        self.changed_cells.extend((new_head, self.body[1]))
 
         # Remove tail if not growing
         if self.grow_pending > 0:
             self.grow_pending -= 1
         else:
-            self.body.pop()
+            self.changed_cells.append(self.body.pop())
 
     def grow(self):
         self.grow_pending += 1
@@ -143,17 +156,19 @@ class Snake:
         self.direction = Direction.RIGHT
         self.next_direction = Direction.RIGHT
         self.grow_pending = 0
+        self.changed_cells = []  # Cells redrawn differently since the last frame
 
 # Food class
 class Food:
-    def __init__(self):
+    def __init__(self, rng=random):
+        self.rng = rng  # Session RNG so replays are reproducible
         self.position = (0, 0)
         self.spawn()
 
     def spawn(self, snake_body=None):
         while True:
-            x = random.randint(0, GRID_WIDTH - 1)
-            y = random.randint(0, GRID_HEIGHT - 1)
+            x = self.rng.randint(0, GRID_WIDTH - 1)
+            y = self.rng.randint(0, GRID_HEIGHT - 1)
 
             # Make sure food doesn't spawn on snake
             if snake_body is None or (x, y) not in snake_body:
@@ -180,15 +195,25 @@ class Food:
 
 # Snake game class
 class SnakeGame:
-    def __init__(self, screen):
-        self.screen = screen
-        pygame.display.set_caption("Snake")
+    GAME_ID = 'snake'
+    # Keys the game reads; recordings encode inputs with this table
+    INPUT_KEYS = (pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT,
+                  pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d, pygame.K_SPACE, pygame.K_r)
+
+    def __init__(self, screen, seed=None):
+        self.screen = screen  # None when simulating headless
+        # Per-session RNG: the same seed and inputs replay the same game
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 72)
-        self.small_font = pygame.font.Font(None, 36)
-        self.tiny_font = pygame.font.Font(None, 24)
+        self.font = get_font(72)
+        self.small_font = get_font(36)
+        self.tiny_font = get_font(24)
+        self.presented_state = None  # State shown in the last presented frame
+        self.overlay_cache = OverlayCache()
 
         self.reset_game()
+        launch_timing.mark('constructed')
 
     def reset_game(self):
         self.state = GameState.READY
@@ -196,7 +221,7 @@ class SnakeGame:
         self.high_score = getattr(self, 'high_score', 0)
 
         self.snake = Snake()
-        self.food = Food()
+        self.food = Food(self.rng)
         self.food.spawn(self.snake.body)
 
         self.move_timer = 0
@@ -217,28 +242,31 @@ class SnakeGame:
 
     def draw_ui(self):
         # Draw score
-        score_text = self.small_font.render(f"Score: {self.score}", True, WHITE)
+        score_text = render_text(self.small_font, f"Score: {self.score}", WHITE)
         self.screen.blit(score_text, (10, 10))
 
         # Draw high score
-        high_score_text = self.tiny_font.render(f"Best: {self.high_score}", True, YELLOW)
+        high_score_text = render_text(self.tiny_font, f"Best: {self.high_score}", YELLOW)
         self.screen.blit(high_score_text, (10, 50))
 
         # Draw length
-        length_text = self.tiny_font.render(f"Length: {len(self.snake.body)}", True, WHITE)
+        length_text = render_text(self.tiny_font, f"Length: {len(self.snake.body)}", WHITE)
         self.screen.blit(length_text, (SCREEN_WIDTH - 150, 10))
 
     def draw_ready_screen(self):
+        # The overlay is composed once per state and score
+        key = (self.state,)
+        overlay = self.overlay_cache.get(key, self.build_ready_overlay)
+        overlay.draw(self.screen)
+
+    def build_ready_overlay(self):
         # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        overlay = dim_overlay((SCREEN_WIDTH, SCREEN_HEIGHT), BLACK)
 
         # Ready text
-        ready_text = self.font.render("READY", True, GREEN)
+        ready_text = render_text(self.font, "READY", GREEN)
         ready_rect = ready_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
-        self.screen.blit(ready_text, ready_rect)
+        overlay.blit(ready_text, ready_rect)
 
         # Instructions
         instructions = [
@@ -251,129 +279,173 @@ class SnakeGame:
 
         y_offset = SCREEN_HEIGHT // 2 + 20
         for instruction in instructions:
-            text = self.tiny_font.render(instruction, True, WHITE)
+            text = render_text(self.tiny_font, instruction, WHITE)
             text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, y_offset))
-            self.screen.blit(text, text_rect)
+            overlay.blit(text, text_rect)
             y_offset += 30
+        return overlay
 
     def draw_game_over(self):
+        # The overlay is composed once per state and score
+        key = (self.state, self.score, self.high_score)
+        overlay = self.overlay_cache.get(key, self.build_game_over_overlay)
+        overlay.draw(self.screen)
+
+    def build_game_over_overlay(self):
         # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        overlay = dim_overlay((SCREEN_WIDTH, SCREEN_HEIGHT), BLACK)
 
         # Game over text
-        game_over_text = self.font.render("GAME OVER", True, RED)
+        game_over_text = render_text(self.font, "GAME OVER", RED)
         text_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 80))
-        self.screen.blit(game_over_text, text_rect)
+        overlay.blit(game_over_text, text_rect)
 
         # Score
-        score_text = self.small_font.render(f"Score: {self.score}", True, WHITE)
+        score_text = render_text(self.small_font, f"Score: {self.score}", WHITE)
         score_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 20))
-        self.screen.blit(score_text, score_rect)
+        overlay.blit(score_text, score_rect)
 
         # High score
         if self.score == self.high_score and self.score > 0:
-            new_best = self.tiny_font.render("NEW BEST!", True, YELLOW)
+            new_best = render_text(self.tiny_font, "NEW BEST!", YELLOW)
             new_best_rect = new_best.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 15))
-            self.screen.blit(new_best, new_best_rect)
+            overlay.blit(new_best, new_best_rect)
         else:
-            high_text = self.small_font.render(f"Best: {self.high_score}", True, YELLOW)
+            high_text = render_text(self.small_font, f"Best: {self.high_score}", YELLOW)
             high_rect = high_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20))
-            self.screen.blit(high_text, high_rect)
+            overlay.blit(high_text, high_rect)
 
         # Instructions
-        restart_text = self.tiny_font.render("Press R to Restart", True, GREEN)
+        restart_text = render_text(self.tiny_font, "Press R to Restart", GREEN)
         restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 70))
-        self.screen.blit(restart_text, restart_rect)
+        overlay.blit(restart_text, restart_rect)
 
-        menu_text = self.tiny_font.render("Press ESC to Menu", True, YELLOW)
+        menu_text = render_text(self.tiny_font, "Press ESC to Menu", YELLOW)
         menu_rect = menu_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 100))
-        self.screen.blit(menu_text, menu_rect)
-
-    def run(self):
-        running = True
-
-        while running:
-            self.clock.tick(FPS)
-
-            # Event handling
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return False
-
-                if event.type == pygame.KEYDOWN:
-                    # ESC - return to menu
-                    if event.key == pygame.K_ESCAPE:
-                        return True
-
-                    # Arrow keys - change direction
-                    if self.state == GameState.PLAYING:
-                        if event.key == pygame.K_UP or event.key == pygame.K_w:
-                            self.snake.change_direction(Direction.UP)
-                        elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
-                            self.snake.change_direction(Direction.DOWN)
-                        elif event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                            self.snake.change_direction(Direction.LEFT)
-                        elif event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                            self.snake.change_direction(Direction.RIGHT)
-
-                    # Space - start game
-                    if self.state == GameState.READY and event.key == pygame.K_SPACE:
-                        self.state = GameState.PLAYING
-
-                    # R - restart game
-                    if self.state == GameState.GAME_OVER and event.key == pygame.K_r:
-                        self.reset_game()
-
-            # Game logic
-            if self.state == GameState.PLAYING:
-                self.move_timer += 1
-
-                if self.move_timer >= self.move_delay:
-                    self.move_timer = 0
-
-                    # Move snake
-                    self.snake.move()
-
-                    # Check collision with walls/self
-                    if self.snake.check_collision():
-                        self.state = GameState.GAME_OVER
-                        if self.score > self.high_score:
-                            self.high_score = self.score
-
-                    # Check food collision
-                    if self.snake.get_head() == self.food.position:
-                        self.snake.grow()
-                        self.score += 10
-                        self.food.spawn(self.snake.body)
-                        self.update_speed()
-
-            # Rendering
-            self.screen.fill(BLACK)
-
-            # Draw grid
-            self.draw_grid()
-
-            # Draw game objects
-            self.food.draw(self.screen)
-            self.snake.draw(self.screen)
-
-            # Draw UI
-            self.draw_ui()
-
-            # Draw state overlays
-            if self.state == GameState.READY:
-                self.draw_ready_screen()
-            elif self.state == GameState.GAME_OVER:
-                self.draw_game_over()
-
-            pygame.display.flip()
-
-        return False
+        overlay.blit(menu_text, menu_rect)
+        return overlay
+
+    def state_checksum(self):
+        """CRC32 of the simulation state, checked step by step on replay"""
+        state = (self.state.value, self.score, self.move_timer, self.snake.direction.name,
+                 tuple(self.snake.body), self.food.position)
+        return zlib.crc32(repr(state).encode())
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            return False
+
+        if event.type == pygame.KEYDOWN:
+            # ESC - return to menu
+            if event.key == pygame.K_ESCAPE:
+                return True
+            self.handle_key(event.key)
+        return None
+
+    def handle_key(self, key):
+        # Arrow keys - change direction
+        if self.state == GameState.PLAYING:
+            if key == pygame.K_UP or key == pygame.K_w:
+                self.snake.change_direction(Direction.UP)
+            elif key == pygame.K_DOWN or key == pygame.K_s:
+                self.snake.change_direction(Direction.DOWN)
+            elif key == pygame.K_LEFT or key == pygame.K_a:
+                self.snake.change_direction(Direction.LEFT)
+            elif key == pygame.K_RIGHT or key == pygame.K_d:
+                self.snake.change_direction(Direction.RIGHT)
+
+        # Space - start game
+        if self.state == GameState.READY and key == pygame.K_SPACE:
+            self.state = GameState.PLAYING
+
+        # R - restart game
+        if self.state == GameState.GAME_OVER and key == pygame.K_r:
+            self.reset_game()
+
+    def step(self, inputs):
+        """Advance one simulation step from key inputs, without rendering"""
+        for key in inputs.pressed:
+            self.handle_key(key)
+        self.update()
+
+    def update(self, keys=None):
+        # Game logic
+        if self.state == GameState.PLAYING:
+            self.move_timer += 1
+
+            if self.move_timer >= self.move_delay:
+                self.move_timer = 0
+
+                # Move snake
+                self.snake.move()
+
+                # Check collision with walls/self
+                with frame_profiler.section('collision'):
+                    crashed = self.snake.check_collision()
+                if crashed:
+                    self.state = GameState.GAME_OVER
+                    if self.score > self.high_score:
+                        self.high_score = self.score
+
+                # Check food collision
+                if self.snake.get_head() == self.food.position:
+                    self.snake.grow()
+                    self.score += 10
+                    self.food.spawn(self.snake.body)
+                    self.update_speed()
+
+    def draw(self, alpha=1.0):
+        # The snake moves a whole cell at a time, so alpha is not used
+        self.screen.fill(BLACK)
+
+        # Draw grid
+        self.draw_grid()
+
+        # Draw game objects
+        self.food.draw(self.screen)
+        self.snake.draw(self.screen)
+
+        # Draw UI
+        self.draw_ui()
+
+        # Draw state overlays
+        if self.state == GameState.READY:
+            self.draw_ready_screen()
+        elif self.state == GameState.GAME_OVER:
+            self.draw_game_over()
+
+    def dirty_rects(self):
+        """Screen areas that may have changed this frame, or None for all of it"""
+        state_changed = self.state != self.presented_state
+        self.presented_state = self.state
+        cells, self.snake.changed_cells = self.snake.changed_cells, []
+        if state_changed:
+            return None
+        if self.state != GameState.PLAYING:
+            return []  # The cached overlay screens don't change while shown
+
+        rects = [pygame.Rect(x * GRID_SIZE, y * GRID_SIZE, GRID_SIZE, GRID_SIZE)
+                 for x, y in cells]
+        # The apple's stem pokes out of its cell
+        food_x, food_y = self.food.position
+        rects.append(pygame.Rect(food_x * GRID_SIZE, food_y * GRID_SIZE,
+                                 GRID_SIZE, GRID_SIZE).inflate(4, 4))
+        return rects + list(HUD_RECTS)
+
+    def snapshot(self):
+        """Copy of the drawn state for the render thread in pipelined mode"""
+        snake = copy.copy(self.snake)
+        snake.body = tuple(self.snake.body)
+        snake.changed_cells = []
+        return snapshot_view(self, snake=snake, food=copy.copy(self.food))
+
+    def run(self, record_path=None, capture_path=None, pipelined=False):
+        pygame.display.set_caption("Snake")
+        # Fixed simulation step: move_delay counts steps, not rendered frames
+        return FixedStepLoop(self.clock, step_rate=FPS, render_fps=FPS).run(
+            self, record_path, capture_path, pipelined)
 
-def start_game(screen):
+def start_game(screen, record_path=None, capture_path=None, pipelined=False):
     """Entry point for Snake game"""
     game = SnakeGame(screen)
-    return game.run()
+    return game.run(record_path, capture_path, pipelined)
@@ -0,0 +1,51 @@
+"""Create, inspect and play Tank tile map files; usage is in the Tank README"""
+import argparse
+
+from .tile_map import DEFAULT_WAVES, TileMap, convert
+
+
+def _size(text):
+    columns, _, rows = text.partition('x')
+    return int(columns), int(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create and inspect Tank tile maps")
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert_parser = commands.add_parser('convert', help="write a randomly generated level")
+    convert_parser.add_argument('path')
+    convert_parser.add_argument('--size', type=_size, default=(20, 15), metavar='COLUMNSxROWS')
+    convert_parser.add_argument('--seed', type=int, default=None)
+    convert_parser.add_argument('--spawns', type=int, default=8,
+                                help="number of enemy spawn points")
+    convert_parser.add_argument('--waves', default=','.join(map(str, DEFAULT_WAVES)),
+                                help="comma-separated enemy count of each wave")
+    info_parser = commands.add_parser('info', help="describe a map file")
+    info_parser.add_argument('path')
+    play_parser = commands.add_parser('play', help="play a map file")
+    play_parser.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        waves = [int(count) for count in args.waves.split(',') if count]
+        tile_map = convert(args.path, *args.size, seed=args.seed, spawns=args.spawns,
+                           waves=waves)
+        print(f"Wrote {args.path}: {tile_map.columns}x{tile_map.rows} tiles")
+    elif args.command == 'info':
+        with TileMap.load(args.path) as tile_map:
+            counts = ', '.join(f"{count} {wall_type.name.lower()}"
+                               for wall_type, count in tile_map.counts().items())
+            print(f"{args.path}: {tile_map.columns}x{tile_map.rows} tiles ({counts})")
+            print(f"player spawn {tile_map.player_spawn}, {len(tile_map.enemy_spawns)} "
+                  f"enemy spawns, waves {tile_map.waves}")
+    else:
+        import pygame
+        from .tank_game import SCREEN_HEIGHT, SCREEN_WIDTH, start_game
+        pygame.init()
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        start_game(screen, map_path=args.path)
+        pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
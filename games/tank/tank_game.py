@@ -1,13 +1,41 @@
+import copy
+import operator
 import pygame
 import random
+import zlib
 import sys
 from enum import Enum
 
+from .. import frame_profiler, launch_timing
+from ..dirty_rects import motion_rect
+from ..game_loop import FixedStepLoop, lerp
+from ..overlays import OverlayCache, dim_overlay
+from ..pipeline import copy_all, snapshot_view
+from ..pools import Pool, is_active
+from ..text_cache import get_font, render_text
+from .tile_map import BLOCKING, TileMap, WallType, generate_map
+
 # 常量定义
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 TILE_SIZE = 40
 FPS = 60
+TANK_SIZE = 35
+SHOOT_DELAY = 30  # 射击冷却时间（帧）
+MUZZLE_OFFSET = 20  # 子弹从坦克中心沿炮管方向出发的距离
+BULLET_SPEED = 8
+BULLET_SIZE = 6
+BROADPHASE_CELL_SIZE = 2 * TILE_SIZE  # 敌人空间哈希的格子边长
+FLOW_MAX_DISTANCE = 64  # 敌人寻路距离场的最大搜索步数（格）
+CHUNK_SIZE = 4 * TILE_SIZE  # 绘制裁剪用的位置索引的块边长
+CULL_MARGIN = 2 * TILE_SIZE  # 视口外仍需绘制的距离：贴图尺寸和插值移动
+# 地形按块预渲染，每块与屏幕一样大：屏幕大小的地图正好一块
+TERRAIN_CHUNK_COLUMNS = SCREEN_WIDTH // TILE_SIZE
+TERRAIN_CHUNK_ROWS = SCREEN_HEIGHT // TILE_SIZE
+TERRAIN_CACHE_CHUNKS = 9  # 大地图上最多保留的已渲染地形块
+GRASS_VARIANTS = 8  # 草丛纹理的种类，按格子固定选用
+EXPLOSION_RADIUS = 40  # 最大爆炸半径
+EXPLOSION_REACH = int(EXPLOSION_RADIUS * 1.5) + 1  # 闪光半径最大为爆炸半径的 1.5 倍
 
 # 颜色定义
 BLACK = (0, 0, 0)
@@ -21,6 +49,16 @@ GRAY = (128, 128, 128)
 DARK_GREEN = (0, 100, 0)
 ORANGE = (255, 165, 0)
 
+# 坦克贴图四周的留白，容纳伸出车身的炮管
+SPRITE_MARGIN = 6
+_tank_sprites = {}
+_tile_sprites = {}
+# 草丛层中表示透明的颜色
+GRASS_COLORKEY = (255, 0, 255)
+
+# 界面文字所在区域，局部刷新时每帧都会更新
+HUD_RECTS = (pygame.Rect(0, 0, 160, 60), pygame.Rect(SCREEN_WIDTH - 130, 0, 130, 60))
+
 # 方向枚举
 class Direction(Enum):
     UP = 0
@@ -28,26 +66,40 @@ class Direction(Enum):
     DOWN = 2
     LEFT = 3
 
+# 各方向的单位向量
+DIRECTION_VECTORS = {
+    Direction.UP: (0, -1),
+    Direction.RIGHT: (1, 0),
+    Direction.DOWN: (0, 1),
+    Direction.LEFT: (-1, 0),
+}
+
+def muzzle_position(x, y, direction):
+    """坦克左上角在 (x, y) 时子弹的起始位置"""
+    dx, dy = DIRECTION_VECTORS[direction]
+    return (x + TANK_SIZE // 2 + dx * MUZZLE_OFFSET,
+            y + TANK_SIZE // 2 + dy * MUZZLE_OFFSET)
+
 # 游戏状态
 class GameState(Enum):
     PLAYING = 0
     GAME_OVER = 1
     LEVEL_COMPLETE = 2
 
-# 墙壁类型
-class WallType(Enum):
-    BRICK = 1  # 可破坏
-    STONE = 2  # 不可破坏
-    GRASS = 3  # 草丛，不阻挡
-
 # 爆炸效果类
 class Explosion:
+    __slots__ = ('x', 'y', 'frame', 'max_frames', 'max_radius', 'active')
+
     def __init__(self, x, y):
+        self.reset(x, y)
+
+    def reset(self, x, y):
+        # 对象池复用时重新初始化
         self.x = x
         self.y = y
         self.frame = 0
         self.max_frames = 20  # 爆炸持续帧数
-        self.max_radius = 40  # 最大爆炸半径
+        self.max_radius = EXPLOSION_RADIUS
         self.active = True
 
     def update(self):
@@ -55,8 +107,10 @@ class Explosion:
         if self.frame >= self.max_frames:
             self.active = False
 
-    def draw(self, screen):
+    def draw(self, screen, offset=(0, 0)):
         if self.active:
+            x = self.x - offset[0]
+            y = self.y - offset[1]
             # 计算当前爆炸的进度 (0到1)
             progress = self.frame / self.max_frames
 
@@ -73,17 +127,17 @@ class Explosion:
             # 绘制多层爆炸效果
             # 外层 - 红色
             outer_color = (*RED, min(alpha, 255))
-            pygame.draw.circle(screen, RED, (int(self.x), int(self.y)), radius)
+            pygame.draw.circle(screen, RED, (int(x), int(y)), radius)
 
             # 中层 - 橙色
             if radius > 5:
                 mid_radius = int(radius * 0.7)
-                pygame.draw.circle(screen, ORANGE, (int(self.x), int(self.y)), mid_radius)
+                pygame.draw.circle(screen, ORANGE, (int(x), int(y)), mid_radius)
 
             # 内层 - 黄色
             if radius > 10:
                 inner_radius = int(radius * 0.4)
-                pygame.draw.circle(screen, YELLOW, (int(self.x), int(self.y)), inner_radius)
+                pygame.draw.circle(screen, YELLOW, (int(x), int(y)), inner_radius)
 
             # 添加闪光效果（在爆炸初期）
             if progress < 0.2:
@@ -93,188 +147,529 @@ class Explosion:
                 s = pygame.Surface((flash_radius * 2, flash_radius * 2), pygame.SRCALPHA)
                 pygame.draw.circle(s, (255, 255, 255, flash_alpha),
                                  (flash_radius, flash_radius), flash_radius)
-                screen.blit(s, (int(self.x - flash_radius), int(self.y - flash_radius)))
-
-# 子弹类
-class Bullet:
-    def __init__(self, x, y, direction, owner):
-        self.x = x
-        self.y = y
-        self.direction = direction
-        self.owner = owner  # 'player' 或 'enemy'
-        self.speed = 8
-        self.width = 6
-        self.height = 6
-        self.active = True
-
-    def update(self):
-        if self.direction == Direction.UP:
-            self.y -= self.speed
-        elif self.direction == Direction.DOWN:
-            self.y += self.speed
-        elif self.direction == Direction.LEFT:
-            self.x -= self.speed
-        elif self.direction == Direction.RIGHT:
-            self.x += self.speed
-
-        # 检查是否出界
-        if self.x < 0 or self.x > SCREEN_WIDTH or self.y < 0 or self.y > SCREEN_HEIGHT:
-            self.active = False
-
-    def draw(self, screen):
-        if self.active:
-            color = YELLOW if self.owner == 'player' else RED
-            pygame.draw.circle(screen, color, (int(self.x), int(self.y)), self.width // 2)
-
-    def get_rect(self):
-        return pygame.Rect(self.x - self.width // 2, self.y - self.height // 2,
+                screen.blit(s, (int(x - flash_radius), int(y - flash_radius)))
+
+def index_chunks(xs, ys):
+    """按 CHUNK_SIZE 大小的块建立位置索引：(块列, 块行) -> 行号列表"""
+    chunks = {}
+    keys = zip([int(x) // CHUNK_SIZE for x in xs], [int(y) // CHUNK_SIZE for y in ys])
+    for i, key in enumerate(keys):
+        chunks.setdefault(key, []).append(i)
+    return chunks
+
+def chunk_rows(chunks, rect):
+    """位置落在 rect 覆盖的块中的行，按行号排序"""
+    rows = []
+    for row in range(rect.top // CHUNK_SIZE, (rect.bottom - 1) // CHUNK_SIZE + 1):
+        for column in range(rect.left // CHUNK_SIZE, (rect.right - 1) // CHUNK_SIZE + 1):
+            rows.extend(chunks.get((column, row), ()))
+    rows.sort()
+    return rows
+
+# 实体存储基类：结构数组，每个字段一个列表，每个实体一行
+class EntityStore:
+    COLUMNS = ()
+
+    def __init__(self):
+        for name in self.COLUMNS:
+            setattr(self, name, [])
+        # 行本身就是复用的存储，这里记录与对象池相同的统计
+        self.added = 0
+        self.high_water = 0
+        self.chunks = None  # 按块的位置索引；行增删或移动后失效，下次查询时重建
+
+    def index_chunks(self):
+        """按 CHUNK_SIZE 大小的块重建位置索引"""
+        self.chunks = index_chunks(self.x, self.y)
+
+    def rows_in(self, rect):
+        """位置落在 rect 覆盖的块中的行，按行号排序"""
+        if self.chunks is None:
+            self.index_chunks()
+        return chunk_rows(self.chunks, rect)
+
+    def __len__(self):
+        return len(self.active)
+
+    def clear(self):
+        for column in self.columns():
+            del column[:]
+        self.chunks = None
+
+    def stats(self):
+        return {'in_use': len(self), 'high_water': self.high_water, 'allocated': self.added}
+
+    def columns(self):
+        return [getattr(self, name) for name in self.COLUMNS]
+
+    def save_positions(self):
+        # 整列复制，用于插值渲染
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+
+    def compact(self):
+        """移除不活跃的行：用最后一行填补空位，其余行不移动"""
+        active = self.active
+        if len(active) > self.high_water:
+            self.high_water = len(active)
+        if all(active):
+            return
+        columns = self.columns()
+        count = len(active)
+        i = 0
+        while i < count:
+            if active[i]:
+                i += 1
+                continue
+            # 换过来的行也要检查，所以 i 不前进
+            count -= 1
+            for column in columns:
+                column[i] = column[count]
+        for column in columns:
+            del column[count:]
+        self.chunks = None
+
+    def copy(self):
+        """各列的副本，供流水线模式的快照使用"""
+        store = copy.copy(self)
+        for name in self.COLUMNS:
+            setattr(store, name, list(getattr(self, name)))
+        return store
+
+# 子弹存储
+class BulletStore(EntityStore):
+    COLUMNS = ('x', 'y', 'prev_x', 'prev_y', 'dx', 'dy', 'owner', 'active')
+    width = BULLET_SIZE
+    height = BULLET_SIZE
+
+    def add(self, x, y, direction, owner):
+        dx, dy = DIRECTION_VECTORS[direction]
+        self.x.append(x)
+        self.y.append(y)
+        self.prev_x.append(x)  # 上一模拟步的位置，用于插值渲染
+        self.prev_y.append(y)
+        self.dx.append(dx * BULLET_SPEED)
+        self.dy.append(dy * BULLET_SPEED)
+        self.owner.append(owner)  # 'player' 或 'enemy'
+        self.active.append(True)
+        self.added += 1
+        self.chunks = None
+
+    def update(self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+        # 整列一次移动所有子弹
+        self.x[:] = map(operator.add, self.x, self.dx)
+        self.y[:] = map(operator.add, self.y, self.dy)
+        self.chunks = None
+
+        # 飞出地图的子弹标记为不活跃，在 compact() 中统一移除
+        self.active[:] = [active and 0 <= x <= width and 0 <= y <= height
+                          for active, x, y in zip(self.active, self.x, self.y)]
+
+    def get_rect(self, i):
+        return pygame.Rect(self.x[i] - self.width // 2, self.y[i] - self.height // 2,
                           self.width, self.height)
 
-# 墙壁类
-class Wall:
-    def __init__(self, x, y, wall_type):
-        self.x = x
-        self.y = y
-        self.wall_type = wall_type
-        self.width = TILE_SIZE
-        self.height = TILE_SIZE
-        self.active = True
+    def draw(self, screen, alpha=1.0, offset=(0, 0), rows=None):
+        """绘制 rows 中的子弹（默认全部），offset 为视口左上角的地图坐标"""
+        radius = self.width // 2
+        offset_x, offset_y = offset
+        if rows is None:
+            rows = range(len(self))
+        for i in rows:
+            if self.active[i]:
+                color = YELLOW if self.owner[i] == 'player' else RED
+                position = (int(lerp(self.prev_x[i], self.x[i], alpha)) - offset_x,
+                            int(lerp(self.prev_y[i], self.y[i], alpha)) - offset_y)
+                pygame.draw.circle(screen, color, position, radius)
+
+# 墙壁绘制
+def draw_tile(surface, wall_type, x, y, variant=0):
+    """绘制一格墙壁，(x, y) 为格子左上角；草丛纹理由 variant 决定，每次都相同"""
+    rect = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
+    if wall_type == WallType.BRICK:
+        pygame.draw.rect(surface, BROWN, rect)
+        pygame.draw.rect(surface, BLACK, rect, 2)
+        # 绘制砖块纹理
+        pygame.draw.line(surface, BLACK, (x, y + TILE_SIZE // 2),
+                       (x + TILE_SIZE, y + TILE_SIZE // 2))
+    elif wall_type == WallType.STONE:
+        pygame.draw.rect(surface, GRAY, rect)
+        pygame.draw.rect(surface, BLACK, rect, 2)
+    elif wall_type == WallType.GRASS:
+        pygame.draw.rect(surface, DARK_GREEN, rect)
+        # 绘制草丛纹理
+        rng = random.Random(variant)
+        for i in range(5):
+            x_offset = rng.randint(0, TILE_SIZE)
+            y_offset = rng.randint(0, TILE_SIZE)
+            pygame.draw.line(surface, GREEN,
+                           (x + x_offset, y + y_offset),
+                           (x + x_offset, y + y_offset + 5), 2)
+
+def get_tile_sprite(wall_type, variant=0):
+    """预渲染的一格墙壁，每种 (类型, 纹理) 只绘制一次"""
+    key = (wall_type, variant)
+    sprite = _tile_sprites.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((TILE_SIZE, TILE_SIZE))
+        draw_tile(sprite, wall_type, 0, 0, variant)
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert()
+        _tile_sprites[key] = sprite
+    return sprite
+
+def grass_variant(cell):
+    """格子固定使用的草丛纹理，相邻格子看起来不重复"""
+    return (cell * 2654435761 >> 16) % GRASS_VARIANTS
+
+# 预渲染的地形：每块一张背景（砖墙和石墙）和一张草丛层，绘制时各一次 blit
+class TerrainCache:
+    def __init__(self, tile_map):
+        self.tile_map = tile_map
+        self.chunks = {}  # (块列, 块行) -> [背景, 草丛层或 None]，按最近使用排序
+        self.patched = 0  # 已在背景中抹去的被摧毁墙壁数
+        self.cleared = set()  # 已抹去的格子；被丢弃的块重新渲染时也要跳过
+        self.baked = 0
+
+    def chunk(self, key):
+        chunk = self.chunks.pop(key, None)
+        if chunk is None:
+            chunk = self._bake(key)
+            if len(self.chunks) >= TERRAIN_CACHE_CHUNKS:
+                # 丢弃最久未用的块
+                del self.chunks[next(iter(self.chunks))]
+        self.chunks[key] = chunk
+        return chunk
+
+    def _bake(self, key):
+        tile_map = self.tile_map
+        tiles = tile_map.tiles
+        left = key[0] * TERRAIN_CHUNK_COLUMNS
+        top = key[1] * TERRAIN_CHUNK_ROWS
+        columns = min(TERRAIN_CHUNK_COLUMNS, tile_map.columns - left)
+        rows = min(TERRAIN_CHUNK_ROWS, tile_map.rows - top)
+        walls = []
+        grass = []
+        for row in range(rows):
+            cell = (top + row) * tile_map.columns + left
+            for column in range(columns):
+                wall_type = tiles[cell + column]
+                if wall_type == WallType.GRASS:
+                    grass.append((get_tile_sprite(wall_type, grass_variant(cell + column)),
+                                  (column * TILE_SIZE, row * TILE_SIZE)))
+                elif wall_type and cell + column not in self.cleared:
+                    walls.append((get_tile_sprite(wall_type),
+                                  (column * TILE_SIZE, row * TILE_SIZE)))
+
+        size = (columns * TILE_SIZE, rows * TILE_SIZE)
+        display = pygame.display.get_surface() is not None
+        background = pygame.Surface(size)
+        if display:
+            background = background.convert()
+        background.fill(BLACK)
+        background.blits(walls, doreturn=False)
+        foreground = None
+        if grass:
+            # 草丛稀疏，用 RLE 编码的透明色，blit 时跳过透明部分
+            foreground = pygame.Surface(size)
+            if display:
+                foreground = foreground.convert()
+            foreground.fill(GRASS_COLORKEY)
+            foreground.blits(grass, doreturn=False)
+            foreground.set_colorkey(GRASS_COLORKEY, pygame.RLEACCEL)
+        self.baked += 1
+        return [background, foreground]
+
+    def patch(self, destroyed):
+        """在已渲染的背景中抹去新被摧毁的墙壁；destroyed 是本关被摧毁的格子序号"""
+        columns = self.tile_map.columns
+        for cell in destroyed[self.patched:]:
+            self.cleared.add(cell)
+            column = cell % columns
+            row = cell // columns
+            chunk = self.chunks.get((column // TERRAIN_CHUNK_COLUMNS, row // TERRAIN_CHUNK_ROWS))
+            if chunk is not None:
+                chunk[0].fill(BLACK, (column % TERRAIN_CHUNK_COLUMNS * TILE_SIZE,
+                                      row % TERRAIN_CHUNK_ROWS * TILE_SIZE,
+                                      TILE_SIZE, TILE_SIZE))
+        self.patched = len(destroyed)
+
+    def _visible(self, camera):
+        """视口内的块：(块, 块左上角的屏幕坐标)"""
+        chunk_width = TERRAIN_CHUNK_COLUMNS * TILE_SIZE
+        chunk_height = TERRAIN_CHUNK_ROWS * TILE_SIZE
+        view = camera.rect()
+        last_column = (self.tile_map.columns - 1) // TERRAIN_CHUNK_COLUMNS
+        last_row = (self.tile_map.rows - 1) // TERRAIN_CHUNK_ROWS
+        for row in range(view.top // chunk_height,
+                         min(last_row, (view.bottom - 1) // chunk_height) + 1):
+            for column in range(view.left // chunk_width,
+                                min(last_column, (view.right - 1) // chunk_width) + 1):
+                yield (self.chunk((column, row)),
+                       (column * chunk_width - camera.x, row * chunk_height - camera.y))
+
+    def draw_background(self, screen, camera):
+        for (background, foreground), position in self._visible(camera):
+            screen.blit(background, position)
+
+    def draw_foreground(self, screen, camera):
+        for (background, foreground), position in self._visible(camera):
+            if foreground is not None:
+                screen.blit(foreground, position)
+
+# 墙壁网格：直接读取地图的瓦片字节，被摧毁的格子另外记录；查询只检查矩形覆盖的几个格子
+class WallGrid:
+    def __init__(self, tile_map):
+        self.tiles = tile_map.tiles
+        self.columns = tile_map.columns
+        self.rows = tile_map.rows
+        self.width = self.columns * TILE_SIZE  # 地图的像素尺寸，也是坦克和子弹的活动范围
+        self.height = self.rows * TILE_SIZE
+        self.removed = []  # 被摧毁的格子序号，按摧毁顺序，供距离场增量更新
+        self.destroyed = set()  # 同上，用于查询；地图字节不修改，它可能是只读的文件映射
+        self.version = 0  # 每次摧毁墙壁加一，供距离场判断是否需要更新
+
+    def remove(self, cell):
+        """摧毁一格墙壁，变为空地"""
+        self.destroyed.add(cell)
+        self.removed.append(cell)
+        self.version += 1
+
+    def cell_rect(self, cell):
+        return pygame.Rect(cell % self.columns * TILE_SIZE, cell // self.columns * TILE_SIZE,
+                           TILE_SIZE, TILE_SIZE)
+
+    def _cells(self, rect):
+        """rect 覆盖的阻挡格子序号，逐行从左到右"""
+        left = max(rect.left // TILE_SIZE, 0)
+        right = min((rect.right - 1) // TILE_SIZE, self.columns - 1)
+        top = max(rect.top // TILE_SIZE, 0)
+        bottom = min((rect.bottom - 1) // TILE_SIZE, self.rows - 1)
+        tiles = self.tiles
+        destroyed = self.destroyed
+        for row in range(top, bottom + 1):
+            for cell in range(row * self.columns + left, row * self.columns + right + 1):
+                if tiles[cell] in BLOCKING and cell not in destroyed:
+                    yield cell
+
+    def blocked(self, rect):
+        """rect 是否与任何阻挡的墙壁重叠"""
+        for cell in self._cells(rect):
+            return True
+        return False
 
-    def draw(self, screen):
-        if self.active:
-            rect = pygame.Rect(self.x, self.y, self.width, self.height)
-            if self.wall_type == WallType.BRICK:
-                pygame.draw.rect(screen, BROWN, rect)
-                pygame.draw.rect(screen, BLACK, rect, 2)
-                # 绘制砖块纹理
-                pygame.draw.line(screen, BLACK, (self.x, self.y + TILE_SIZE // 2),
-                               (self.x + TILE_SIZE, self.y + TILE_SIZE // 2))
-            elif self.wall_type == WallType.STONE:
-                pygame.draw.rect(screen, GRAY, rect)
-                pygame.draw.rect(screen, BLACK, rect, 2)
-            elif self.wall_type == WallType.GRASS:
-                pygame.draw.rect(screen, DARK_GREEN, rect)
-                # 绘制草丛纹理
-                for i in range(5):
-                    x_offset = random.randint(0, TILE_SIZE)
-                    y_offset = random.randint(0, TILE_SIZE)
-                    pygame.draw.line(screen, GREEN,
-                                   (self.x + x_offset, self.y + y_offset),
-                                   (self.x + x_offset, self.y + y_offset + 5), 2)
+    def first_hit(self, rect):
+        """与 rect 重叠的第一个阻挡格子的序号，没有则为 -1"""
+        for cell in self._cells(rect):
+            return cell
+        return -1
+
+# 以玩家所在格子为目标的 BFS 距离场，所有敌人共用一份
+class FlowField:
+    def __init__(self, wall_grid, max_distance=FLOW_MAX_DISTANCE):
+        self.wall_grid = wall_grid
+        self.max_distance = max_distance  # 超出此距离的格子视为不可达，限制大地图上的计算量
+        self.distances = {}  # 格子序号 -> 到目标的步数
+        self.target = None
+        self.wall_version = 0
+        self.recomputes = 0  # 完整的 BFS 次数
+        self.repairs = 0  # 增量更新次数
+
+    def update(self, x, y):
+        """以 (x, y) 所在的格子为目标；目标换格子时重新计算，墙壁被摧毁时增量更新"""
+        grid = self.wall_grid
+        target = int(y) // TILE_SIZE * grid.columns + int(x) // TILE_SIZE
+        if target == self.target:
+            # 摧毁墙壁只会让距离变短，从打通的格子向外修正即可
+            for cell in grid.removed[self.wall_version:]:
+                self._open(cell)
+            self.wall_version = grid.version
+            return
+        self.target = target
+        self.wall_version = grid.version
+        self.recomputes += 1
+        self.distances = {target: 0}
+        self._relax([target], 0)
+
+    def _neighbors(self, cell):
+        columns = self.wall_grid.columns
+        column = cell % columns
+        neighbors = []
+        if cell >= columns:
+            neighbors.append(cell - columns)
+        if cell < columns * (self.wall_grid.rows - 1):
+            neighbors.append(cell + columns)
+        if column > 0:
+            neighbors.append(cell - 1)
+        if column < columns - 1:
+            neighbors.append(cell + 1)
+        return neighbors
+
+    def _relax(self, frontier, distance):
+        """从 frontier（距离均为 distance）逐层向外，更新变短的距离"""
+        distances = self.distances
+        tiles = self.wall_grid.tiles
+        destroyed = self.wall_grid.destroyed
+        while frontier and distance < self.max_distance:
+            distance += 1
+            next_frontier = []
+            for cell in frontier:
+                for neighbor in self._neighbors(cell):
+                    if ((tiles[neighbor] not in BLOCKING or neighbor in destroyed)
+                            and distances.get(neighbor, distance + 1) > distance):
+                        distances[neighbor] = distance
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+    def _open(self, cell):
+        """cell 的墙壁被摧毁后，修正经过它会变短的距离"""
+        self.repairs += 1
+        reached = [self.distances[neighbor] for neighbor in self._neighbors(cell)
+                   if neighbor in self.distances]
+        if not reached or min(reached) >= self.max_distance:
+            return
+        distance = min(reached) + 1
+        self.distances[cell] = distance
+        self._relax([cell], distance)
+
+    def direction(self, cell):
+        """从 cell 沿最短路走向目标的方向；已在目标格子或不可达时为 None"""
+        distance = self.distances.get(cell)
+        if not distance:
+            return None
+        columns = self.wall_grid.columns
+        column = cell % columns
+        for direction, (dx, dy) in DIRECTION_VECTORS.items():
+            if column + dx < 0 or column + dx >= columns:
+                continue
+            if self.distances.get(cell + dx + dy * columns) == distance - 1:
+                return direction
+        return None
 
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.width, self.height)
+# 坦克绘制
+def draw_tank_shape(surface, x, y, width, height, color, direction):
+    """绘制坦克的履带、车身、炮塔和炮管，(x, y) 为车身左上角"""
+    center_x = x + width // 2
+    center_y = y + height // 2
+
+    # 根据方向旋转坦克的绘制
+    if direction == Direction.UP or direction == Direction.DOWN:
+        # 垂直方向
+        track_width = 8
+        track_height = height
+        body_width = width - 16
+        body_height = height - 4
+
+        # 绘制左履带
+        left_track = pygame.Rect(x + 2, y, track_width, track_height)
+        pygame.draw.rect(surface, (60, 60, 60), left_track)
+        pygame.draw.rect(surface, BLACK, left_track, 1)
+
+        # 绘制右履带
+        right_track = pygame.Rect(x + width - track_width - 2, y, track_width, track_height)
+        pygame.draw.rect(surface, (60, 60, 60), right_track)
+        pygame.draw.rect(surface, BLACK, right_track, 1)
+
+        # 绘制主体
+        body_rect = pygame.Rect(x + 8, y + 2, body_width, body_height)
+        pygame.draw.rect(surface, color, body_rect)
+        pygame.draw.rect(surface, BLACK, body_rect, 2)
+
+    else:
+        # 水平方向
+        track_width = width
+        track_height = 8
+        body_width = width - 4
+        body_height = height - 16
+
+        # 绘制上履带
+        top_track = pygame.Rect(x, y + 2, track_width, track_height)
+        pygame.draw.rect(surface, (60, 60, 60), top_track)
+        pygame.draw.rect(surface, BLACK, top_track, 1)
+
+        # 绘制下履带
+        bottom_track = pygame.Rect(x, y + height - track_height - 2, track_width, track_height)
+        pygame.draw.rect(surface, (60, 60, 60), bottom_track)
+        pygame.draw.rect(surface, BLACK, bottom_track, 1)
+
+        # 绘制主体
+        body_rect = pygame.Rect(x + 2, y + 8, body_width, body_height)
+        pygame.draw.rect(surface, color, body_rect)
+        pygame.draw.rect(surface, BLACK, body_rect, 2)
+
+    # 绘制炮塔（圆形）
+    turret_radius = 10
+    pygame.draw.circle(surface, color, (center_x, center_y), turret_radius)
+    pygame.draw.circle(surface, BLACK, (center_x, center_y), turret_radius, 2)
+
+    # 绘制炮管（更粗更明显）
+    barrel_length = 22
+    barrel_width = 6
+
+    if direction == Direction.UP:
+        barrel_rect = pygame.Rect(center_x - barrel_width // 2, center_y - barrel_length,
+                                  barrel_width, barrel_length)
+    elif direction == Direction.DOWN:
+        barrel_rect = pygame.Rect(center_x - barrel_width // 2, center_y,
+                                  barrel_width, barrel_length)
+    elif direction == Direction.LEFT:
+        barrel_rect = pygame.Rect(center_x - barrel_length, center_y - barrel_width // 2,
+                                  barrel_length, barrel_width)
+    elif direction == Direction.RIGHT:
+        barrel_rect = pygame.Rect(center_x, center_y - barrel_width // 2,
+                                  barrel_length, barrel_width)
+
+    pygame.draw.rect(surface, (40, 40, 40), barrel_rect)
+    pygame.draw.rect(surface, BLACK, barrel_rect, 1)
+
+def get_tank_sprite(color, direction, width, height):
+    """预渲染的坦克贴图，每种 (颜色, 方向, 尺寸) 只绘制一次"""
+    key = (color, direction, width, height)
+    sprite = _tank_sprites.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((width + 2 * SPRITE_MARGIN, height + 2 * SPRITE_MARGIN),
+                                pygame.SRCALPHA)
+        draw_tank_shape(sprite, SPRITE_MARGIN, SPRITE_MARGIN, width, height, color, direction)
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert_alpha()  # 转换为显示格式，blit 更快
+        _tank_sprites[key] = sprite
+    return sprite
 
 # 坦克基类
 class Tank:
     def __init__(self, x, y, color):
         self.x = x
         self.y = y
-        self.width = 35
-        self.height = 35
+        self.width = TANK_SIZE
+        self.height = TANK_SIZE
         self.color = color
+        self.prev_x = x  # 上一模拟步的位置，用于插值渲染
+        self.prev_y = y
         self.direction = Direction.UP
         self.speed = 3
         self.health = 1
         self.shoot_cooldown = 0
-        self.shoot_delay = 30  # 射击冷却时间（帧）
+        self.shoot_delay = SHOOT_DELAY
 
     def get_rect(self):
         return pygame.Rect(self.x, self.y, self.width, self.height)
 
-    def draw(self, screen):
+    def save_position(self):
+        self.prev_x, self.prev_y = self.x, self.y
+
+    def draw(self, screen, alpha=1.0, offset=(0, 0)):
         if self.health > 0:
-            center_x = self.x + self.width // 2
-            center_y = self.y + self.height // 2
-
-            # 根据方向旋转坦克的绘制
-            if self.direction == Direction.UP or self.direction == Direction.DOWN:
-                # 垂直方向
-                track_width = 8
-                track_height = self.height
-                body_width = self.width - 16
-                body_height = self.height - 4
-
-                # 绘制左履带
-                left_track = pygame.Rect(self.x + 2, self.y, track_width, track_height)
-                pygame.draw.rect(screen, (60, 60, 60), left_track)
-                pygame.draw.rect(screen, BLACK, left_track, 1)
-
-                # 绘制右履带
-                right_track = pygame.Rect(self.x + self.width - track_width - 2, self.y, track_width, track_height)
-                pygame.draw.rect(screen, (60, 60, 60), right_track)
-                pygame.draw.rect(screen, BLACK, right_track, 1)
-
-                # 绘制主体
-                body_rect = pygame.Rect(self.x + 8, self.y + 2, body_width, body_height)
-                pygame.draw.rect(screen, self.color, body_rect)
-                pygame.draw.rect(screen, BLACK, body_rect, 2)
+            x = lerp(self.prev_x, self.x, alpha)
+            y = lerp(self.prev_y, self.y, alpha)
+            sprite = get_tank_sprite(self.color, self.direction, self.width, self.height)
+            screen.blit(sprite, (int(x) - SPRITE_MARGIN - offset[0],
+                                 int(y) - SPRITE_MARGIN - offset[1]))
 
-            else:
-                # 水平方向
-                track_width = self.width
-                track_height = 8
-                body_width = self.width - 4
-                body_height = self.height - 16
-
-                # 绘制上履带
-                top_track = pygame.Rect(self.x, self.y + 2, track_width, track_height)
-                pygame.draw.rect(screen, (60, 60, 60), top_track)
-                pygame.draw.rect(screen, BLACK, top_track, 1)
-
-                # 绘制下履带
-                bottom_track = pygame.Rect(self.x, self.y + self.height - track_height - 2, track_width, track_height)
-                pygame.draw.rect(screen, (60, 60, 60), bottom_track)
-                pygame.draw.rect(screen, BLACK, bottom_track, 1)
-
-                # 绘制主体
-                body_rect = pygame.Rect(self.x + 2, self.y + 8, body_width, body_height)
-                pygame.draw.rect(screen, self.color, body_rect)
-                pygame.draw.rect(screen, BLACK, body_rect, 2)
-
-            # 绘制炮塔（圆形）
-            turret_radius = 10
-            pygame.draw.circle(screen, self.color, (center_x, center_y), turret_radius)
-            pygame.draw.circle(screen, BLACK, (center_x, center_y), turret_radius, 2)
-
-            # 绘制炮管（更粗更明显）
-            barrel_length = 22
-            barrel_width = 6
-
-            if self.direction == Direction.UP:
-                barrel_rect = pygame.Rect(center_x - barrel_width // 2, center_y - barrel_length,
-                                        barrel_width, barrel_length)
-            elif self.direction == Direction.DOWN:
-                barrel_rect = pygame.Rect(center_x - barrel_width // 2, center_y,
-                                        barrel_width, barrel_length)
-            elif self.direction == Direction.LEFT:
-                barrel_rect = pygame.Rect(center_x - barrel_length, center_y - barrel_width // 2,
-                                        barrel_length, barrel_width)
-            elif self.direction == Direction.RIGHT:
-                barrel_rect = pygame.Rect(center_x, center_y - barrel_width // 2,
-                                        barrel_length, barrel_width)
-
-            pygame.draw.rect(screen, (40, 40, 40), barrel_rect)
-            pygame.draw.rect(screen, BLACK, barrel_rect, 1)
-
-    def shoot(self):
+    def shoot(self, bullets):
         if self.shoot_cooldown <= 0:
-            center_x = self.x + self.width // 2
-            center_y = self.y + self.height // 2
-
-            # 根据方向调整子弹起始位置
-            if self.direction == Direction.UP:
-                bullet_x, bullet_y = center_x, center_y - 20
-            elif self.direction == Direction.DOWN:
-                bullet_x, bullet_y = center_x, center_y + 20
-            elif self.direction == Direction.LEFT:
-                bullet_x, bullet_y = center_x - 20, center_y
-            elif self.direction == Direction.RIGHT:
-                bullet_x, bullet_y = center_x + 20, center_y
-
+            bullet_x, bullet_y = muzzle_position(self.x, self.y, self.direction)
             self.shoot_cooldown = self.shoot_delay
-            return Bullet(bullet_x, bullet_y, self.direction, 'player')
-        return None
+            bullets.add(bullet_x, bullet_y, self.direction, 'player')
 
     def update(self):
         if self.shoot_cooldown > 0:
@@ -287,7 +682,7 @@ class PlayerTank(Tank):
         self.health = 3
         self.lives = 3
 
-    def move(self, keys, walls):
+    def move(self, keys, wall_grid):
         old_x, old_y = self.x, self.y
 
         if keys[pygame.K_w] or keys[pygame.K_UP]:
@@ -303,213 +698,372 @@ class PlayerTank(Tank):
             self.direction = Direction.RIGHT
             self.x += self.speed
 
-        # 检查边界
+        # 检查地图边界
         if self.x < 0:
             self.x = 0
-        if self.x > SCREEN_WIDTH - self.width:
-            self.x = SCREEN_WIDTH - self.width
+        if self.x > wall_grid.width - self.width:
+            self.x = wall_grid.width - self.width
         if self.y < 0:
             self.y = 0
-        if self.y > SCREEN_HEIGHT - self.height:
-            self.y = SCREEN_HEIGHT - self.height
+        if self.y > wall_grid.height - self.height:
+            self.y = wall_grid.height - self.height
 
         # 检查墙壁碰撞（草丛除外）
-        for wall in walls:
-            if wall.active and wall.wall_type != WallType.GRASS:
-                if self.get_rect().colliderect(wall.get_rect()):
-                    self.x, self.y = old_x, old_y
-                    break
-
-# 敌人坦克类
-class EnemyTank(Tank):
-    def __init__(self, x, y, level=1):
-        super().__init__(x, y, RED)
-        self.speed = 2 + (level - 1) * 0.5  # 随关卡提升速度
-        self.move_timer = 0
-        self.move_interval = 120  # 每2秒（120帧）换方向
-        self.shoot_timer = 0
-        self.shoot_interval = random.randint(60, 180)  # 随机射击间隔
-        self.direction = random.choice(list(Direction))
-
-    def update_ai(self, walls):
-        self.move_timer += 1
-        self.shoot_timer += 1
-
-        # 随机改变方向
-        if self.move_timer >= self.move_interval:
-            self.direction = random.choice(list(Direction))
-            self.move_timer = 0
-            self.move_interval = random.randint(60, 180)
-
-        # 移动
-        old_x, old_y = self.x, self.y
-
-        if self.direction == Direction.UP:
-            self.y -= self.speed
-        elif self.direction == Direction.DOWN:
-            self.y += self.speed
-        elif self.direction == Direction.LEFT:
-            self.x -= self.speed
-        elif self.direction == Direction.RIGHT:
-            self.x += self.speed
-
-        # 检查边界
-        if self.x < 0 or self.x > SCREEN_WIDTH - self.width or \
-           self.y < 0 or self.y > SCREEN_HEIGHT - self.height:
+        if wall_grid.blocked(self.get_rect()):
             self.x, self.y = old_x, old_y
-            self.direction = random.choice(list(Direction))
 
-        # 检查墙壁碰撞
-        for wall in walls:
-            if wall.active and wall.wall_type != WallType.GRASS:
-                if self.get_rect().colliderect(wall.get_rect()):
-                    self.x, self.y = old_x, old_y
-                    self.direction = random.choice(list(Direction))
-                    break
+# 敌人坦克存储
+class EnemyStore(EntityStore):
+    COLUMNS = ('x', 'y', 'prev_x', 'prev_y', 'direction', 'speed', 'health',
+               'move_timer', 'move_interval', 'shoot_timer', 'shoot_interval',
+               'shoot_cooldown', 'path_cell', 'path_direction', 'active')
+    width = TANK_SIZE
+    height = TANK_SIZE
+
+    def add(self, x, y, level=1, rng=random):
+        self.x.append(x)
+        self.y.append(y)
+        self.prev_x.append(x)
+        self.prev_y.append(y)
+        self.speed.append(2 + (level - 1) * 0.5)  # 随关卡提升速度
+        self.health.append(1)
+        self.move_timer.append(0)
+        self.move_interval.append(120)  # 每2秒（120帧）换方向
+        self.shoot_timer.append(0)
+        self.shoot_interval.append(rng.randint(60, 180))  # 随机射击间隔
+        self.direction.append(rng.choice(list(Direction)))
+        self.shoot_cooldown.append(0)
+        self.path_cell.append(-1)  # 上次按距离场转向时车身中心所在的格子
+        self.path_direction.append(None)  # 正在沿距离场前进的方向，随机转向后为 None
+        self.active.append(True)
+        self.added += 1
+        self.chunks = None
+
+    def get_rect(self, i):
+        return pygame.Rect(self.x[i], self.y[i], self.width, self.height)
+
+    def update_ai(self, wall_grid, flow_field=None, rng=random):
+        """所有敌人移动一步；有距离场时沿最短路追向玩家"""
+        directions = list(Direction)
+        self.move_timer[:] = [timer + 1 for timer in self.move_timer]
+        self.shoot_timer[:] = [timer + 1 for timer in self.shoot_timer]
+
+        # 随机改变方向；在进入下一个格子之前不再按距离场转向
+        for i, (timer, interval) in enumerate(zip(self.move_timer, self.move_interval)):
+            if timer >= interval:
+                self.direction[i] = rng.choice(directions)
+                self.path_direction[i] = None
+                self.move_timer[i] = 0
+                self.move_interval[i] = rng.randint(60, 180)
+
+        # 车身中心进入新格子时，取距离场给出的方向；
+        # 先横向移到格子的通道中间再前进，转弯时不会擦到墙角
+        steps = list(self.speed)
+        if flow_field is not None:
+            half = self.width // 2
+            lane = (TILE_SIZE - self.width) // 2  # 车身在通道中间时与格子边缘的距离
+            columns = wall_grid.columns
+            for i, (x, y) in enumerate(zip(self.x, self.y)):
+                column = int(x + half) // TILE_SIZE
+                row = int(y + half) // TILE_SIZE
+                cell = row * columns + column
+                if cell != self.path_cell[i]:
+                    self.path_cell[i] = cell
+                    self.path_direction[i] = flow_field.direction(cell)
+                direction = self.path_direction[i]
+                if direction is None:
+                    continue
+                if DIRECTION_VECTORS[direction][0]:
+                    offset = row * TILE_SIZE + lane - y
+                    nudge = Direction.DOWN if offset > 0 else Direction.UP
+                else:
+                    offset = column * TILE_SIZE + lane - x
+                    nudge = Direction.RIGHT if offset > 0 else Direction.LEFT
+                if offset:
+                    direction = nudge
+                    steps[i] = min(steps[i], abs(offset))
+                self.direction[i] = direction
+
+        # 整列计算移动后的位置
+        new_x = [x + DIRECTION_VECTORS[d][0] * step
+                 for x, d, step in zip(self.x, self.direction, steps)]
+        new_y = [y + DIRECTION_VECTORS[d][1] * step
+                 for y, d, step in zip(self.y, self.direction, steps)]
+
+        # 出界或撞墙的敌人退回原位并换方向
+        max_x = wall_grid.width - self.width
+        max_y = wall_grid.height - self.height
+        for i, (x, y) in enumerate(zip(new_x, new_y)):
+            if x < 0 or x > max_x or y < 0 or y > max_y:
+                x, y = self.x[i], self.y[i]
+                self.direction[i] = rng.choice(directions)
+                self.path_direction[i] = None
+            if wall_grid.blocked(pygame.Rect(x, y, self.width, self.height)):
+                x, y = self.x[i], self.y[i]
+                self.direction[i] = rng.choice(directions)
+                self.path_direction[i] = None
+            new_x[i], new_y[i] = x, y
+        self.x[:] = new_x
+        self.y[:] = new_y
+        self.chunks = None
 
         # 更新射击冷却
-        super().update()
-
-    def try_shoot(self):
-        if self.shoot_timer >= self.shoot_interval:
-            self.shoot_timer = 0
-            self.shoot_interval = random.randint(60, 180)
-            if self.shoot_cooldown <= 0:
-                center_x = self.x + self.width // 2
-                center_y = self.y + self.height // 2
-
-                if self.direction == Direction.UP:
-                    bullet_x, bullet_y = center_x, center_y - 20
-                elif self.direction == Direction.DOWN:
-                    bullet_x, bullet_y = center_x, center_y + 20
-                elif self.direction == Direction.LEFT:
-                    bullet_x, bullet_y = center_x - 20, center_y
-                elif self.direction == Direction.RIGHT:
-                    bullet_x, bullet_y = center_x + 20, center_y
-
-                self.shoot_cooldown = self.shoot_delay
-                return Bullet(bullet_x, bullet_y, self.direction, 'enemy')
-        return None
+        self.shoot_cooldown[:] = [cooldown - 1 if cooldown > 0 else cooldown
+                                  for cooldown in self.shoot_cooldown]
+
+    def first_hit(self, rect):
+        """逐个检查：与 rect 重叠的存活敌人中行号最小的一个，没有则为 -1"""
+        for j in range(len(self)):
+            if self.active[j] and rect.colliderect(self.get_rect(j)):
+                return j
+        return -1
+
+    def try_shoot(self, bullets, rng=random):
+        for i, (timer, interval) in enumerate(zip(self.shoot_timer, self.shoot_interval)):
+            if timer < interval:
+                continue
+            self.shoot_timer[i] = 0
+            self.shoot_interval[i] = rng.randint(60, 180)
+            if self.shoot_cooldown[i] <= 0:
+                bullet_x, bullet_y = muzzle_position(self.x[i], self.y[i], self.direction[i])
+                self.shoot_cooldown[i] = SHOOT_DELAY
+                bullets.add(bullet_x, bullet_y, self.direction[i], 'enemy')
+
+    def draw(self, screen, alpha=1.0, offset=(0, 0), rows=None):
+        """绘制 rows 中的敌人（默认全部），offset 为视口左上角的地图坐标"""
+        offset_x = SPRITE_MARGIN + offset[0]
+        offset_y = SPRITE_MARGIN + offset[1]
+        if rows is None:
+            rows = range(len(self))
+        for i in rows:
+            if self.active[i]:
+                sprite = get_tank_sprite(RED, self.direction[i], self.width, self.height)
+                screen.blit(sprite, (int(lerp(self.prev_x[i], self.x[i], alpha)) - offset_x,
+                                     int(lerp(self.prev_y[i], self.y[i], alpha)) - offset_y))
+
+# 敌人空间哈希：每个模拟步重建，子弹只检查附近格子中的敌人
+class EnemyHash:
+    def __init__(self, cell_size=BROADPHASE_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (列, 行) -> 敌人行号列表，按行号递增
+        self.rects = []
+        self.enemies = None
+
+    def rebuild(self, enemies):
+        size = self.cell_size
+        self.enemies = enemies
+        self.rects = [pygame.Rect(x, y, enemies.width, enemies.height)
+                      for x, y in zip(enemies.x, enemies.y)]
+        cells = self.cells = {}
+        for j, rect in enumerate(self.rects):
+            if not enemies.active[j]:
+                continue
+            for row in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                for column in range(rect.left // size, (rect.right - 1) // size + 1):
+                    cells.setdefault((column, row), []).append(j)
+
+    def first_hit(self, rect):
+        """与 rect 重叠的存活敌人中行号最小的一个，没有则为 -1"""
+        size = self.cell_size
+        active = self.enemies.active
+        hit = -1
+        for row in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            for column in range(rect.left // size, (rect.right - 1) // size + 1):
+                for j in self.cells.get((column, row), ()):
+                    if hit != -1 and j >= hit:
+                        break
+                    if active[j] and rect.colliderect(self.rects[j]):
+                        hit = j
+                        break
+        return hit
+
+class Camera:
+    """视口在地图中的位置：跟随一个点，并限制在地图范围内"""
+
+    def __init__(self, view_width, view_height, map_width, map_height):
+        self.width = view_width
+        self.height = view_height
+        self.max_x = max(0, map_width - view_width)
+        self.max_y = max(0, map_height - view_height)
+        self.x = 0
+        self.y = 0
+
+    def follow(self, x, y):
+        """让 (x, y) 尽量位于视口中心；取整，避免静止物体随小数偏移抖动"""
+        self.x = max(0, min(int(x) - self.width // 2, self.max_x))
+        self.y = max(0, min(int(y) - self.height // 2, self.max_y))
+
+    @property
+    def offset(self):
+        return self.x, self.y
+
+    def rect(self, margin=0):
+        """视口覆盖的地图区域，四周各扩大 margin"""
+        return pygame.Rect(self.x - margin, self.y - margin,
+                           self.width + 2 * margin, self.height + 2 * margin)
 
 # 游戏类
 class TankGame:
-    def __init__(self, screen):
-        self.screen = screen
-        pygame.display.set_caption("Tank Battle")
+    GAME_ID = 'tank'
+    # 游戏会读取的按键，录制与回放按此表编码
+    INPUT_KEYS = (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d,
+                  pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT,
+                  pygame.K_SPACE, pygame.K_r)
+    # 子弹与敌人的碰撞先经过空间哈希；设为 False 时逐个检查，用于校验
+    use_broadphase = True
+
+    def __init__(self, screen, seed=None, map_size=None, map_path=None):
+        self.screen = screen  # 无界面模拟时为 None
+        # 关卡来自地图文件，或按 map_size（格）随机生成，默认与屏幕一样大；
+        # 比屏幕大的地图由摄像机跟随玩家滚动
+        # 地图文件整局只读映射一次，被摧毁的砖墙记在 WallGrid 中，不写回地图；close() 解除映射
+        self.map_file = TileMap.load(map_path) if map_path is not None else None
+        if self.map_file is not None:
+            self.tile_map = self.map_file
+        else:
+            self.tile_map = TileMap(*(map_size or (SCREEN_WIDTH // TILE_SIZE,
+                                                   SCREEN_HEIGHT // TILE_SIZE)))
+        columns, rows = self.tile_map.columns, self.tile_map.rows
+        self.map_width = columns * TILE_SIZE
+        self.map_height = rows * TILE_SIZE
+        self.camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, self.map_width, self.map_height)
+        self.presented_camera = None  # 上一帧呈现时的视口位置
+        # 每局游戏使用独立的随机数生成器，相同种子 + 相同输入 = 相同过程
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 36)
-        self.small_font = pygame.font.Font(None, 24)
+        self.font = get_font(36)
+        self.small_font = get_font(24)
+        self.presented_state = None  # 上一帧呈现时的游戏状态
+        self.overlay_cache = OverlayCache()
+
+        # 实体存储和对象池在整局游戏中复用，换关时只清空
+        self.enemies = EnemyStore()
+        self.bullets = BulletStore()
+        self.explosions = []
+        self.explosion_pool = Pool(Explosion)
+        self.enemy_hash = EnemyHash()
 
         self.reset_game()
+        launch_timing.mark('constructed')
 
     def reset_game(self):
         self.state = GameState.PLAYING
         self.level = 1
-        self.player = PlayerTank(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80)
-        self.enemies = []
-        self.bullets = []
-        self.walls = []
-        self.explosions = []
+        self.player = PlayerTank(*self.player_spawn())
         self.enemies_killed = 0
         self.enemies_per_level = 3
 
         self.create_level()
 
+    def player_spawn(self):
+        """玩家出生和复活的位置"""
+        column, row = self.tile_map.player_spawn
+        return column * TILE_SIZE, row * TILE_SIZE
+
     def create_level(self):
-        self.enemies = []
-        self.bullets = []
-        self.walls = []
+        self.enemies.clear()
+        self.bullets.clear()
+        self.explosion_pool.release_all(self.explosions)
         self.explosions = []
-
-        # 创建敌人
-        num_enemies = self.enemies_per_level + (self.level - 1)
+        self.explosion_chunks = None  # 爆炸的位置索引；爆炸增删后失效，下次查询时重建
+        self.damaged_rects = []  # 被摧毁的砖墙，下一帧需要刷新
+        self.destroyed_walls = []  # 本关被摧毁的格子序号，按摧毁顺序
+
+        if self.map_file is not None:
+            # 每关使用新的 WallGrid，上一关被摧毁的砖墙随之恢复
+            spawns = self.tile_map.enemy_spawns
+            num_enemies = self.tile_map.wave_size(self.level)
+        else:
+            spawns = None
+            num_enemies = None
+        if num_enemies is None:
+            num_enemies = self.enemies_per_level + (self.level - 1)
+
+        # 创建敌人：轮流使用地图的出生点，没有出生点时随机放在地图上方
         for i in range(num_enemies):
-            x = random.randint(50, SCREEN_WIDTH - 100)
-            y = random.randint(50, 200)
-            self.enemies.append(EnemyTank(x, y, self.level))
+            if spawns:
+                column, row = spawns[i % len(spawns)]
+                x, y = column * TILE_SIZE, row * TILE_SIZE
+            else:
+                x = self.rng.randint(50, self.map_width - 100)
+                y = self.rng.randint(50, 200)
+            self.enemies.add(x, y, self.level, self.rng)
 
         # 创建地图元素
-        self.create_walls()
-
-    def create_walls(self):
-        # 创建一些随机墙壁
-        for i in range(15):
-            x = random.randint(1, SCREEN_WIDTH // TILE_SIZE - 2) * TILE_SIZE
-            y = random.randint(3, SCREEN_HEIGHT // TILE_SIZE - 3) * TILE_SIZE
-            wall_type = random.choice([WallType.BRICK, WallType.BRICK, WallType.STONE])
-            self.walls.append(Wall(x, y, wall_type))
-
-        # 添加一些草丛
-        for i in range(10):
-            x = random.randint(1, SCREEN_WIDTH // TILE_SIZE - 2) * TILE_SIZE
-            y = random.randint(3, SCREEN_HEIGHT // TILE_SIZE - 3) * TILE_SIZE
-            self.walls.append(Wall(x, y, WallType.GRASS))
-
-        # 创建边界墙
-        for x in range(0, SCREEN_WIDTH, TILE_SIZE):
-            self.walls.append(Wall(x, 0, WallType.STONE))
-            self.walls.append(Wall(x, SCREEN_HEIGHT - TILE_SIZE, WallType.STONE))
-        for y in range(0, SCREEN_HEIGHT, TILE_SIZE):
-            self.walls.append(Wall(0, y, WallType.STONE))
-            self.walls.append(Wall(SCREEN_WIDTH - TILE_SIZE, y, WallType.STONE))
+        if self.map_file is None:
+            self.tile_map = generate_map(self.tile_map.columns, self.tile_map.rows, self.rng)
+        self.wall_grid = WallGrid(self.tile_map)
+        self.flow_field = FlowField(self.wall_grid)
+        self.terrain = TerrainCache(self.tile_map)  # 只由绘制使用，第一次绘制时才渲染
 
     def handle_collisions(self):
+        bullets = self.bullets
+        enemies = self.enemies
+
         # 子弹与墙壁碰撞
-        for bullet in self.bullets[:]:
-            if not bullet.active:
+        for i in range(len(bullets)):
+            if not bullets.active[i]:
                 continue
 
-            for wall in self.walls:
-                if not wall.active or wall.wall_type == WallType.GRASS:
-                    continue
-
-                if bullet.get_rect().colliderect(wall.get_rect()):
-                    bullet.active = False
-                    if wall.wall_type == WallType.BRICK:
-                        wall.active = False
-                    break
-
-        # 子弹与坦克碰撞
-        for bullet in self.bullets[:]:
-            if not bullet.active:
+            cell = self.wall_grid.first_hit(bullets.get_rect(i))
+            if cell != -1:
+                bullets.active[i] = False
+                if self.wall_grid.tiles[cell] == WallType.BRICK:
+                    self.wall_grid.remove(cell)
+                    self.destroyed_walls.append(cell)
+                    self.damaged_rects.append(self.wall_grid.cell_rect(cell))
+
+        # 子弹与坦克碰撞；本步内敌人不再移动，空间哈希只需建一次
+        if not self.use_broadphase:
+            find_enemy = enemies.first_hit
+        elif 'player' in bullets.owner:
+            self.enemy_hash.rebuild(enemies)
+            find_enemy = self.enemy_hash.first_hit
+        for i in range(len(bullets)):
+            if not bullets.active[i]:
                 continue
 
+            bullet_rect = bullets.get_rect(i)
             # 玩家子弹打敌人
-            if bullet.owner == 'player':
-                for enemy in self.enemies[:]:
-                    if bullet.get_rect().colliderect(enemy.get_rect()):
-                        bullet.active = False
-                        enemy.health -= 1
-                        # 创建爆炸效果
-                        explosion_x = enemy.x + enemy.width // 2
-                        explosion_y = enemy.y + enemy.height // 2
-                        self.explosions.append(Explosion(explosion_x, explosion_y))
-                        if enemy.health <= 0:
-                            self.enemies.remove(enemy)
-                            self.enemies_killed += 1
-                        break
+            if bullets.owner[i] == 'player':
+                j = find_enemy(bullet_rect)
+                if j != -1:
+                    bullets.active[i] = False
+                    enemies.health[j] -= 1
+                    # 创建爆炸效果
+                    explosion_x = enemies.x[j] + enemies.width // 2
+                    explosion_y = enemies.y[j] + enemies.height // 2
+                    self.explosions.append(self.explosion_pool.acquire(explosion_x, explosion_y))
+                    self.explosion_chunks = None
+                    if enemies.health[j] <= 0:
+                        # 只做标记，循环结束后统一移除
+                        enemies.active[j] = False
+                        self.enemies_killed += 1
 
             # 敌人子弹打玩家
-            elif bullet.owner == 'enemy':
-                if bullet.get_rect().colliderect(self.player.get_rect()):
-                    bullet.active = False
+            elif bullets.owner[i] == 'enemy':
+                if bullet_rect.colliderect(self.player.get_rect()):
+                    bullets.active[i] = False
                     self.player.health -= 1
                     # 创建爆炸效果
                     explosion_x = self.player.x + self.player.width // 2
                     explosion_y = self.player.y + self.player.height // 2
-                    self.explosions.append(Explosion(explosion_x, explosion_y))
+                    self.explosions.append(self.explosion_pool.acquire(explosion_x, explosion_y))
+                    self.explosion_chunks = None
                     if self.player.health <= 0:
                         self.player.lives -= 1
                         if self.player.lives > 0:
                             # 重置玩家位置和生命
-                            self.player.x = SCREEN_WIDTH // 2
-                            self.player.y = SCREEN_HEIGHT - 80
+                            self.player.x, self.player.y = self.player_spawn()
+                            self.player.save_position()
                             self.player.health = 3
                         else:
                             self.state = GameState.GAME_OVER
 
-        # 移除不活跃的子弹
-        self.bullets = [b for b in self.bullets if b.active]
+        # 移除不活跃的子弹和被消灭的敌人
+        bullets.compact()
+        enemies.compact()
 
         # 检查关卡完成
         if len(self.enemies) == 0:
@@ -517,167 +1071,266 @@ class TankGame:
 
     def draw_ui(self):
         # 绘制生命值
-        lives_text = self.small_font.render(f"Lives: {self.player.lives}", True, WHITE)
+        lives_text = render_text(self.small_font, f"Lives: {self.player.lives}", WHITE)
         self.screen.blit(lives_text, (10, 10))
 
         # 绘制血量
-        health_text = self.small_font.render(f"Health: {self.player.health}", True, WHITE)
+        health_text = render_text(self.small_font, f"Health: {self.player.health}", WHITE)
         self.screen.blit(health_text, (10, 35))
 
         # 绘制关卡
-        level_text = self.small_font.render(f"Level: {self.level}", True, WHITE)
+        level_text = render_text(self.small_font, f"Level: {self.level}", WHITE)
         self.screen.blit(level_text, (SCREEN_WIDTH - 100, 10))
 
         # 绘制敌人数量
-        enemies_text = self.small_font.render(f"Enemies: {len(self.enemies)}", True, WHITE)
+        enemies_text = render_text(self.small_font, f"Enemies: {len(self.enemies)}", WHITE)
         self.screen.blit(enemies_text, (SCREEN_WIDTH - 120, 35))
 
     def draw_game_over(self):
+        # 遮罩和文字只在状态或数值变化时重新合成
+        key = (self.state, self.level, self.enemies_killed)
+        overlay = self.overlay_cache.get(key, self.build_game_over_overlay)
+        overlay.draw(self.screen)
+
+    def build_game_over_overlay(self):
         # 半透明黑色背景
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        overlay = dim_overlay((SCREEN_WIDTH, SCREEN_HEIGHT), BLACK)
 
         # 游戏结束文本
-        game_over_text = self.font.render("GAME OVER", True, RED)
+        game_over_text = render_text(self.font, "GAME OVER", RED)
         text_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
-        self.screen.blit(game_over_text, text_rect)
+        overlay.blit(game_over_text, text_rect)
 
         # 统计信息
-        stats_text = self.small_font.render(f"Level Reached: {self.level}", True, WHITE)
+        stats_text = render_text(self.small_font, f"Level Reached: {self.level}", WHITE)
         stats_rect = stats_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-        self.screen.blit(stats_text, stats_rect)
+        overlay.blit(stats_text, stats_rect)
 
-        kills_text = self.small_font.render(f"Enemies Killed: {self.enemies_killed}", True, WHITE)
+        kills_text = render_text(self.small_font, f"Enemies Killed: {self.enemies_killed}", WHITE)
         kills_rect = kills_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 30))
-        self.screen.blit(kills_text, kills_rect)
+        overlay.blit(kills_text, kills_rect)
 
         # 按钮提示
-        restart_text = self.small_font.render("Press R to Restart", True, GREEN)
+        restart_text = render_text(self.small_font, "Press R to Restart", GREEN)
         restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 80))
-        self.screen.blit(restart_text, restart_rect)
+        overlay.blit(restart_text, restart_rect)
 
-        back_text = self.small_font.render("Press ESC to Menu", True, YELLOW)
+        back_text = render_text(self.small_font, "Press ESC to Menu", YELLOW)
         back_rect = back_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 110))
-        self.screen.blit(back_text, back_rect)
+        overlay.blit(back_text, back_rect)
+        return overlay
 
     def draw_level_complete(self):
+        # 遮罩和文字只在状态或数值变化时重新合成
+        key = (self.state,)
+        overlay = self.overlay_cache.get(key, self.build_level_complete_overlay)
+        overlay.draw(self.screen)
+
+    def build_level_complete_overlay(self):
         # 半透明绿色背景
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill((0, 50, 0))
-        self.screen.blit(overlay, (0, 0))
+        overlay = dim_overlay((SCREEN_WIDTH, SCREEN_HEIGHT), (0, 50, 0))
 
         # 关卡完成文本
-        complete_text = self.font.render("LEVEL COMPLETE!", True, YELLOW)
+        complete_text = render_text(self.font, "LEVEL COMPLETE!", YELLOW)
         text_rect = complete_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
-        self.screen.blit(complete_text, text_rect)
+        overlay.blit(complete_text, text_rect)
 
         # 提示文本
-        next_text = self.small_font.render("Press SPACE for Next Level", True, WHITE)
+        next_text = render_text(self.small_font, "Press SPACE for Next Level", WHITE)
         next_rect = next_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20))
-        self.screen.blit(next_text, next_rect)
-
-    def run(self):
-        running = True
-
-        while running:
-            self.clock.tick(FPS)
-
-            # 事件处理
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return False  # 返回False表示退出整个程序
-
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        return True  # 返回True表示返回主菜单
-
-                if self.state == GameState.PLAYING:
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_SPACE:
-                            bullet = self.player.shoot()
-                            if bullet:
-                                self.bullets.append(bullet)
-
-                elif self.state == GameState.GAME_OVER:
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_r:
-                            self.reset_game()
-
-                elif self.state == GameState.LEVEL_COMPLETE:
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_SPACE:
-                            self.level += 1
-                            self.create_level()
-                            self.state = GameState.PLAYING
-
-            # 游戏逻辑更新
-            if self.state == GameState.PLAYING:
+        overlay.blit(next_text, next_rect)
+        return overlay
+
+    def state_checksum(self):
+        """模拟状态的 CRC32，用于回放时逐步校验"""
+        state = (self.state.value, self.level, self.enemies_killed,
+                 self.player.x, self.player.y, self.player.direction.value,
+                 self.player.health, self.player.lives,
+                 tuple(zip(self.enemies.x, self.enemies.y,
+                           [d.value for d in self.enemies.direction], self.enemies.health)),
+                 tuple(zip(self.bullets.x, self.bullets.y, self.bullets.owner)),
+                 tuple(self.destroyed_walls))
+        return zlib.crc32(repr(state).encode())
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            return False  # 返回False表示退出整个程序
+
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                return True  # 返回True表示返回主菜单
+            self.handle_key(event.key)
+        return None
+
+    def handle_key(self, key):
+        if self.state == GameState.PLAYING:
+            if key == pygame.K_SPACE:
+                self.player.shoot(self.bullets)
+
+        elif self.state == GameState.GAME_OVER:
+            if key == pygame.K_r:
+                self.reset_game()
+
+        elif self.state == GameState.LEVEL_COMPLETE:
+            if key == pygame.K_SPACE:
+                self.level += 1
+                self.create_level()
+                self.state = GameState.PLAYING
+
+    def step(self, inputs):
+        """无界面推进一个模拟步：先处理按键，再更新，不进行任何渲染"""
+        for key in inputs.pressed:
+            self.handle_key(key)
+        self.update(inputs.held_keys())
+
+    def update(self, keys=None):
+        # 记录上一模拟步的位置，用于插值渲染
+        self.player.save_position()
+        self.enemies.save_positions()
+        self.bullets.save_positions()
+
+        # 游戏逻辑更新
+        if self.state == GameState.PLAYING:
+            if keys is None:
                 keys = pygame.key.get_pressed()
-                self.player.move(keys, self.walls)
-                self.player.update()
+            self.player.move(keys, self.wall_grid)
+            self.player.update()
 
-                # 更新敌人
-                for enemy in self.enemies:
-                    enemy.update_ai(self.walls)
-                    bullet = enemy.try_shoot()
-                    if bullet:
-                        self.bullets.append(bullet)
+            # 更新敌人：所有敌人一起移动，再一起射击
+            player = self.player
+            self.flow_field.update(player.x + player.width // 2, player.y + player.height // 2)
+            self.enemies.update_ai(self.wall_grid, self.flow_field, self.rng)
+            self.enemies.try_shoot(self.bullets, self.rng)
 
-                # 更新子弹
-                for bullet in self.bullets:
-                    bullet.update()
+            # 更新子弹
+            self.bullets.update(self.map_width, self.map_height)
 
-                # 更新爆炸效果
-                for explosion in self.explosions:
-                    explosion.update()
+            # 更新爆炸效果
+            for explosion in self.explosions:
+                explosion.update()
 
-                # 移除已完成的爆炸
-                self.explosions = [e for e in self.explosions if e.active]
+            # 移除已完成的爆炸，放回对象池
+            self.explosions = self.explosion_pool.keep(self.explosions, is_active)
+            self.explosion_chunks = None
 
-                # 处理碰撞
+            # 处理碰撞
+            with frame_profiler.section('collision'):
                 self.handle_collisions()
 
-            # 渲染
+    def draw(self, alpha=1.0):
+        # 摄像机跟随插值后的玩家中心
+        player = self.player
+        self.camera.follow(lerp(player.prev_x, player.x, alpha) + player.width // 2,
+                           lerp(player.prev_y, player.y, alpha) + player.height // 2)
+        offset = self.camera.offset
+        # 只绘制视口附近的物体，绘制开销与地图大小无关
+        view = self.camera.rect(CULL_MARGIN)
+        self.terrain.patch(self.destroyed_walls)
+
+        # 渲染；烘焙的背景不透明，只有地图比屏幕小时才需要清屏
+        if self.map_width < SCREEN_WIDTH or self.map_height < SCREEN_HEIGHT:
             self.screen.fill(BLACK)
 
-            # 绘制墙壁（先绘制非草丛）
-            for wall in self.walls:
-                if wall.wall_type != WallType.GRASS:
-                    wall.draw(self.screen)
-
-            # 绘制坦克和子弹
-            self.player.draw(self.screen)
-            for enemy in self.enemies:
-                enemy.draw(self.screen)
-            for bullet in self.bullets:
-                bullet.draw(self.screen)
-
-            # 绘制草丛（在坦克之后，实现遮挡效果）
-            for wall in self.walls:
-                if wall.wall_type == WallType.GRASS:
-                    wall.draw(self.screen)
-
-            # 绘制爆炸效果（在最上层）
-            for explosion in self.explosions:
-                explosion.draw(self.screen)
-
-            # 绘制UI
-            self.draw_ui()
-
-            # 绘制游戏状态
-            if self.state == GameState.GAME_OVER:
-                self.draw_game_over()
-            elif self.state == GameState.LEVEL_COMPLETE:
-                self.draw_level_complete()
-
-            pygame.display.flip()
+        # 绘制墙壁（草丛之外的地形）
+        self.terrain.draw_background(self.screen, self.camera)
+
+        # 绘制坦克和子弹
+        player.draw(self.screen, alpha, offset)
+        self.enemies.draw(self.screen, alpha, offset, self.enemies.rows_in(view))
+        self.bullets.draw(self.screen, alpha, offset, self.bullets.rows_in(view))
+
+        # 绘制草丛（在坦克之后，实现遮挡效果）
+        self.terrain.draw_foreground(self.screen, self.camera)
+
+        # 绘制爆炸效果（在最上层），闪光可能从视口外伸进来
+        for explosion in self.explosions_in(self.camera.rect(EXPLOSION_REACH)):
+            explosion.draw(self.screen, offset)
+
+        # 绘制UI
+        self.draw_ui()
+
+        # 绘制游戏状态
+        if self.state == GameState.GAME_OVER:
+            self.draw_game_over()
+        elif self.state == GameState.LEVEL_COMPLETE:
+            self.draw_level_complete()
+
+    def explosions_in(self, rect):
+        """中心落在 rect 覆盖的块中的爆炸，按列表顺序"""
+        explosions = self.explosions
+        if self.explosion_chunks is None:
+            self.explosion_chunks = index_chunks([explosion.x for explosion in explosions],
+                                                 [explosion.y for explosion in explosions])
+        return [explosions[i] for i in chunk_rows(self.explosion_chunks, rect)]
+
+    def dirty_rects(self):
+        """本帧可能变化的屏幕区域；返回 None 表示整屏更新"""
+        state_changed = self.state != self.presented_state
+        self.presented_state = self.state
+        camera_moved = self.camera.offset != self.presented_camera
+        self.presented_camera = self.camera.offset
+        damaged, self.damaged_rects = self.damaged_rects, []
+        if state_changed or camera_moved:
+            return None
+        if self.state != GameState.PLAYING:
+            return []  # 结束和过关画面保持不变，无需重新呈现
+
+        rects = damaged
+        player = self.player
+        # 炮管伸出车身之外
+        rects.append(motion_rect(player.prev_x, player.prev_y, player.x, player.y,
+                                 player.width, player.height, margin=SPRITE_MARGIN))
+        # 与绘制一样，只取视口附近的敌人、子弹和爆炸
+        view = self.camera.rect(CULL_MARGIN)
+        enemies = self.enemies
+        for i in enemies.rows_in(view):
+            rects.append(motion_rect(enemies.prev_x[i], enemies.prev_y[i], enemies.x[i],
+                                     enemies.y[i], enemies.width, enemies.height,
+                                     margin=SPRITE_MARGIN))
+        bullets = self.bullets
+        half = bullets.width // 2
+        for i in bullets.rows_in(view):
+            rects.append(motion_rect(bullets.prev_x[i] - half, bullets.prev_y[i] - half,
+                                     bullets.x[i] - half, bullets.y[i] - half,
+                                     bullets.width, bullets.height, margin=1))
+        for explosion in self.explosions_in(self.camera.rect(EXPLOSION_REACH)):
+            rects.append(pygame.Rect(explosion.x - EXPLOSION_REACH, explosion.y - EXPLOSION_REACH,
+                                     EXPLOSION_REACH * 2, EXPLOSION_REACH * 2))
+        # 以上都是地图坐标，转换到屏幕坐标；界面文字本来就在屏幕坐标中
+        camera_x, camera_y = self.camera.offset
+        if camera_x or camera_y:
+            rects = [rect.move(-camera_x, -camera_y) for rect in rects]
+        return rects + list(HUD_RECTS)
+
+    def pool_stats(self):
+        """对象池和实体存储的分配统计"""
+        return {'explosions': self.explosion_pool.stats(),
+                'bullets': self.bullets.stats(), 'enemies': self.enemies.stats()}
+
+    def snapshot(self):
+        """绘制所需状态的副本，供流水线模式的渲染线程使用"""
+        # 地图可能有上百万格，不复制：模拟只会把砖墙变成空地，渲染线程最多提前一帧看到；
+        # 预渲染的地形只由渲染线程读写
+        return snapshot_view(self, player=copy.copy(self.player),
+                             enemies=self.enemies.copy(), bullets=self.bullets.copy(),
+                             explosions=copy_all(self.explosions),
+                             destroyed_walls=list(self.destroyed_walls))
+
+    def run(self, record_path=None, capture_path=None, pipelined=False):
+        pygame.display.set_caption("Tank Battle")
+        # 固定步长模拟：渲染变慢时游戏速度不变
+        return FixedStepLoop(self.clock, step_rate=FPS, render_fps=FPS).run(
+            self, record_path, capture_path, pipelined)
 
-        return False
+    def close(self):
+        """解除地图文件的映射"""
+        if self.map_file is not None:
+            self.map_file.close()
 
-def start_game(screen):
+def start_game(screen, record_path=None, capture_path=None, pipelined=False, map_path=None):
     """启动坦克游戏的入口函数"""
-    game = TankGame(screen)
-    return game.run()
+    game = TankGame(screen, map_path=map_path)
+    try:
+        return game.run(record_path, capture_path, pipelined)
+    finally:
+        game.close()
@@ -0,0 +1,148 @@
+"""Compact binary tile maps for Tank levels, memory-mapped on load"""
+import mmap
+import random
+import struct
+from enum import IntEnum
+
+MAGIC = b'TMAP'
+VERSION = 1
+_HEADER = struct.Struct('<4sBHHHHHH')
+_SPAWN = struct.Struct('<HH')
+_WAVE = struct.Struct('<H')
+DEFAULT_WAVES = (3, 4, 5)
+
+
+# 墙壁类型，数值即地图文件中的字节
+class WallType(IntEnum):
+    EMPTY = 0
+    BRICK = 1  # 可破坏
+    STONE = 2  # 不可破坏
+    GRASS = 3  # 草丛，不阻挡
+
+
+# 阻挡坦克和子弹的格子
+BLOCKING = frozenset((WallType.BRICK, WallType.STONE))
+
+
+class TileMap:
+    def __init__(self, columns, rows, tiles=None, player_spawn=None, enemy_spawns=(),
+                 waves=()):
+        self.columns = columns
+        self.rows = rows
+        # 按格子序号每格一个字节：bytearray，或载入文件时只读的 memoryview，只有读到的页才从磁盘读入
+        self.tiles = tiles if tiles is not None else bytearray(columns * rows)
+        self._mmap = None
+        # 默认在底部中央出生
+        self.player_spawn = player_spawn or (columns // 2, rows - 2)
+        self.enemy_spawns = list(enemy_spawns)
+        self.waves = list(waves)
+
+    @classmethod
+    def load(cls, path):
+        """Map a tile map file read-only; only the header is read now. close() unmaps it"""
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            tile_map = cls._parse(path, data)
+        except ValueError:
+            data.close()
+            raise
+        tile_map._mmap = data
+        return tile_map
+
+    @classmethod
+    def _parse(cls, path, data):
+        if len(data) < _HEADER.size:
+            raise ValueError(f"{path} is not a version {VERSION} tank map")
+        (magic, version, columns, rows, player_column, player_row,
+         spawn_count, wave_count) = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} tank map")
+        offset = _HEADER.size
+        spawns = [_SPAWN.unpack_from(data, offset + i * _SPAWN.size) for i in range(spawn_count)]
+        offset += spawn_count * _SPAWN.size
+        waves = [_WAVE.unpack_from(data, offset + i * _WAVE.size)[0] for i in range(wave_count)]
+        offset += wave_count * _WAVE.size
+        if len(data) != offset + columns * rows:
+            raise ValueError(f"{path} is truncated: expected {columns}x{rows} tiles")
+        tiles = memoryview(data)[offset:]
+        return cls(columns, rows, tiles, (player_column, player_row), spawns, waves)
+
+    def close(self):
+        """Unmap a loaded file"""
+        if self._mmap is not None:
+            self.tiles.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, self.columns, self.rows, *self.player_spawn,
+                                 len(self.enemy_spawns), len(self.waves)))
+            for spawn in self.enemy_spawns:
+                f.write(_SPAWN.pack(*spawn))
+            for count in self.waves:
+                f.write(_WAVE.pack(count))
+            f.write(self.tiles)
+
+    def wave_size(self, level):
+        """Number of enemies in level (counting from 1), or None if the map has no waves"""
+        if not self.waves:
+            return None
+        last = len(self.waves)
+        return self.waves[min(level, last) - 1] + max(0, level - last)
+
+    def counts(self):
+        """{WallType: number of tiles}; reads the whole map"""
+        data = bytes(self.tiles)
+        return {wall_type: data.count(wall_type) for wall_type in WallType}
+
+
+def generate_map(columns, rows, rng):
+    """The random level layout: scattered walls and grass inside a stone border"""
+    tile_map = TileMap(columns, rows)
+    tiles = tile_map.tiles
+    # 墙壁和草丛的数量与地图面积成正比，屏幕大小（20x15 格）的地图上各为 15 和 10
+    scale = columns * rows / (20 * 15)
+
+    # 创建一些随机墙壁，后放的覆盖先放的
+    for i in range(int(15 * scale)):
+        x = rng.randint(1, columns - 2)
+        y = rng.randint(3, rows - 3)
+        tiles[y * columns + x] = rng.choice([WallType.BRICK, WallType.BRICK, WallType.STONE])
+
+    # 添加一些草丛，只长在空地上
+    for i in range(int(10 * scale)):
+        x = rng.randint(1, columns - 2)
+        y = rng.randint(3, rows - 3)
+        if tiles[y * columns + x] == WallType.EMPTY:
+            tiles[y * columns + x] = WallType.GRASS
+
+    # 创建边界墙
+    tiles[:columns] = bytes([WallType.STONE]) * columns
+    tiles[(rows - 1) * columns:] = bytes([WallType.STONE]) * columns
+    for y in range(rows):
+        tiles[y * columns] = WallType.STONE
+        tiles[y * columns + columns - 1] = WallType.STONE
+    return tile_map
+
+
+def random_spawns(tile_map, count, rng):
+    """Enemy spawn points in the band where generated levels place enemies"""
+    return [(rng.randint(1, tile_map.columns - 3), rng.randint(1, 4)) for i in range(count)]
+
+
+def convert(path, columns, rows, seed=None, spawns=8, waves=DEFAULT_WAVES):
+    """Write a level from the random generator as a tile map file"""
+    rng = random.Random(seed)
+    tile_map = generate_map(columns, rows, rng)
+    tile_map.enemy_spawns = random_spawns(tile_map, spawns, rng)
+    tile_map.waves = list(waves)
+    tile_map.save(path)
+    return tile_map
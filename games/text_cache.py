@@ -0,0 +1,89 @@
+"""Shared font registry and LRU text-surface cache for all games"""
+from collections import OrderedDict
+
+import pygame
+
+TEXT_CACHE_SIZE = 512
+
+_fonts = {}
+
+
+def get_font(size, name=None):
+    """Return the shared Font for (name, size), creating it on first use"""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.Font(name, size)
+        _fonts[key] = font
+    return font
+
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed by (font, text, color)"""
+
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key, build):
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = build()
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_size:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def render(self, font, text, color):
+        return self._lookup((font, text, color), lambda: font.render(text, True, color))
+
+    def render_outlined(self, font, text, color, outline_color, offset=2):
+        """Text drawn over four diagonally offset copies in outline_color
+
+        The surface is 2 * offset larger than the plain text in each
+        direction; centre it where the plain text would be centred.
+        """
+        def build():
+            outline = self.render(font, text, outline_color)
+            width, height = outline.get_size()
+            surface = pygame.Surface((width + 2 * offset, height + 2 * offset), pygame.SRCALPHA)
+            for dx, dy in [(-offset, -offset), (-offset, offset), (offset, -offset), (offset, offset)]:
+                surface.blit(outline, (offset + dx, offset + dy))
+            surface.blit(self.render(font, text, color), (offset, offset))
+            return surface
+
+        return self._lookup((font, text, color, outline_color, offset), build)
+
+    def clear(self):
+        self._surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._surfaces),
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+text_cache = TextCache()
+
+
+def render_text(font, text, color):
+    """Render antialiased text through the shared cache"""
+    return text_cache.render(font, text, color)
+
+
+def render_outlined_text(font, text, color, outline_color, offset=2):
+    """Render outlined text through the shared cache"""
+    return text_cache.render_outlined(font, text, color, outline_color, offset)
@@ -1,8 +1,24 @@
-import pygame
+import time
+
+# 在所有其他导入之前记录进程启动时间，启动计时才包含导入 pygame 和各模块的时间
+_process_start = time.perf_counter()
+
+import argparse
+import importlib
+import os
+import queue
 import sys
+import threading
+
+import pygame
+
+from games import launch_timing
+from games.text_cache import get_font, text_cache
+from worker_pool import WorkerPool
 
 # 初始化Pygame
 pygame.init()
+_pygame_ready = time.perf_counter()
 
 # 常量定义
 SCREEN_WIDTH = 800
@@ -18,6 +34,22 @@ DARK_BLUE = (50, 100, 200)
 GREEN = (0, 255, 0)
 YELLOW = (255, 255, 0)
 
+# 卡片配置（分页网格，只绘制当前页的卡片）
+CARD_WIDTH = 170
+CARD_HEIGHT = 170
+CARD_SPACING = 25
+CARD_ROW_SPACING = 20
+CARD_START_Y = 150
+GRID_COLUMNS = 4
+GRID_ROWS = 2
+CARDS_PER_PAGE = GRID_COLUMNS * GRID_ROWS
+CARD_CACHE_PAGES = 3  # 卡片缓存最多保留几页的卡片
+
+# 空闲模式：菜单无变化时阻塞等待输入，不重绘
+MENU_IDLE_TIMEOUT_MS = 1000
+MENU_REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED,
+                      pygame.WINDOWSIZECHANGED)
+
 # Game list configuration
 GAMES = [
     {
@@ -54,131 +86,350 @@ GAMES = [
 ]
 
 
-class GamePlatform:
+class ModulePrewarmer:
+    """Imports game modules on a background thread while the user browses"""
+
     def __init__(self):
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self.import_times = {}  # module name -> seconds spent importing in the background
+        self._thread = threading.Thread(target=self._worker, name="game-prewarm", daemon=True)
+        self._thread.start()
+
+    def request(self, module_name):
+        self._requests.put(module_name)
+
+    def _worker(self):
+        while True:
+            module_name = self._requests.get()
+            if module_name in sys.modules:
+                continue
+            start = time.perf_counter()
+            try:
+                importlib.import_module(module_name)
+            except Exception as e:
+                # 预热失败不影响菜单，真正启动时会再次报告错误
+                print(f"Failed to prewarm {module_name}: {e}")
+                continue
+            with self._lock:
+                self.import_times[module_name] = time.perf_counter() - start
+
+
+class LaunchTimings:
+    """Startup and per-launch phase timings, in seconds"""
+
+    def __init__(self):
+        self.startup = {}
+        self.launches = []
+
+    def record_launch(self, name, prewarmed, import_time, launch_start, constructor_start):
+        constructed = launch_timing.get('constructed')
+        first_frame = launch_timing.get('first_frame')
+        entry = {
+            'game': name,
+            'mode': 'in-process',
+            'warm': prewarmed,
+            'import': import_time,
+            'constructor': constructed - constructor_start if constructed else None,
+            'first_frame': first_frame - constructed if first_frame and constructed else None,
+            'to_first_frame': first_frame - launch_start if first_frame else None,
+        }
+        self.launches.append(entry)
+        return entry
+
+    def record_worker_launch(self, name, stats):
+        entry = {
+            'game': name,
+            'mode': 'worker (crashed)' if stats['crashed'] else 'worker',
+            'warm': stats['warm'],
+            'import': None,
+            'constructor': stats['constructor'],
+            'first_frame': stats['first_frame'],
+            # 与进程内启动一样从发出启动请求算起；另记从工作进程启动算起的时间
+            'to_first_frame': stats['dispatch_to_first_frame'],
+            'spawn_to_first_frame': stats['spawn_to_first_frame'],
+        }
+        self.launches.append(entry)
+        return entry
+
+    @staticmethod
+    def _ms(value):
+        return "-" if value is None else f"{value * 1000:.1f} ms"
+
+    def format_launch(self, entry):
+        warm = "warm" if entry['warm'] else "cold"
+        line = (f"{entry['game']} ({entry['mode']}, {warm}): import {self._ms(entry['import'])}, "
+                f"constructor {self._ms(entry['constructor'])}, "
+                f"first frame {self._ms(entry['first_frame'])}, "
+                f"launch to first frame {self._ms(entry['to_first_frame'])}")
+        if 'spawn_to_first_frame' in entry:
+            line += f", worker spawn to first frame {self._ms(entry['spawn_to_first_frame'])}"
+        return line
+
+    def report(self):
+        lines = ["Startup:"]
+        for phase, value in self.startup.items():
+            lines.append(f"  {phase}: {self._ms(value)}")
+        lines.append("Launches:")
+        for entry in self.launches:
+            lines.append("  " + self.format_launch(entry))
+        stats = text_cache.stats()
+        lines.append(f"Text cache: {stats['hits']} hits, {stats['misses']} misses, "
+                     f"{stats['size']} surfaces, {stats['hit_rate']:.1%} hit rate")
+        return "\n".join(lines)
+
+
+class GamePlatform:
+    def __init__(self, print_timings=False, idle_mode=True, workers=0, record_dir=None,
+                 capture_dir=None, capture_format='png', pipelined=False):
+        init_start = time.perf_counter()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("Game Platform")
         self.clock = pygame.time.Clock()
-        self.title_font = pygame.font.Font(None, 72)
-        self.menu_font = pygame.font.Font(None, 48)
-        self.desc_font = pygame.font.Font(None, 24)
-        self.small_font = pygame.font.Font(None, 20)
+        self.title_font = get_font(72)
+        self.menu_font = get_font(48)
+        self.desc_font = get_font(24)
+        self.small_font = get_font(20)
 
         self.selected_index = 0
         self.games = GAMES
 
-    def draw_menu(self):
-        self.screen.fill(BLACK)
+        # 启动计时与后台预热
+        self.print_timings = print_timings
+        self.timings = LaunchTimings()
+        self.timings.startup['pygame import + init'] = _pygame_ready - _process_start
+        self.timings.startup['platform init'] = time.perf_counter() - init_start
+        self.prewarmer = ModulePrewarmer()
+        self.prewarm_selected()
+
+        # 可选：把每局游戏的输入录制到 record_dir，供 games.replay 回放
+        self.record_dir = record_dir
+        # 可选：把每局游戏的画面保存到 capture_dir（PNG 序列或 GIF）
+        self.capture_dir = capture_dir
+        self.capture_format = capture_format
+        # 可选：模拟在单独的线程中运行，与渲染重叠
+        self.pipelined = pipelined
+
+        # 可选：在预热好的子进程中运行游戏，游戏崩溃不会影响平台
+        self.worker_pool = None
+        if workers > 0:
+            modules = dict.fromkeys(game['module'] for game in self.games)
+            self.worker_pool = WorkerPool(modules, (SCREEN_WIDTH, SCREEN_HEIGHT), size=workers)
+
+        # 空闲模式统计
+        self.idle_mode = idle_mode
+        self.menu_dirty = True
+        self.frames_drawn = 0
+        self._idle_elapsed = 0
+
+        # 菜单渲染缓存
+        self._cached_games = None
+        self._cached_game_count = 0
+        self._cards = {}  # game index -> (normal, selected)，按最近使用排序
+        self._static_texts = []
+        self._menu_frame = None
+        self._menu_frame_index = None
+
+    def _render_card(self, game, is_selected):
+        """Pre-render one game card in its selected or unselected look"""
+        surface = pygame.Surface((CARD_WIDTH, CARD_HEIGHT), pygame.SRCALPHA)
+        bg_color = LIGHT_BLUE if is_selected else DARK_BLUE
+
+        # 游戏卡片（选中时使用绿色粗边框）
+        card_rect = pygame.Rect(0, 0, CARD_WIDTH, CARD_HEIGHT)
+        pygame.draw.rect(surface, bg_color, card_rect, border_radius=15)
+        if is_selected:
+            pygame.draw.rect(surface, GREEN, card_rect, 4, border_radius=15)
+        else:
+            pygame.draw.rect(surface, WHITE, card_rect, 2, border_radius=15)
+
+        # 游戏名称（多行处理，最多2行）
+        name_y = 35
+        for line in game['name'].split()[:2]:
+            name_text = self.menu_font.render(line, True, WHITE)
+            name_rect = name_text.get_rect(center=(CARD_WIDTH // 2, name_y))
+            surface.blit(name_text, name_rect)
+            name_y += 40
+
+        # 游戏描述（多行换行，用 size() 测量宽度而不是渲染）
+        desc_lines = []
+        current_line = []
+        for word in game['description'].split():
+            test_line = ' '.join(current_line + [word])
+            if self.desc_font.size(test_line)[0] <= CARD_WIDTH - 20:
+                current_line.append(word)
+            else:
+                if current_line:
+                    desc_lines.append(' '.join(current_line))
+                current_line = [word]
+        if current_line:
+            desc_lines.append(' '.join(current_line))
+
+        desc_y = CARD_HEIGHT - 50
+        for line in desc_lines[:2]:  # 最多显示2行
+            desc_text = self.desc_font.render(line, True, GRAY)
+            desc_rect = desc_text.get_rect(center=(CARD_WIDTH // 2, desc_y))
+            surface.blit(desc_text, desc_rect)
+            desc_y += 22
+
+        return surface
+
+    def _get_card(self, index, is_selected):
+        """Return the cached card surface for a game, rendering it on first use"""
+        cards = self._cards.pop(index, None)
+        if cards is None:
+            game = self.games[index]
+            cards = (self._render_card(game, False), self._render_card(game, True))
+            if len(self._cards) >= CARDS_PER_PAGE * CARD_CACHE_PAGES:
+                # 淘汰最久未使用的卡片
+                del self._cards[next(iter(self._cards))]
+        self._cards[index] = cards
+        return cards[1] if is_selected else cards[0]
+
+    def _build_static_texts(self):
+        """Render the strings that only depend on the catalog size"""
+        self._cards.clear()
 
-        # Draw title
         title_text = self.title_font.render("GAME PLATFORM", True, YELLOW)
-        title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 60))
-        self.screen.blit(title_text, title_rect)
-
-        # Draw subtitle
         subtitle_text = self.desc_font.render("Select a game to play", True, WHITE)
-        subtitle_rect = subtitle_text.get_rect(center=(SCREEN_WIDTH // 2, 120))
-        self.screen.blit(subtitle_text, subtitle_rect)
-
-        # 卡片配置
-        card_width = 170
-        card_height = 220
-        card_spacing = 25
-        start_y = 200
-
-        # 计算总宽度并居中
-        total_width = len(self.games) * card_width + (len(self.games) - 1) * card_spacing
-        start_x = (SCREEN_WIDTH - total_width) // 2
-
-        # 绘制游戏卡片（横向排列）
-        for i, game in enumerate(self.games):
-            x_pos = start_x + i * (card_width + card_spacing)
-
-            # 绘制游戏选项背景
-            is_selected = (i == self.selected_index)
-            bg_color = LIGHT_BLUE if is_selected else DARK_BLUE
-
-            # 游戏卡片
-            card_rect = pygame.Rect(x_pos, start_y, card_width, card_height)
-            pygame.draw.rect(self.screen, bg_color, card_rect, border_radius=15)
-            pygame.draw.rect(self.screen, WHITE, card_rect, 3 if is_selected else 2, border_radius=15)
-
-            # 选中标记（在卡片上方）
-            if is_selected:
-                marker_text = self.menu_font.render("▼", True, GREEN)
-                marker_rect = marker_text.get_rect(center=(x_pos + card_width // 2, start_y - 25))
-                self.screen.blit(marker_text, marker_rect)
-
-            # 游戏名称（多行处理）
-            name_lines = game['name'].split()
-            name_y = start_y + 40
-            for line in name_lines:
-                name_text = self.menu_font.render(line, True, WHITE)
-                name_rect = name_text.get_rect(center=(x_pos + card_width // 2, name_y))
-                self.screen.blit(name_text, name_rect)
-                name_y += 45
-
-            # 游戏描述（多行换行）
-            desc_words = game['description'].split()
-            desc_lines = []
-            current_line = []
-            for word in desc_words:
-                test_line = ' '.join(current_line + [word])
-                test_text = self.desc_font.render(test_line, True, GRAY)
-                if test_text.get_width() <= card_width - 20:
-                    current_line.append(word)
-                else:
-                    if current_line:
-                        desc_lines.append(' '.join(current_line))
-                    current_line = [word]
-            if current_line:
-                desc_lines.append(' '.join(current_line))
-
-            desc_y = start_y + card_height - 80
-            for line in desc_lines[:3]:  # 最多显示3行
-                desc_text = self.desc_font.render(line, True, GRAY)
-                desc_rect = desc_text.get_rect(center=(x_pos + card_width // 2, desc_y))
-                self.screen.blit(desc_text, desc_rect)
-                desc_y += 25
 
         # Draw control hints
-        hint_y = SCREEN_HEIGHT - 60
         hints = [
-            "LEFT/RIGHT - Select",
+            "ARROWS - Select",
+            "PGUP/PGDN - Page",
             "ENTER - Start",
             "ESC - Quit"
         ]
-
         hint_text = self.small_font.render(" | ".join(hints), True, WHITE)
-        hint_rect = hint_text.get_rect(center=(SCREEN_WIDTH // 2, hint_y))
-        self.screen.blit(hint_text, hint_rect)
 
         # Draw game count
         count_text = self.small_font.render(f"Available Games: {len(self.games)}", True, GRAY)
-        count_rect = count_text.get_rect(bottomright=(SCREEN_WIDTH - 20, SCREEN_HEIGHT - 20))
-        self.screen.blit(count_text, count_rect)
+
+        self._static_texts = [
+            (title_text, title_text.get_rect(center=(SCREEN_WIDTH // 2, 60))),
+            (subtitle_text, subtitle_text.get_rect(center=(SCREEN_WIDTH // 2, 115))),
+            (hint_text, hint_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 60))),
+            (count_text, count_text.get_rect(bottomright=(SCREEN_WIDTH - 20, SCREEN_HEIGHT - 20))),
+        ]
+        self._cached_games = self.games
+        self._cached_game_count = len(self.games)
+
+    @property
+    def page_count(self):
+        return max(1, (len(self.games) + CARDS_PER_PAGE - 1) // CARDS_PER_PAGE)
+
+    def _compose_menu(self):
+        """Compose the menu frame from the cards of the current page only"""
+        if self._cached_games is not self.games or self._cached_game_count != len(self.games):
+            self._build_static_texts()
+
+        frame = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        frame.fill(BLACK)
+        for text, rect in self._static_texts:
+            frame.blit(text, rect)
+
+        page = self.selected_index // CARDS_PER_PAGE
+        first = page * CARDS_PER_PAGE
+        last = min(first + CARDS_PER_PAGE, len(self.games))
+
+        # 网格始终按满行宽度居中，翻页时卡片位置不跳动
+        columns = min(GRID_COLUMNS, len(self.games))
+        total_width = columns * CARD_WIDTH + (columns - 1) * CARD_SPACING
+        start_x = (SCREEN_WIDTH - total_width) // 2
+
+        for i in range(first, last):
+            row, column = divmod(i - first, GRID_COLUMNS)
+            x_pos = start_x + column * (CARD_WIDTH + CARD_SPACING)
+            y_pos = CARD_START_Y + row * (CARD_HEIGHT + CARD_ROW_SPACING)
+            frame.blit(self._get_card(i, i == self.selected_index), (x_pos, y_pos))
+
+        if self.page_count > 1:
+            page_text = self.small_font.render(f"Page {page + 1}/{self.page_count}", True, GRAY)
+            frame.blit(page_text, page_text.get_rect(bottomleft=(20, SCREEN_HEIGHT - 20)))
+
+        self._menu_frame = frame
+        self._menu_frame_index = self.selected_index
+
+    def draw_menu(self):
+        # 只有游戏列表或选中项变化时才重新合成菜单
+        if (self._menu_frame is None or self._cached_games is not self.games
+                or self._cached_game_count != len(self.games)
+                or self._menu_frame_index != self.selected_index):
+            self._compose_menu()
+        self.screen.blit(self._menu_frame, (0, 0))
+
+    def prewarm_selected(self):
+        if self.games:
+            self.prewarmer.request(self.games[self.selected_index]['module'])
+
+    def select(self, index):
+        if index != self.selected_index:
+            self.selected_index = index
+            self.menu_dirty = True
+            self.prewarm_selected()
 
     def handle_menu_input(self, event):
         if event.type == pygame.KEYDOWN:
+            count = len(self.games)
             if event.key == pygame.K_LEFT:
-                self.selected_index = (self.selected_index - 1) % len(self.games)
+                self.select((self.selected_index - 1) % count)
             elif event.key == pygame.K_RIGHT:
-                self.selected_index = (self.selected_index + 1) % len(self.games)
+                self.select((self.selected_index + 1) % count)
+            elif event.key == pygame.K_UP:
+                self.select(max(0, self.selected_index - GRID_COLUMNS))
+            elif event.key == pygame.K_DOWN:
+                self.select(min(count - 1, self.selected_index + GRID_COLUMNS))
+            elif event.key == pygame.K_PAGEUP:
+                self.select(max(0, self.selected_index - CARDS_PER_PAGE))
+            elif event.key == pygame.K_PAGEDOWN:
+                self.select(min(count - 1, self.selected_index + CARDS_PER_PAGE))
+            elif event.key == pygame.K_HOME:
+                self.select(0)
+            elif event.key == pygame.K_END:
+                self.select(count - 1)
             elif event.key == pygame.K_RETURN:
                 return True  # Start game
             elif event.key == pygame.K_ESCAPE:
                 return False  # Quit program
         return None
 
+    def launch_options(self, game_info):
+        """Keyword arguments passed to the game's start function"""
+        options = {}
+        name = f"{game_info['module'].rsplit('.', 1)[-1]}-{time.strftime('%Y%m%d-%H%M%S')}"
+        if self.record_dir is not None:
+            os.makedirs(self.record_dir, exist_ok=True)
+            options['record_path'] = os.path.join(self.record_dir, name + '.rec')
+        if self.capture_dir is not None:
+            os.makedirs(self.capture_dir, exist_ok=True)
+            suffix = '.gif' if self.capture_format == 'gif' else ''
+            options['capture_path'] = os.path.join(self.capture_dir, name + suffix)
+        if self.pipelined:
+            options['pipelined'] = True
+        return options
+
     def launch_game(self, game_info):
         """Launch the selected game"""
+        if self.worker_pool is not None:
+            return self.launch_game_in_worker(game_info)
+
         try:
-            # Dynamically import game module
-            module = __import__(game_info['module'], fromlist=[game_info['function']])
+            # Dynamically import game module (usually already done by the prewarmer)
+            launch_start = time.perf_counter()
+            prewarmed = game_info['module'] in sys.modules
+            module = importlib.import_module(game_info['module'])
             start_function = getattr(module, game_info['function'])
+            import_time = time.perf_counter() - launch_start
 
             # Start game with screen object
-            return_to_menu = start_function(self.screen)
+            launch_timing.reset()
+            constructor_start = time.perf_counter()
+            return_to_menu = start_function(self.screen, **self.launch_options(game_info))
+
+            entry = self.timings.record_launch(game_info['name'], prewarmed, import_time,
+                                               launch_start, constructor_start)
+            if self.print_timings:
+                print(self.timings.format_launch(entry))
 
             # Restore platform title
             pygame.display.set_caption("Game Platform")
@@ -190,18 +441,60 @@ class GamePlatform:
             traceback.print_exc()
             return True  # Return to menu on error
 
+    def launch_game_in_worker(self, game_info):
+        """Launch the selected game in a warm worker process"""
+        # 游戏在工作进程自己的窗口中运行；平台窗口仍然打开，期间丢弃发往它的事件，保持窗口响应
+        return_to_menu, stats = self.worker_pool.launch(game_info, self.launch_options(game_info),
+                                                        idle_callback=pygame.event.clear)
+        entry = self.timings.record_worker_launch(game_info['name'], stats)
+        if self.print_timings:
+            print(self.timings.format_launch(entry))
+        return return_to_menu
+
+    def menu_animating(self):
+        # 菜单目前没有动画；有动画时空闲模式按 FPS 超时唤醒
+        return False
+
+    def _next_menu_events(self):
+        """Return pending events, blocking in idle mode until one arrives"""
+        if not self.idle_mode:
+            self.clock.tick(FPS)
+            return pygame.event.get()
+
+        timeout = 1000 // FPS if self.menu_animating() else MENU_IDLE_TIMEOUT_MS
+        first = pygame.event.wait(timeout)
+        events = [] if first.type == pygame.NOEVENT else [first]
+        events.extend(pygame.event.get())
+
+        # 按固定帧率折算，未重绘的帧计为跳过
+        self.clock.tick()
+        self._idle_elapsed += self.clock.get_time()
+        return events
+
+    def _present_menu(self):
+        self.draw_menu()
+        pygame.display.flip()
+        self.menu_dirty = False
+        self.frames_drawn += 1
+        if 'first menu frame' not in self.timings.startup:
+            self.timings.startup['first menu frame'] = time.perf_counter() - _process_start
+
+    @property
+    def frames_skipped(self):
+        return max(0, int(self._idle_elapsed * FPS / 1000) - self.frames_drawn)
+
     def run(self):
         running = True
         in_menu = True
 
         while running:
-            self.clock.tick(FPS)
-
             if in_menu:
                 # Menu interface
-                for event in pygame.event.get():
+                for event in self._next_menu_events():
                     if event.type == pygame.QUIT:
                         running = False
+                    elif event.type in MENU_REDRAW_EVENTS:
+                        self.menu_dirty = True
                     else:
                         result = self.handle_menu_input(event)
                         if result is True:
@@ -210,21 +503,52 @@ class GamePlatform:
                             return_to_menu = self.launch_game(self.games[self.selected_index])
                             if return_to_menu:
                                 in_menu = True
+                                self.menu_dirty = True
+                                self.clock.tick()
                             else:
                                 running = False
                         elif result is False:
                             # Quit
                             running = False
 
-                self.draw_menu()
-                pygame.display.flip()
+                if running and (self.menu_dirty or not self.idle_mode or self.menu_animating()):
+                    self._present_menu()
 
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown()
+        if self.print_timings:
+            print(self.timings.report())
+            if self.idle_mode:
+                print(f"Idle menu: {self.frames_drawn} frames drawn, "
+                      f"{self.frames_skipped} frames skipped")
         pygame.quit()
         sys.exit()
 
 
 def main():
-    platform = GamePlatform()
+    parser = argparse.ArgumentParser(description="Game Platform")
+    parser.add_argument('--timings', action='store_true',
+                        help="print startup and game launch phase timings")
+    parser.add_argument('--no-idle', action='store_true',
+                        help="redraw the menu every frame instead of waiting for input")
+    parser.add_argument('--workers', type=int, default=0, metavar='N',
+                        help="run games in a pool of N warm worker processes; each game "
+                             "opens its own window, and the platform window stays open but "
+                             "ignores input until the game ends")
+    parser.add_argument('--record', metavar='DIR',
+                        help="record every game session to DIR for replay with games.replay")
+    parser.add_argument('--capture', metavar='DIR',
+                        help="save the frames of every game session to DIR")
+    parser.add_argument('--capture-format', choices=('png', 'gif'), default='png',
+                        help="a directory of PNG frames per session, or one GIF")
+    parser.add_argument('--pipelined', action='store_true',
+                        help="run each game's simulation on its own thread, overlapping rendering")
+    args = parser.parse_args()
+
+    platform = GamePlatform(print_timings=args.timings, idle_mode=not args.no_idle,
+                            workers=args.workers, record_dir=args.record,
+                            capture_dir=args.capture, capture_format=args.capture_format,
+                            pipelined=args.pipelined)
     platform.run()
 
 
@@ -0,0 +1,81 @@
+import random
+import unittest
+
+import pygame
+
+from games.tank.tank_game import (BROADPHASE_CELL_SIZE, BULLET_SIZE, SCREEN_HEIGHT,
+                                  SCREEN_WIDTH, TANK_SIZE, EnemyHash, EnemyStore)
+
+CELL = BROADPHASE_CELL_SIZE
+
+
+class EnemyHashTest(unittest.TestCase):
+    """EnemyHash.first_hit must agree with the brute-force EnemyStore.first_hit"""
+
+    def assert_same_hits(self, enemies, rects):
+        enemy_hash = EnemyHash()
+        enemy_hash.rebuild(enemies)
+        for rect in rects:
+            self.assertEqual(enemy_hash.first_hit(rect), enemies.first_hit(rect), rect)
+
+    def bullet_rects(self, rng, count):
+        return [pygame.Rect(rng.randint(-BULLET_SIZE, SCREEN_WIDTH),
+                            rng.randint(-BULLET_SIZE, SCREEN_HEIGHT), BULLET_SIZE, BULLET_SIZE)
+                for i in range(count)]
+
+    def test_random_layouts(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            enemies = EnemyStore()
+            for i in range(rng.randint(1, 200)):
+                enemies.add(rng.randint(0, SCREEN_WIDTH - TANK_SIZE),
+                            rng.randint(0, SCREEN_HEIGHT - TANK_SIZE), 1, rng)
+            # 被击毁但还未移除的敌人不能被命中
+            enemies.active[:] = [rng.random() > 0.2 for i in range(len(enemies))]
+            with self.subTest(seed=seed):
+                self.assert_same_hits(enemies, self.bullet_rects(rng, 500))
+
+    def test_bullets_on_cell_edges(self):
+        rng = random.Random(1)
+        enemies = EnemyStore()
+        for i in range(100):
+            enemies.add(rng.randint(0, SCREEN_WIDTH - TANK_SIZE),
+                        rng.randint(0, SCREEN_HEIGHT - TANK_SIZE), 1, rng)
+        rects = []
+        for column in range(SCREEN_WIDTH // CELL + 1):
+            for row in range(SCREEN_HEIGHT // CELL + 1):
+                x, y = column * CELL, row * CELL
+                # 左上角、右下角正好落在格子边界上，以及跨过边界的子弹
+                rects.append(pygame.Rect(x, y, BULLET_SIZE, BULLET_SIZE))
+                rects.append(pygame.Rect(x - BULLET_SIZE, y - BULLET_SIZE,
+                                         BULLET_SIZE, BULLET_SIZE))
+                rects.append(pygame.Rect(x - BULLET_SIZE // 2, y - BULLET_SIZE // 2,
+                                         BULLET_SIZE, BULLET_SIZE))
+        self.assert_same_hits(enemies, rects)
+
+    def test_enemies_spanning_cells(self):
+        enemies = EnemyStore()
+        rng = random.Random(2)
+        # 跨两列、两行以及四个格子的敌人
+        for column in range(1, SCREEN_WIDTH // CELL):
+            for row in range(1, SCREEN_HEIGHT // CELL):
+                enemies.add(column * CELL - TANK_SIZE // 2, row * CELL - TANK_SIZE // 2, 1, rng)
+                enemies.add(column * CELL - 1, row * CELL + 10, 1, rng)
+                enemies.add(column * CELL + 10, row * CELL - 1, 1, rng)
+        rects = [pygame.Rect(x, y, BULLET_SIZE, BULLET_SIZE)
+                 for x in range(0, SCREEN_WIDTH, 7) for y in range(0, SCREEN_HEIGHT, 7)]
+        self.assert_same_hits(enemies, rects)
+
+    def test_overlapping_enemies_hit_lowest_row(self):
+        enemies = EnemyStore()
+        rng = random.Random(3)
+        for offset in (20, 10, 0, 30):
+            enemies.add(CELL - offset, CELL - offset, 1, rng)
+        enemies.active[2] = False
+        rects = [pygame.Rect(CELL + dx, CELL + dy, BULLET_SIZE, BULLET_SIZE)
+                 for dx in range(-40, 40, 3) for dy in range(-40, 40, 3)]
+        self.assert_same_hits(enemies, rects)
+
+
+if __name__ == '__main__':
+    unittest.main()
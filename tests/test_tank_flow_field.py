@@ -0,0 +1,60 @@
+import random
+import unittest
+
+from games.tank.tank_game import TILE_SIZE, FlowField, WallGrid
+from games.tank.tile_map import TileMap, WallType
+
+
+def random_map(rng, columns=30, rows=20, density=0.35):
+    tile_map = TileMap(columns, rows)
+    for cell in range(columns * rows):
+        if rng.random() < density:
+            tile_map.tiles[cell] = rng.choice((WallType.BRICK, WallType.BRICK, WallType.STONE))
+    return tile_map
+
+
+class FlowFieldTest(unittest.TestCase):
+    """Repairing the field after a wall is destroyed must match a full recompute"""
+
+    def test_destroyed_walls_match_full_recompute(self):
+        for seed in range(10):
+            rng = random.Random(seed)
+            tile_map = random_map(rng)
+            grid = WallGrid(tile_map)
+            open_cells = [cell for cell, tile in enumerate(tile_map.tiles)
+                          if tile != WallType.BRICK and tile != WallType.STONE]
+            target = rng.choice(open_cells)
+            x = target % grid.columns * TILE_SIZE
+            y = target // grid.columns * TILE_SIZE
+            for max_distance in (8, 64):
+                field = FlowField(grid, max_distance)
+                field.update(x, y)
+                bricks = [cell for cell, tile in enumerate(tile_map.tiles)
+                          if tile == WallType.BRICK]
+                rng.shuffle(bricks)
+                for cell in bricks[:25]:
+                    grid.remove(cell)
+                    field.update(x, y)
+                    expected = FlowField(grid, max_distance)
+                    expected.update(x, y)
+                    with self.subTest(seed=seed, max_distance=max_distance, cell=cell):
+                        self.assertEqual(field.distances, expected.distances)
+                self.assertEqual(field.recomputes, 1)
+
+    def test_several_walls_destroyed_between_updates(self):
+        rng = random.Random(99)
+        tile_map = random_map(rng, density=0.5)
+        grid = WallGrid(tile_map)
+        field = FlowField(grid)
+        field.update(TILE_SIZE * 15, TILE_SIZE * 10)
+        bricks = [cell for cell, tile in enumerate(tile_map.tiles) if tile == WallType.BRICK]
+        for cell in rng.sample(bricks, 40):
+            grid.remove(cell)
+        field.update(TILE_SIZE * 15, TILE_SIZE * 10)
+        expected = FlowField(grid)
+        expected.update(TILE_SIZE * 15, TILE_SIZE * 10)
+        self.assertEqual(field.distances, expected.distances)
+
+
+if __name__ == '__main__':
+    unittest.main()
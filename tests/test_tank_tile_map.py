@@ -0,0 +1,51 @@
+import os
+import random
+import tempfile
+import unittest
+
+from games.tank.tank_game import WallGrid
+from games.tank.tile_map import TileMap, WallType, convert
+
+
+class TileMapFileTest(unittest.TestCase):
+    """Destroyed bricks live in WallGrid; the mapped file is never written"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'level.map')
+        self.generated = convert(self.path, 60, 40, seed=7, waves=(2, 5))
+
+    def test_round_trip(self):
+        with TileMap.load(self.path) as tile_map:
+            self.assertEqual(bytes(tile_map.tiles), bytes(self.generated.tiles))
+            self.assertEqual(tile_map.player_spawn, self.generated.player_spawn)
+            self.assertEqual(tile_map.enemy_spawns, self.generated.enemy_spawns)
+            self.assertEqual([tile_map.wave_size(level) for level in (1, 2, 3, 4)], [2, 5, 6, 7])
+
+    def test_destroyed_bricks_do_not_touch_the_file(self):
+        with open(self.path, 'rb') as f:
+            original = f.read()
+        with TileMap.load(self.path) as tile_map:
+            grid = WallGrid(tile_map)
+            bricks = [cell for cell, tile in enumerate(tile_map.tiles) if tile == WallType.BRICK]
+            for cell in random.Random(1).sample(bricks, 10):
+                self.assertTrue(grid.blocked(grid.cell_rect(cell)))
+                grid.remove(cell)
+                self.assertFalse(grid.blocked(grid.cell_rect(cell)))
+                self.assertEqual(tile_map.tiles[cell], WallType.BRICK)
+            # 下一关的网格从原始地图开始
+            fresh = WallGrid(tile_map)
+            self.assertTrue(all(fresh.blocked(fresh.cell_rect(cell)) for cell in bricks))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), original)
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'r+b') as f:
+            f.write(b'NOPE')
+        with self.assertRaises(ValueError):
+            TileMap.load(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
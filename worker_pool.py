@@ -0,0 +1,147 @@
+"""Warm worker processes for crash-isolated game launches"""
+import importlib
+import multiprocessing
+import time
+
+WORKER_POLL_INTERVAL = 0.05  # 等待子进程消息时的轮询间隔（秒）
+
+
+def _worker_main(conn, modules, screen_size):
+    """Worker process entry point"""
+    import pygame
+
+    from games import launch_timing
+
+    pygame.init()
+    for module_name in modules:
+        importlib.import_module(module_name)
+    try:
+        conn.send(('ready',))
+        job = conn.recv()
+    except (EOFError, OSError):
+        return  # 平台在预热完成前关闭了连接
+    if job is None:
+        return
+    module_name, function_name, options = job
+    received = time.perf_counter()
+
+    # 把游戏的阶段标记转发给平台进程
+    launch_timing.reset()
+    launch_timing.set_listener(
+        lambda phase, timestamp: conn.send(('mark', phase, timestamp - received)))
+
+    screen = pygame.display.set_mode(screen_size)
+    start_function = getattr(importlib.import_module(module_name), function_name)
+    return_to_menu = start_function(screen, **options)
+    conn.send(('done', bool(return_to_menu)))
+    pygame.quit()
+
+
+class WorkerPool:
+    """A small pool of warm, single-use game worker processes
+
+    Each worker exits when its game ends or crashes, and a fresh one takes its place.
+    """
+
+    def __init__(self, modules, screen_size, size=1):
+        self.modules = list(modules)
+        self.screen_size = screen_size
+        self.size = size
+        # 平台已经初始化了 SDL，带着 SDL 状态 fork 不安全
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = []
+        self.fill()
+
+    def fill(self):
+        """Start workers until the pool is back at its configured size"""
+        while len(self._workers) < self.size:
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(
+                target=_worker_main, args=(child_conn, self.modules, self.screen_size),
+                name="game-worker", daemon=True)
+            process.start()
+            child_conn.close()
+            self._workers.append((process, parent_conn, time.perf_counter()))
+
+    def _take_worker(self):
+        """Prefer a worker that has finished warming up"""
+        for i, (process, conn, spawned) in enumerate(self._workers):
+            if conn.poll():
+                return self._workers.pop(i), True
+        return self._workers.pop(0), False
+
+    def launch(self, game_info, options=None, idle_callback=None):
+        """Run a game in a worker process
+
+        options are keyword arguments for the game's start function.
+        Returns (return_to_menu, stats). idle_callback is called while
+        waiting so the caller can keep its own window responsive.
+        dispatch_to_first_frame is measured from sending the launch request,
+        spawn_to_first_frame from starting the worker process.
+        """
+        if not self._workers:
+            self.fill()
+        (process, conn, spawned), warm = self._take_worker()
+        dispatched = time.perf_counter()
+        stats = {
+            'warm': warm,
+            'constructor': None,
+            'first_frame': None,
+            'dispatch_to_first_frame': None,
+            'spawn_to_first_frame': None,
+            'crashed': False,
+        }
+        return_to_menu = True
+
+        try:
+            if warm:
+                conn.recv()  # 丢弃 'ready'
+            conn.send((game_info['module'], game_info['function'], options or {}))
+            self.fill()  # 游戏运行时预热下一个工作进程
+
+            while True:
+                if not conn.poll(WORKER_POLL_INTERVAL):
+                    if not process.is_alive() and not conn.poll():
+                        raise EOFError
+                    if idle_callback:
+                        idle_callback()
+                    continue
+
+                message = conn.recv()
+                if message[0] == 'mark':
+                    _, phase, elapsed = message
+                    if phase == 'constructed':
+                        stats['constructor'] = elapsed
+                    elif phase == 'first_frame':
+                        stats['first_frame'] = elapsed - (stats['constructor'] or 0)
+                        now = time.perf_counter()
+                        stats['dispatch_to_first_frame'] = now - dispatched
+                        stats['spawn_to_first_frame'] = now - spawned
+                elif message[0] == 'done':
+                    return_to_menu = message[1]
+                    break
+        except (EOFError, OSError):
+            stats['crashed'] = True
+        finally:
+            conn.close()
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+        if stats['crashed']:
+            print(f"Game worker for {game_info['name']} exited with code {process.exitcode}")
+
+        return return_to_menu, stats
+
+    def shutdown(self):
+        for process, conn, spawned in self._workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+        for process, conn, spawned in self._workers:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self._workers = []